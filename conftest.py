@@ -0,0 +1,17 @@
+#!/usr/bin/env python3
+"""
+Shared pytest fixtures
+"""
+
+import pytest
+
+from services.hub import db
+
+
+@pytest.fixture
+def pulse_db(tmp_path, monkeypatch):
+    """A fresh pulse.db in a temporary directory; returns its path"""
+    path = tmp_path / 'pulse.db'
+    monkeypatch.setattr(db, 'DB_PATH', path)
+    monkeypatch.setattr(db, '_schema_ready', False)
+    return path
@@ -32,8 +32,9 @@ app.get('*', (req, res) => {
 const server = http.createServer(app);
 const wss = new WebSocketServer({ server, path: '/ws' });
 
-wss.on('connection', (client) => {
-  const hubWsUrl = HUB_URL.replace('http', 'ws') + '/ws';
+wss.on('connection', (client, req) => {
+  // Keep the query string so protocol negotiation (e.g. ?v=2) reaches the hub
+  const hubWsUrl = HUB_URL.replace('http', 'ws') + req.url;
   const upstream = new WebSocket(hubWsUrl);
   const closeBoth = () => {
     try { client.close(); } catch {}
@@ -19,6 +19,21 @@ interface LiveData {
   camera_active: boolean;
 }
 
+// RFC 7386 merge patch: nested objects carry only changed keys, null deletes
+function applyMergePatch(target: any, patch: any): any {
+  for (const [key, value] of Object.entries(patch)) {
+    if (value === null) {
+      delete target[key];
+    } else if (typeof value === 'object' && !Array.isArray(value) &&
+               typeof target[key] === 'object' && target[key] !== null) {
+      target[key] = applyMergePatch({ ...target[key] }, value);
+    } else {
+      target[key] = value;
+    }
+  }
+  return target;
+}
+
 export default function LiveOverview() {
   const [data, setData] = useState<LiveData>({
     people_count: 0,
@@ -34,12 +49,36 @@ export default function LiveOverview() {
   useEffect(() => {
     // Connect to WebSocket for real-time updates
     const proto = location.protocol === 'https:' ? 'wss' : 'ws';
-    const ws = new WebSocket(`${proto}://${location.host}/ws`);
+    // v=2: one snapshot, then sequence-numbered merge-patch deltas
+    const ws = new WebSocket(`${proto}://${location.host}/ws?v=2`);
+    let lastSeq = -1;
+    // One resync in flight at a time: it is answered once lastSeq reaches the
+    // delta that revealed the gap (or a snapshot arrives)
+    let resyncUntil = -1;
     
     ws.onmessage = (evt) => {
       try {
         const msg = JSON.parse(evt.data);
-        if (msg.type === 'live_data') {
+        if (msg.type === 'live_snapshot') {
+          lastSeq = msg.seq;
+          resyncUntil = -1;
+          setData(prev => ({ ...prev, ...msg.data }));
+        } else if (msg.type === 'live_delta') {
+          if (msg.seq <= lastSeq) {
+            // Already covered by the snapshot or a replay
+            return;
+          }
+          if (msg.seq !== lastSeq + 1) {
+            // Missed a delta; ask the hub to replay from what we have
+            if (lastSeq >= resyncUntil) {
+              resyncUntil = msg.seq;
+              ws.send(JSON.stringify({ type: 'resync', seq: lastSeq }));
+            }
+            return;
+          }
+          lastSeq = msg.seq;
+          setData(prev => applyMergePatch({ ...prev }, msg.data));
+        } else if (msg.type === 'live_data') {
           setData(prev => ({ ...prev, ...msg.data }));
         }
       } catch (e) {
@@ -1,8 +1,13 @@
+import asyncio
+import logging
+import os
 import aiosqlite
 from pathlib import Path
-from typing import Any, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
-DB_PATH = Path(__file__).resolve().parents[2] / 'data' / 'pulse.db'
+logger = logging.getLogger(__name__)
+
+DB_PATH = Path(os.environ.get('DB_PATH', Path(__file__).resolve().parents[2] / 'data' / 'pulse.db'))
 DB_PATH.parent.mkdir(parents=True, exist_ok=True)
 
 INIT_SQL = [
@@ -14,24 +19,247 @@ INIT_SQL = [
         value REAL,
         data TEXT
     )''',
-    '''CREATE INDEX IF NOT EXISTS idx_tel_ts ON telemetry(ts)'''
+    '''CREATE INDEX IF NOT EXISTS idx_tel_ts ON telemetry(ts)''',
+    '''CREATE INDEX IF NOT EXISTS idx_tel_metric_ts ON telemetry(metric, ts)''',
+]
+
+# Rollup tables maintained alongside raw inserts: (table, bucket seconds)
+ROLLUPS = [
+    ('telemetry_1m', 60),
+    ('telemetry_15m', 900),
+    ('telemetry_1h', 3600),
 ]
 
+for _table, _ in ROLLUPS:
+    INIT_SQL.append(f'''CREATE TABLE IF NOT EXISTS {_table} (
+        bucket INTEGER NOT NULL,
+        source TEXT NOT NULL,
+        metric TEXT NOT NULL,
+        min_value REAL NOT NULL,
+        max_value REAL NOT NULL,
+        sum_value REAL NOT NULL,
+        count INTEGER NOT NULL,
+        PRIMARY KEY (metric, bucket, source)
+    ) WITHOUT ROWID''')
+    # Retention deletes by bucket across all metrics
+    INIT_SQL.append(f'CREATE INDEX IF NOT EXISTS idx_{_table}_bucket ON {_table}(bucket)')
+
+INSERT_TELEMETRY_SQL = 'INSERT INTO telemetry (ts, source, metric, value, data) VALUES (?, ?, ?, ?, ?)'
+
+UPSERT_ROLLUP_SQL = '''INSERT INTO {table} (bucket, source, metric, min_value, max_value, sum_value, count)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(metric, bucket, source) DO UPDATE SET
+        min_value = min(min_value, excluded.min_value),
+        max_value = max(max_value, excluded.max_value),
+        sum_value = sum_value + excluded.sum_value,
+        count = count + excluded.count'''
+
+TelemetryRow = Tuple[int, str, str, Optional[float], Optional[str]]
+
+# DDL only needs to run once per process, not on every connection
+_schema_ready = False
+_schema_lock: Optional[asyncio.Lock] = None
+_schema_lock_loop = None
+
+def _get_schema_lock() -> asyncio.Lock:
+    """Lock serializing schema setup, one per event loop"""
+    global _schema_lock, _schema_lock_loop
+    loop = asyncio.get_running_loop()
+    if _schema_lock is None or _schema_lock_loop is not loop:
+        _schema_lock, _schema_lock_loop = asyncio.Lock(), loop
+    return _schema_lock
+
+async def _configure(db):
+    # WAL lets readers run alongside the writer; NORMAL sync is durable in
+    # WAL mode and avoids an fsync per commit on the SD card
+    await db.execute('PRAGMA journal_mode=WAL')
+    await db.execute('PRAGMA synchronous=NORMAL')
+
 async def get_db():
+    global _schema_ready
     db = await aiosqlite.connect(str(DB_PATH))
-    await db.execute('PRAGMA journal_mode=WAL')
-    for stmt in INIT_SQL:
-        await db.execute(stmt)
-    await db.commit()
+    if _schema_ready:
+        await _configure(db)
+        return db
+    # Concurrent first connections (the telemetry writer, a request handler)
+    # must not both run the DDL and backfill the rollups
+    async with _get_schema_lock():
+        if _schema_ready:
+            await _configure(db)
+            return db
+        # Only takes effect on a new database (before any table exists); lets
+        # retention hand freed pages back with PRAGMA incremental_vacuum
+        await db.execute('PRAGMA auto_vacuum=INCREMENTAL')
+        await _configure(db)
+        for stmt in INIT_SQL:
+            await db.execute(stmt)
+        await db.commit()
+        await _backfill_rollups(db)
+        _schema_ready = True
     return db
 
-async def insert_telemetry(ts: int, source: str, metric: str, value: Optional[float], data: Optional[str] = None):
-    async with await get_db() as db:
+async def _backfill_rollups(db):
+    """Populate empty rollup tables from existing raw rows (one-time migration)"""
+    for table, seconds in ROLLUPS:
+        async with db.execute(f'SELECT 1 FROM {table} LIMIT 1') as cur:
+            if await cur.fetchone() is not None:
+                continue
         await db.execute(
-            'INSERT INTO telemetry (ts, source, metric, value, data) VALUES (?, ?, ?, ?, ?)',
-            (ts, source, metric, value, data)
+            f'''INSERT INTO {table} (bucket, source, metric, min_value, max_value, sum_value, count)
+            SELECT (ts / {seconds}) * {seconds}, source, metric, MIN(value), MAX(value), SUM(value), COUNT(value)
+            FROM telemetry WHERE value IS NOT NULL
+            GROUP BY ts / {seconds}, source, metric'''
         )
-        await db.commit()
+    await db.commit()
+
+def _rollup_rows(rows: List[TelemetryRow], seconds: int) -> List[tuple]:
+    """Pre-aggregate a batch into one (bucket, source, metric) row per group"""
+    groups: Dict[tuple, list] = {}
+    for ts, source, metric, value, _data in rows:
+        if value is None:
+            continue
+        key = ((ts // seconds) * seconds, source, metric)
+        agg = groups.get(key)
+        if agg is None:
+            groups[key] = [value, value, value, 1]
+        else:
+            if value < agg[0]:
+                agg[0] = value
+            if value > agg[1]:
+                agg[1] = value
+            agg[2] += value
+            agg[3] += 1
+    return [key + tuple(agg) for key, agg in groups.items()]
+
+async def _write_rows(db, rows: List[TelemetryRow]):
+    """Insert raw rows and fold them into every rollup, in one transaction"""
+    await db.executemany(INSERT_TELEMETRY_SQL, rows)
+    for table, seconds in ROLLUPS:
+        await db.executemany(UPSERT_ROLLUP_SQL.format(table=table), _rollup_rows(rows, seconds))
+    await db.commit()
+
+_STOP = object()
+
+class TelemetryWriter:
+    """Long-lived telemetry writer with one persistent connection.
+
+    Samples are queued and written in a single executemany transaction once
+    batch_size rows are waiting or flush_interval seconds have passed since
+    the first queued row. submit() waits when max_queue rows are pending
+    (backpressure); submit_nowait() drops and counts instead. close() flushes
+    everything that was queued before it was called.
+    """
+
+    def __init__(self, batch_size: int = 200, flush_interval: float = 2.0, max_queue: int = 10000):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        self._batch_ready: Optional[asyncio.Event] = None
+        self._db = None
+        self._task: Optional[asyncio.Task] = None
+
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.batches = 0
+
+    async def start(self):
+        self._db = await get_db()
+        self._batch_ready = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def submit(self, ts: int, source: str, metric: str, value: Optional[float], data: Optional[str] = None):
+        await self._queue.put((ts, source, metric, value, data))
+        if self._queue.qsize() >= self.batch_size:
+            self._batch_ready.set()
+
+    def submit_nowait(self, ts: int, source: str, metric: str, value: Optional[float], data: Optional[str] = None) -> bool:
+        try:
+            self._queue.put_nowait((ts, source, metric, value, data))
+        except asyncio.QueueFull:
+            self.dropped += 1
+            return False
+        if self._queue.qsize() >= self.batch_size:
+            self._batch_ready.set()
+        return True
+
+    async def _run(self):
+        stopping = False
+        while not stopping:
+            first = await self._queue.get()
+            if first is _STOP:
+                break
+            batch: List[TelemetryRow] = [first]
+
+            # Wait for a full batch or the flush interval, whichever comes first
+            if self._queue.qsize() < self.batch_size - 1:
+                self._batch_ready.clear()
+                try:
+                    await asyncio.wait_for(self._batch_ready.wait(), self.flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+
+            while len(batch) < self.batch_size and not self._queue.empty():
+                item = self._queue.get_nowait()
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            await self._flush(batch)
+
+    async def _flush(self, batch: List[TelemetryRow]):
+        try:
+            await _write_rows(self._db, batch)
+            self.written += len(batch)
+            self.batches += 1
+        except Exception as e:
+            self.failed += len(batch)
+            logger.error(f"Telemetry flush of {len(batch)} rows failed: {e}")
+
+    def stats(self) -> dict:
+        return {
+            'queued': self._queue.qsize(),
+            'written': self.written,
+            'dropped': self.dropped,
+            'failed': self.failed,
+            'batches': self.batches,
+        }
+
+    async def close(self):
+        if self._task is None:
+            return
+        await self._queue.put(_STOP)
+        self._batch_ready.set()
+        await self._task
+        self._task = None
+        await self._db.close()
+        self._db = None
+
+# Process-wide writer used by insert_telemetry() once started
+_writer: Optional[TelemetryWriter] = None
+
+async def start_writer(**kwargs) -> TelemetryWriter:
+    global _writer
+    if _writer is None:
+        _writer = TelemetryWriter(**kwargs)
+        await _writer.start()
+    return _writer
+
+async def stop_writer():
+    global _writer
+    if _writer is not None:
+        await _writer.close()
+        _writer = None
+
+async def insert_telemetry(ts: int, source: str, metric: str, value: Optional[float], data: Optional[str] = None):
+    if _writer is not None:
+        await _writer.submit(ts, source, metric, value, data)
+        return
+    db = await get_db()
+    try:
+        await _write_rows(db, [(ts, source, metric, value, data)])
+    finally:
+        await db.close()
 
 async def query_telemetry(metric: Optional[str] = None, since_ts: Optional[int] = None, limit: int = 1000):
     sql = 'SELECT ts, source, metric, value, data FROM telemetry WHERE 1=1'
@@ -44,7 +272,111 @@ async def query_telemetry(metric: Optional[str] = None, since_ts: Optional[int]
         params.append(since_ts)
     sql += ' ORDER BY ts DESC LIMIT ?'
     params.append(limit)
-    async with await get_db() as db:
+    db = await get_db()
+    try:
         async with db.execute(sql, params) as cur:
             rows = await cur.fetchall()
+    finally:
+        await db.close()
     return rows
+
+async def iter_telemetry(metric: Optional[str] = None, source: Optional[str] = None,
+                         start_ts: Optional[int] = None, end_ts: Optional[int] = None,
+                         limit: Optional[int] = None, chunk_size: int = 500):
+    """Yield raw telemetry rows (ts, source, metric, value, data), oldest first.
+
+    Rows come straight off the cursor in chunk_size batches, so memory stays
+    flat however large the range is. Uses its own connection; WAL lets it
+    read while the writer is committing.
+    """
+    sql = 'SELECT ts, source, metric, value, data FROM telemetry WHERE 1=1'
+    params: list[Any] = []
+    if metric:
+        sql += ' AND metric = ?'
+        params.append(metric)
+    if source:
+        sql += ' AND source = ?'
+        params.append(source)
+    if start_ts is not None:
+        sql += ' AND ts >= ?'
+        params.append(start_ts)
+    if end_ts is not None:
+        sql += ' AND ts <= ?'
+        params.append(end_ts)
+    sql += ' ORDER BY ts ASC'
+    if limit is not None:
+        sql += ' LIMIT ?'
+        params.append(limit)
+
+    db = await get_db()
+    try:
+        async with db.execute(sql, params) as cur:
+            while True:
+                rows = await cur.fetchmany(chunk_size)
+                if not rows:
+                    break
+                for row in rows:
+                    yield row
+    finally:
+        await db.close()
+
+async def query_telemetry_series(metric: str, start_ts: int, end_ts: int, max_points: int = 500,
+                                 source: Optional[str] = None) -> Dict[str, Any]:
+    """Downsampled series for charting.
+
+    Uses raw rows when the range holds at most max_points of them, otherwise
+    the finest rollup whose bucket count fits the budget (hourly as a last
+    resort). Points are {ts, source, min, max, avg, count}, oldest first.
+    """
+    span = max(0, end_ts - start_ts)
+    params: list[Any] = [metric, start_ts, end_ts]
+    source_sql = ''
+    if source:
+        source_sql = ' AND source = ?'
+        params.append(source)
+
+    db = await get_db()
+    try:
+        # Bounded count over the (metric, ts) index
+        async with db.execute(
+            f'''SELECT COUNT(*) FROM (SELECT 1 FROM telemetry
+            WHERE metric = ? AND ts BETWEEN ? AND ?{source_sql} LIMIT ?)''',
+            params + [max_points + 1]
+        ) as cur:
+            raw_count = (await cur.fetchone())[0]
+
+        if raw_count <= max_points:
+            async with db.execute(
+                f'''SELECT ts, source, value, value, value, 1 FROM telemetry
+                WHERE metric = ? AND ts BETWEEN ? AND ?{source_sql} AND value IS NOT NULL
+                ORDER BY ts ASC''',
+                params
+            ) as cur:
+                rows = await cur.fetchall()
+            resolution = 0
+        else:
+            table, resolution = ROLLUPS[-1]
+            for candidate, seconds in ROLLUPS:
+                if span / seconds <= max_points:
+                    table, resolution = candidate, seconds
+                    break
+            # Include the bucket that contains start_ts
+            params[1] = (start_ts // resolution) * resolution
+            async with db.execute(
+                f'''SELECT bucket, source, min_value, max_value, sum_value / count, count FROM {table}
+                WHERE metric = ? AND bucket BETWEEN ? AND ?{source_sql}
+                ORDER BY bucket ASC''',
+                params
+            ) as cur:
+                rows = await cur.fetchall()
+    finally:
+        await db.close()
+
+    return {
+        'metric': metric,
+        'resolution': resolution,
+        'points': [
+            {'ts': ts, 'source': src, 'min': lo, 'max': hi, 'avg': avg, 'count': n}
+            for ts, src, lo, hi, avg, n in rows
+        ],
+    }
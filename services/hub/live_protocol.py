@@ -0,0 +1,112 @@
+"""
+Versioned live-data protocol for the hub WebSocket.
+
+Protocol v2 sends one full snapshot when a client connects and afterwards only
+the fields that changed, as a JSON merge patch (RFC 7386: nested objects hold
+just their changed keys, null removes a key). Every delta carries a
+monotonically increasing sequence number; a client that notices a gap, or
+reconnects, sends ``{"type": "resync", "seq": <last seen>}`` and gets either
+the missed deltas or a fresh snapshot.
+
+Messages are JSON-encoded once when they are produced and the same text is
+sent to every v2 client.
+"""
+
+import copy
+import json
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+PROTOCOL_VERSION = 2
+
+
+def merge_patch(old: Any, new: Any) -> Any:
+    """Return the merge patch that turns ``old`` into ``new``.
+
+    Returns ``None`` when nothing changed. Only dicts are diffed per key;
+    any other value that differs is replaced whole.
+    """
+    if not isinstance(old, dict) or not isinstance(new, dict):
+        return None if old == new else copy.deepcopy(new)
+    patch = {}
+    for key, value in new.items():
+        if key not in old:
+            patch[key] = copy.deepcopy(value)
+            continue
+        sub = merge_patch(old[key], value)
+        if sub is not None:
+            patch[key] = sub
+    for key in old:
+        if key not in new:
+            patch[key] = None
+    return patch or None
+
+
+def apply_merge_patch(target: Dict[str, Any], patch: Dict[str, Any]) -> Dict[str, Any]:
+    """Apply a merge patch to ``target`` in place and return it"""
+    for key, value in patch.items():
+        if value is None:
+            target.pop(key, None)
+        elif isinstance(value, dict) and isinstance(target.get(key), dict):
+            apply_merge_patch(target[key], value)
+        else:
+            target[key] = copy.deepcopy(value)
+    return target
+
+
+class LiveStateStream:
+    """Sequence-numbered stream of live_data deltas with a replay window"""
+
+    def __init__(self, initial: Dict[str, Any], history: int = 256):
+        self.seq = 0
+        self._state: Dict[str, Any] = copy.deepcopy(initial)
+        self._history: Deque[Tuple[int, str]] = deque(maxlen=history)
+        self._snapshot_text: Optional[str] = None
+
+    def update(self, fields: Dict[str, Any]) -> Optional[str]:
+        """Record new values for some top-level fields.
+
+        Returns the encoded delta message, or ``None`` if nothing changed.
+        """
+        patch = {}
+        for key, value in fields.items():
+            sub = merge_patch(self._state.get(key), value) if key in self._state else copy.deepcopy(value)
+            if sub is not None:
+                patch[key] = sub
+        if not patch:
+            return None
+
+        apply_merge_patch(self._state, patch)
+        self.seq += 1
+        self._snapshot_text = None
+        text = json.dumps({
+            'type': 'live_delta',
+            'v': PROTOCOL_VERSION,
+            'seq': self.seq,
+            'data': patch,
+        })
+        self._history.append((self.seq, text))
+        return text
+
+    def snapshot(self) -> str:
+        """Encoded full-state message at the current sequence number"""
+        if self._snapshot_text is None:
+            self._snapshot_text = json.dumps({
+                'type': 'live_snapshot',
+                'v': PROTOCOL_VERSION,
+                'seq': self.seq,
+                'data': self._state,
+            })
+        return self._snapshot_text
+
+    def resync(self, since_seq: Optional[int]) -> List[str]:
+        """Messages a client that last saw ``since_seq`` needs to catch up"""
+        if since_seq is None or since_seq > self.seq:
+            return [self.snapshot()]
+        if since_seq == self.seq:
+            return []
+        oldest = self._history[0][0] if self._history else self.seq + 1
+        if since_seq + 1 < oldest:
+            # Gap is older than the replay window
+            return [self.snapshot()]
+        return [text for seq, text in self._history if seq > since_seq]
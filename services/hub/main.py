@@ -1,13 +1,41 @@
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect
-from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi import FastAPI, Query, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 import os
+import sys
 import yaml
 import json
 import asyncio
+import csv
+import io
+import re
+import time
+from datetime import datetime
 from pathlib import Path
 
+try:
+    from . import db
+    from .mjpeg import FileFrameSource, FrameBroadcaster, RingFrameSource, MEDIA_TYPE as MJPEG_MEDIA_TYPE
+    from .retention import RetentionEngine
+    from .sensor_watcher import SensorWatcher
+    from .live_protocol import LiveStateStream, PROTOCOL_VERSION
+except ImportError:
+    import db
+    from mjpeg import FileFrameSource, FrameBroadcaster, RingFrameSource, MEDIA_TYPE as MJPEG_MEDIA_TYPE
+    from retention import RetentionEngine
+    from sensor_watcher import SensorWatcher
+    from live_protocol import LiveStateStream, PROTOCOL_VERSION
+
+try:
+    from services.sensors.sensor_bus import BusSubscriber
+    from services.sensors.frame_ring import JpegRingReader
+except ImportError:
+    # Run as a script from services/hub: make the repo root importable
+    sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+    from services.sensors.sensor_bus import BusSubscriber
+    from services.sensors.frame_ring import JpegRingReader
+
 app = FastAPI(title="Pulse Hub")
 
 # Allow local dashboard origin
@@ -59,18 +87,289 @@ live_data = {
     'camera_active': False
 }
 
+# When a sensor last reported each live_data field (unix time); the defaults
+# above have no entry until a sensor actually reports them
+live_reported = {}
+
 subscribers = set()
+# Subset of subscribers that negotiated the delta protocol (/ws?v=2)
+delta_subscribers = set()
+# One send at a time per socket: a v2 client's snapshot or resync catch-up
+# goes out whole before any live delta fanned out meanwhile
+send_locks = {}
+
+# Sensors publish typed messages on the local bus (sensor_bus.py). The cache
+# files they also write are watched (inotify, polling fallback) as a fallback,
+# and only the file that changed is re-read. Either way, only changed fields
+# are pushed to subscribers.
+SENSOR_DIR = Path('/opt/pulse/data/sensors')
+ENV_FILE = Path('/opt/pulse/.env')
+LIVE_REFRESH_INTERVAL = float(os.environ.get('LIVE_REFRESH_INTERVAL', '2'))
+
+sensor_watcher = None
+sensor_bus = None
+_background_tasks = set()
+
+# Numeric live_data fields sampled into telemetry, with their source sensor
+TELEMETRY_SAMPLE_INTERVAL = float(os.environ.get('TELEMETRY_SAMPLE_INTERVAL', '1'))
+# A field its sensor has not reported for this long is no longer sampled
+TELEMETRY_STALE_SECONDS = float(os.environ.get('TELEMETRY_STALE_SECONDS', '60'))
+TELEMETRY_METRICS = {
+    'people_count': 'camera',
+    'temperature': 'bme280',
+    'humidity': 'bme280',
+    'decibels': 'mic',
+    'light_level': 'light',
+}
+# Telemetry metric names (also used in export filenames)
+METRIC_NAME = re.compile(r'[A-Za-z0-9_.-]+')
+_sampler_task = None
+retention_engine = None
+
+# One in-memory frame buffer feeds every MJPEG viewer
+CAMERA_FRAME_FILE = Path('/opt/pulse/data/camera/latest_frame.jpg')
+# Viewer count for the camera service (see services/sensors/stream_viewers.py)
+CAMERA_VIEWERS_FILE = Path(os.environ.get('CAMERA_VIEWERS_FILE', '/opt/pulse/data/camera/viewers'))
+camera_frames = FrameBroadcaster()
+camera_source = None
+# JPEGs the camera service publishes in shared memory, when it runs
+camera_ring = RingFrameSource(JpegRingReader.attach, camera_frames)
+live_stream = LiveStateStream(live_data)
+
+async def _send(ws, text: str):
+    lock = send_locks.get(ws)
+    if lock is None:
+        await ws.send_text(text)
+        return
+    async with lock:
+        await ws.send_text(text)
+
+async def _fan_out(sockets, text: str):
+    """Send pre-encoded text to the given sockets concurrently, dropping dead ones"""
+    sockets = list(sockets)
+    if not sockets:
+        return
+    results = await asyncio.gather(
+        *(_send(ws, text) for ws in sockets),
+        return_exceptions=True
+    )
+    for ws, result in zip(sockets, results):
+        if isinstance(result, Exception):
+            subscribers.discard(ws)
+            delta_subscribers.discard(ws)
 
 async def broadcast(message: dict):
-    living = set()
-    for ws in list(subscribers):
+    """Encode message once and send it to every subscriber"""
+    if subscribers:
+        await _fan_out(subscribers, json.dumps(message))
+
+def _parse_people_count(text: str) -> dict:
+    return {'people_count': int(text.strip())}
+
+def _parse_bme280(text: str) -> dict:
+    bme_data = json.loads(text)
+    return {
+        'temperature': bme_data.get('temperature', 72.0),
+        'humidity': bme_data.get('humidity', 45.0),
+    }
+
+def _parse_audio_level(text: str) -> dict:
+    return {'decibels': float(text.strip())}
+
+def _parse_song(text: str) -> dict:
+    return {'song': json.loads(text)}
+
+def _parse_light_level(text: str) -> dict:
+    # Only add to live_data if numeric; front-end may not yet render
+    return {'light_level': float(text.strip())}
+
+def _parse_camera_active(text: str) -> dict:
+    return {'camera_active': text.strip().lower() == 'true'}
+
+def _parse_env(text: str) -> dict:
+    return {
+        'integrations': {
+            'nest_connected': 'NEST_' in text,
+            'hue_connected': 'HUE_' in text,
+            'spotify_connected': 'SPOTIFY_' in text,
+        }
+    }
+
+SENSOR_PARSERS = {
+    SENSOR_DIR / 'people_count.txt': _parse_people_count,
+    SENSOR_DIR / 'bme280.json': _parse_bme280,
+    SENSOR_DIR / 'audio_level.txt': _parse_audio_level,
+    SENSOR_DIR / 'song.json': _parse_song,
+    SENSOR_DIR / 'light_level.txt': _parse_light_level,
+    SENSOR_DIR / 'camera_active.txt': _parse_camera_active,
+    ENV_FILE: _parse_env,
+}
+
+def _read_sensor_files(paths):
+    """Parse the given sensor files into a dict of live_data fields.
+
+    Blocking file I/O; run it off the event loop. Fields whose file is missing
+    or unparsable are left out so the previous value is kept. Returns the
+    fields and, per field, when its file was written.
+    """
+    snapshot = {}
+    reported = {}
+    for path in paths:
+        parser = SENSOR_PARSERS.get(path)
+        if parser is None:
+            continue
         try:
-            await ws.send_json(message)
-            living.add(ws)
+            mtime = path.stat().st_mtime
+            fields = parser(path.read_text())
         except Exception:
-            pass
-    subscribers.clear()
-    subscribers.update(living)
+            continue
+        snapshot.update(fields)
+        reported.update(dict.fromkeys(fields, mtime))
+    return snapshot, reported
+
+# Bus messages map onto the same live_data fields as the files they replace
+BUS_FIELDS = {
+    'people_count': lambda m: {'people_count': m.count},
+    'environment': lambda m: {'temperature': m.temperature, 'humidity': m.humidity},
+    'audio_level': lambda m: {'decibels': m.decibels},
+    'song': lambda m: {'song': {
+        'title': m.title,
+        'artist': m.artist,
+        'detected': m.detected,
+        'timestamp': datetime.fromtimestamp(m.ts).isoformat(),
+    }},
+    'light_level': lambda m: {'light_level': m.lux},
+    'camera_status': lambda m: {'camera_active': m.active},
+}
+
+def _merge_live_fields(snapshot: dict, reported: dict) -> dict:
+    """Merge fields into live_data and return only those that changed.
+
+    ``reported`` maps each field to when its sensor produced it.
+    """
+    changed = {k: v for k, v in snapshot.items() if live_data.get(k) != v}
+    live_data.update(changed)
+    for field, ts in reported.items():
+        if ts > live_reported.get(field, 0.0):
+            live_reported[field] = ts
+    return changed
+
+async def refresh_live_data(paths=None) -> dict:
+    """Re-read sensor files (all by default) and merge them into live_data.
+
+    Returns only the fields whose value actually changed.
+    """
+    try:
+        snapshot, reported = await asyncio.to_thread(_read_sensor_files, paths or SENSOR_PARSERS)
+    except Exception as e:
+        print(f"Error reading sensor data: {e}")
+        return {}
+    return _merge_live_fields(snapshot, reported)
+
+async def _on_sensor_files_changed(paths):
+    await publish_live_changes(await refresh_live_data(paths))
+
+def _on_bus_message(msg):
+    to_fields = BUS_FIELDS.get(msg.topic)
+    if to_fields is None:
+        return
+    fields = to_fields(msg)
+    changed = _merge_live_fields(fields, dict.fromkeys(fields, msg.ts))
+    if changed:
+        task = asyncio.create_task(publish_live_changes(changed))
+        _background_tasks.add(task)
+        task.add_done_callback(_background_tasks.discard)
+
+async def publish_live_changes(changed: dict):
+    """Push changed live_data fields to v1 and v2 subscribers"""
+    if not changed:
+        return
+    delta = live_stream.update(changed)
+    legacy = subscribers - delta_subscribers
+    sends = []
+    if legacy:
+        # v1 clients merge live_data messages, so a partial dict is a valid delta
+        sends.append(_fan_out(legacy, json.dumps({'type': 'live_data', 'data': changed})))
+    if delta is not None and delta_subscribers:
+        sends.append(_fan_out(delta_subscribers, delta))
+    if sends:
+        await asyncio.gather(*sends)
+
+@app.on_event('startup')
+async def start_sensor_inputs():
+    global sensor_watcher, sensor_bus
+    live_stream.update(await refresh_live_data())
+    try:
+        sensor_bus = BusSubscriber('hub', _on_bus_message)
+        await sensor_bus.start()
+    except OSError as e:
+        # Files remain the fallback path when the bus socket cannot be bound
+        print(f"Sensor bus unavailable: {e}")
+        sensor_bus = None
+    sensor_watcher = SensorWatcher(
+        SENSOR_PARSERS,
+        _on_sensor_files_changed,
+        poll_interval=LIVE_REFRESH_INTERVAL
+    )
+    await sensor_watcher.start()
+
+async def _telemetry_sampler(writer):
+    """Log every numeric sensor field at a fixed rate through the batched writer.
+
+    Only fields a sensor has reported within TELEMETRY_STALE_SECONDS are
+    logged; live_data defaults and values from a stopped sensor are not.
+    """
+    while True:
+        now = time.time()
+        ts = int(now)
+        for metric, source in TELEMETRY_METRICS.items():
+            if now - live_reported.get(metric, float('-inf')) > TELEMETRY_STALE_SECONDS:
+                continue
+            value = live_data.get(metric)
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                await writer.submit(ts, source, metric, float(value))
+        await asyncio.sleep(TELEMETRY_SAMPLE_INTERVAL)
+
+@app.on_event('startup')
+async def start_telemetry():
+    global _sampler_task, retention_engine
+    try:
+        writer = await db.start_writer()
+    except Exception as e:
+        print(f"Telemetry logging disabled: {e}")
+        return
+    _sampler_task = asyncio.create_task(_telemetry_sampler(writer))
+    retention_engine = RetentionEngine(config.get('telemetry'))
+    retention_engine.start()
+
+@app.on_event('shutdown')
+async def stop_telemetry():
+    if retention_engine is not None:
+        await retention_engine.stop()
+    if _sampler_task is not None:
+        _sampler_task.cancel()
+    # Flushes everything still queued
+    await db.stop_writer()
+
+@app.on_event('startup')
+async def start_camera_source():
+    global camera_source
+    camera_source = FileFrameSource(CAMERA_FRAME_FILE, camera_frames, viewers_path=CAMERA_VIEWERS_FILE)
+    await camera_source.start()
+    await camera_ring.start()
+
+@app.on_event('shutdown')
+async def stop_camera_source():
+    await camera_ring.stop()
+    if camera_source is not None:
+        await camera_source.stop()
+
+@app.on_event('shutdown')
+async def stop_sensor_inputs():
+    if sensor_bus is not None:
+        await sensor_bus.stop()
+    if sensor_watcher is not None:
+        await sensor_watcher.stop()
 
 @app.get('/health')
 async def health():
@@ -82,91 +381,128 @@ async def get_config():
 
 @app.get('/live')
 async def get_live_data():
-    """Get current live sensor data"""
-    # Try to read from database or sensor cache files
-    try:
-        # Check for sensor data files
-        sensor_dir = Path('/opt/pulse/data/sensors')
-        if sensor_dir.exists():
-            # Read people count
-            people_file = sensor_dir / 'people_count.txt'
-            if people_file.exists():
-                try:
-                    live_data['people_count'] = int(people_file.read_text().strip())
-                except Exception:
-                    pass
-            
-            # Read temperature/humidity
-            bme_file = sensor_dir / 'bme280.json'
-            if bme_file.exists():
-                try:
-                    bme_data = json.loads(bme_file.read_text())
-                    live_data['temperature'] = bme_data.get('temperature', 72.0)
-                    live_data['humidity'] = bme_data.get('humidity', 45.0)
-                except Exception:
-                    pass
-            
-            # Read decibels
-            audio_file = sensor_dir / 'audio_level.txt'
-            if audio_file.exists():
-                try:
-                    live_data['decibels'] = float(audio_file.read_text().strip())
-                except Exception:
-                    pass
-            
-            # Read song detection
-            song_file = sensor_dir / 'song.json'
-            if song_file.exists():
-                try:
-                    song_data = json.loads(song_file.read_text())
-                    live_data['song'] = song_data
-                except Exception:
-                    pass
-            
-            # Read light level if present (written by light service)
-            light_file = sensor_dir / 'light_level.txt'
-            if light_file.exists():
-                try:
-                    # Only add to live_data if numeric; front-end may not yet render
-                    live_data['light_level'] = float(light_file.read_text().strip())
-                except Exception:
-                    pass
-            
-            # Check camera status
-            camera_file = sensor_dir / 'camera_active.txt'
-            if camera_file.exists():
-                try:
-                    live_data['camera_active'] = camera_file.read_text().strip().lower() == 'true'
-                except Exception:
-                    pass
-        
-        # Check integration connections
-        try:
-            from pathlib import Path
-            env_file = Path('/opt/pulse/.env')
-            if env_file.exists():
-                env_content = env_file.read_text()
-                live_data['integrations']['nest_connected'] = 'NEST_' in env_content
-                live_data['integrations']['hue_connected'] = 'HUE_' in env_content
-                live_data['integrations']['spotify_connected'] = 'SPOTIFY_' in env_content
-        except Exception:
-            pass
-            
-    except Exception as e:
-        print(f"Error reading sensor data: {e}")
-    
+    """Get current live sensor data (as of the last sensor update)"""
     return JSONResponse(live_data)
 
+TELEMETRY_COLUMNS = ('ts', 'source', 'metric', 'value', 'data')
+TELEMETRY_MEDIA_TYPES = {
+    'json': 'application/json',
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+# Rows per chunk handed to the response; keeps writes large and memory flat
+TELEMETRY_STREAM_CHUNK = 500
+
+async def _encode_telemetry(rows, fmt: str):
+    """Encode an async row iterator as json/ndjson/csv text chunks"""
+    out = io.StringIO()
+    writer = csv.writer(out) if fmt == 'csv' else None
+    if writer is not None:
+        writer.writerow(TELEMETRY_COLUMNS)
+    elif fmt == 'json':
+        out.write('[')
+    first = True
+    pending = 0
+    async for row in rows:
+        if writer is not None:
+            writer.writerow(row)
+        else:
+            record = json.dumps(dict(zip(TELEMETRY_COLUMNS, row)))
+            if fmt == 'json':
+                out.write(record if first else ',' + record)
+            else:
+                out.write(record + '\n')
+        first = False
+        pending += 1
+        if pending >= TELEMETRY_STREAM_CHUNK:
+            yield out.getvalue()
+            out.seek(0)
+            out.truncate()
+            pending = 0
+    if fmt == 'json':
+        out.write(']')
+    yield out.getvalue()
+
+def _telemetry_range(start, end):
+    """Default to the last hour when no range is given"""
+    end = int(time.time()) if end is None else end
+    start = end - 3600 if start is None else start
+    return start, end
+
+def _stream_telemetry(metric, source, start, end, limit, fmt, filename=None):
+    if fmt not in TELEMETRY_MEDIA_TYPES:
+        return JSONResponse({'error': f"format must be one of {sorted(TELEMETRY_MEDIA_TYPES)}"}, status_code=400)
+    start, end = _telemetry_range(start, end)
+    rows = db.iter_telemetry(metric=metric, source=source, start_ts=start, end_ts=end, limit=limit)
+    headers = {}
+    if filename:
+        headers['Content-Disposition'] = f'attachment; filename="{filename}.{fmt}"'
+    return StreamingResponse(_encode_telemetry(rows, fmt), media_type=TELEMETRY_MEDIA_TYPES[fmt], headers=headers)
+
+@app.get('/telemetry')
+async def get_telemetry(
+    metric: str = None,
+    source: str = None,
+    start: int = None,
+    end: int = None,
+    limit: int = Query(10000, ge=1, le=1_000_000),
+    format: str = 'json',
+):
+    """Raw telemetry rows in [start, end] (unix seconds), streamed oldest first"""
+    return _stream_telemetry(metric, source, start, end, limit, format)
+
+@app.get('/telemetry/series')
+async def get_telemetry_series(
+    metric: str,
+    source: str = None,
+    start: int = None,
+    end: int = None,
+    max_points: int = Query(500, ge=1, le=10000),
+):
+    """Downsampled min/max/avg series, using the rollup that fits max_points"""
+    start, end = _telemetry_range(start, end)
+    return JSONResponse(await db.query_telemetry_series(metric, start, end, max_points, source))
+
+@app.get('/telemetry/export')
+async def export_telemetry(
+    metric: str = None,
+    source: str = None,
+    start: int = None,
+    end: int = None,
+    format: str = 'csv',
+):
+    """Download raw telemetry as CSV or NDJSON; no row limit, streamed"""
+    if format not in ('csv', 'ndjson'):
+        return JSONResponse({'error': "format must be 'csv' or 'ndjson'"}, status_code=400)
+    if metric is not None and not METRIC_NAME.fullmatch(metric):
+        # The metric ends up in the Content-Disposition filename
+        return JSONResponse({'error': 'metric may only contain letters, digits, _ . -'}, status_code=400)
+    return _stream_telemetry(metric, source, start, end, None, format, filename=f"telemetry_{metric or 'all'}")
+
 @app.get('/camera/stream')
 async def camera_stream():
-    """Serve latest camera frame as JPEG"""
+    """Live MJPEG (multipart/x-mixed-replace) stream of the camera"""
+    return StreamingResponse(camera_frames.stream(), media_type=MJPEG_MEDIA_TYPE)
+
+@app.get('/camera/stats')
+async def camera_stats():
+    return {
+        **camera_frames.stats(),
+        'ring_attached': camera_ring.ring is not None,
+        'ring_frames_streamed': camera_ring.frames_streamed,
+    }
+
+@app.get('/camera/snapshot')
+async def camera_snapshot():
+    """Serve latest camera frame as a single JPEG"""
+    jpeg = camera_ring.snapshot()
+    if jpeg is not None:
+        return Response(jpeg, media_type='image/jpeg')
+    if camera_frames.jpeg is not None:
+        return Response(camera_frames.jpeg, media_type='image/jpeg')
     try:
-        frame_path = Path('/opt/pulse/data/camera/latest_frame.jpg')
-        if frame_path.exists():
-            return StreamingResponse(
-                open(frame_path, 'rb'),
-                media_type='image/jpeg'
-            )
+        if CAMERA_FRAME_FILE.exists():
+            return Response(await asyncio.to_thread(CAMERA_FRAME_FILE.read_bytes), media_type='image/jpeg')
     except Exception:
         pass
     # Return a placeholder 1x1 transparent pixel if no camera
@@ -183,36 +519,51 @@ async def toggle(body: TogglePayload):
 
 @app.websocket('/ws')
 async def ws_endpoint(ws: WebSocket):
+    """Live updates.
+
+    Plain /ws (v1) receives live_data messages with the changed fields.
+    /ws?v=2 receives one live_snapshot, then sequence-numbered live_delta
+    merge patches; send {"type": "resync", "seq": n} to catch up after a gap.
+    Deltas fanned out while a snapshot or catch-up is being sent follow it,
+    and may repeat sequence numbers it already covered.
+    """
     await ws.accept()
-    subscribers.add(ws)
     try:
-        # Send initial state
-        await ws.send_json({'type': 'auto_state', 'data': auto_state})
-        await ws.send_json({'type': 'live_data', 'data': live_data})
-        
-        # Background task to send live updates every 2 seconds
-        async def send_updates():
-            while True:
-                try:
-                    await asyncio.sleep(2)
-                    # Re-fetch live data
-                    await get_live_data()  # This updates live_data dict
-                    await ws.send_json({'type': 'live_data', 'data': live_data})
-                except Exception:
-                    break
-        
-        # Start background updates
-        update_task = asyncio.create_task(send_updates())
-        
-        # Keep connection alive
+        version = int(ws.query_params.get('v', '1'))
+    except ValueError:
+        version = 1
+    lock = send_locks[ws] = asyncio.Lock()
+    try:
+        # Send initial state, then let the sensor watcher push updates
+        async with lock:
+            await ws.send_json({'type': 'auto_state', 'data': auto_state})
+            if version >= PROTOCOL_VERSION:
+                # Subscribed first, so no delta after the snapshot is missed
+                delta_subscribers.add(ws)
+                await ws.send_text(live_stream.snapshot())
+            else:
+                await ws.send_json({'type': 'live_data', 'data': live_data})
+            subscribers.add(ws)
+
         while True:
-            await ws.receive_text()
+            text = await ws.receive_text()
+            if ws not in delta_subscribers:
+                continue
+            try:
+                msg = json.loads(text)
+            except ValueError:
+                continue
+            if isinstance(msg, dict) and msg.get('type') == 'resync':
+                seq = msg.get('seq')
+                async with lock:
+                    for catch_up in live_stream.resync(seq if isinstance(seq, int) else None):
+                        await ws.send_text(catch_up)
     except WebSocketDisconnect:
         pass
     finally:
-        if 'update_task' in locals():
-            update_task.cancel()
         subscribers.discard(ws)
+        delta_subscribers.discard(ws)
+        send_locks.pop(ws, None)
 
 if __name__ == '__main__':
     import uvicorn
@@ -0,0 +1,246 @@
+"""
+MJPEG streaming for the hub camera endpoint.
+
+A FrameBroadcaster holds only the latest frame, already wrapped as a
+multipart/x-mixed-replace part, so each frame is prepared once however many
+viewers are connected. Every viewer waits for a newer frame than the one it
+last sent; a viewer that is slower than the camera simply skips the frames it
+missed instead of queueing them.
+
+The viewer count is also written to a small file so the camera service can
+skip drawing its tracking overlay while nobody is watching.
+
+Frames come already encoded from the camera service, through shared memory
+(RingFrameSource) or, without one, from a JPEG file (FileFrameSource).
+"""
+
+import asyncio
+import logging
+import os
+import time
+from pathlib import Path
+from typing import AsyncIterator, Callable, Optional
+
+try:
+    from .sensor_watcher import SensorWatcher
+except ImportError:
+    from sensor_watcher import SensorWatcher
+
+logger = logging.getLogger(__name__)
+
+BOUNDARY = 'frame'
+MEDIA_TYPE = f'multipart/x-mixed-replace; boundary={BOUNDARY}'
+
+
+def _multipart_part(jpeg: bytes) -> bytes:
+    header = (
+        f'--{BOUNDARY}\r\n'
+        'Content-Type: image/jpeg\r\n'
+        f'Content-Length: {len(jpeg)}\r\n\r\n'
+    ).encode()
+    return header + jpeg + b'\r\n'
+
+
+class FrameBroadcaster:
+    """Latest-frame buffer shared by all MJPEG viewers"""
+
+    def __init__(self):
+        self.jpeg: Optional[bytes] = None
+        self.seq = 0
+        self.viewers = 0
+        self.frames_sent = 0
+        self.frames_skipped = 0
+        self._part: Optional[bytes] = None
+        self._cond: Optional[asyncio.Condition] = None
+        self._on_first_viewer = None
+        self._on_viewer_count = None
+
+    def _condition(self) -> asyncio.Condition:
+        # Created lazily so it binds to the running loop
+        if self._cond is None:
+            self._cond = asyncio.Condition()
+        return self._cond
+
+    def on_first_viewer(self, callback) -> None:
+        """Register an async callback run when the viewer count goes 0 -> 1"""
+        self._on_first_viewer = callback
+
+    def on_viewer_count(self, callback) -> None:
+        """Register a (sync) callback run with the new count whenever it changes"""
+        self._on_viewer_count = callback
+
+    def _viewers_changed(self) -> None:
+        if self._on_viewer_count is not None:
+            try:
+                self._on_viewer_count(self.viewers)
+            except Exception as e:
+                logger.warning(f"Viewer count callback failed: {e}")
+
+    async def publish(self, jpeg: bytes) -> None:
+        cond = self._condition()
+        async with cond:
+            self.jpeg = jpeg
+            self._part = _multipart_part(jpeg)
+            self.seq += 1
+            cond.notify_all()
+
+    async def stream(self) -> AsyncIterator[bytes]:
+        """Multipart body for one viewer; ends when the client disconnects"""
+        cond = self._condition()
+        self.viewers += 1
+        self._viewers_changed()
+        try:
+            if self.viewers == 1 and self._on_first_viewer is not None:
+                await self._on_first_viewer()
+            last_seq = 0
+            while True:
+                async with cond:
+                    await cond.wait_for(lambda: self.seq != last_seq)
+                    if last_seq:
+                        self.frames_skipped += self.seq - last_seq - 1
+                    last_seq = self.seq
+                    part = self._part
+                yield part
+                self.frames_sent += 1
+        finally:
+            self.viewers -= 1
+            self._viewers_changed()
+
+    def stats(self) -> dict:
+        return {
+            'viewers': self.viewers,
+            'seq': self.seq,
+            'frames_sent': self.frames_sent,
+            'frames_skipped': self.frames_skipped,
+        }
+
+
+def write_viewer_count(path: Path, count: int) -> None:
+    """Atomically replace the viewer count file read by the camera service"""
+    tmp = path.with_name(path.name + '.tmp')
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp.write_text(str(count))
+        os.replace(tmp, path)
+    except OSError as e:
+        logger.warning(f"Could not write viewer count to {path}: {e}")
+
+
+class FileFrameSource:
+    """Feed a broadcaster from the JPEG the camera service writes to disk.
+
+    The file is watched (inotify, polling fallback) and read only while at
+    least one viewer is connected. With ``viewers_path`` the current viewer
+    count is kept in that file for the camera service.
+    """
+
+    def __init__(self, path: Path, broadcaster: FrameBroadcaster, poll_interval: float = 0.5,
+                 viewers_path: Optional[Path] = None):
+        self.path = Path(path)
+        self.broadcaster = broadcaster
+        self.viewers_path = Path(viewers_path) if viewers_path else None
+        self._watcher = SensorWatcher([self.path], self._on_change, poll_interval=poll_interval)
+        broadcaster.on_first_viewer(self.load)
+        if self.viewers_path is not None:
+            broadcaster.on_viewer_count(lambda count: write_viewer_count(self.viewers_path, count))
+
+    async def load(self) -> None:
+        try:
+            jpeg = await asyncio.to_thread(self.path.read_bytes)
+        except OSError:
+            return
+        if jpeg:
+            await self.broadcaster.publish(jpeg)
+
+    async def _on_change(self, paths) -> None:
+        if self.broadcaster.viewers:
+            await self.load()
+
+    async def start(self) -> None:
+        if self.viewers_path is not None:
+            # Clear a count left over from before a restart
+            write_viewer_count(self.viewers_path, self.broadcaster.viewers)
+        await self._watcher.start()
+
+    async def stop(self) -> None:
+        await self._watcher.stop()
+        if self.viewers_path is not None:
+            write_viewer_count(self.viewers_path, 0)
+
+
+class RingFrameSource:
+    """Feed a broadcaster from the JPEGs the camera service publishes in shared memory.
+
+    The camera service encodes each frame once (services/sensors/frame_publisher.py);
+    while at least one viewer is connected, the newest JPEG is copied out of
+    the ring and broadcast as is, at up to ``fps`` frames per second.
+    ``open_ring`` returns an attached JPEG ring reader, or None while the
+    camera service is not running; a ring that stops advancing is
+    re-attached, in case the camera service restarted with a new one.
+    """
+
+    def __init__(self, open_ring: Callable, broadcaster: FrameBroadcaster, fps: float = 15.0,
+                 stale_seconds: float = 15.0):
+        self.open_ring = open_ring
+        self.broadcaster = broadcaster
+        self.interval = 1.0 / fps
+        self.stale_seconds = stale_seconds
+        self.ring = None
+        self.frames_streamed = 0
+        self._last_seq = 0
+        self._last_change = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    def _attach(self) -> bool:
+        if self.ring is None:
+            self.ring = self.open_ring()
+            self._last_seq = 0
+            self._last_change = time.monotonic()
+        return self.ring is not None
+
+    def _detach(self) -> None:
+        if self.ring is not None:
+            self.ring.close()
+            self.ring = None
+
+    def snapshot(self) -> Optional[bytes]:
+        """Newest published JPEG, or None without a live ring"""
+        if not self._attach():
+            return None
+        latest = self.ring.latest()
+        if latest is None or time.time() - latest[1] > self.stale_seconds:
+            # Camera service stopped; its last frame is no snapshot
+            self._detach()
+            return None
+        return latest[2]
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            if not self.broadcaster.viewers:
+                continue
+            if not self._attach():
+                await asyncio.sleep(2.0)
+                continue
+            latest = self.ring.latest(self._last_seq)
+            if latest is None:
+                if time.monotonic() - self._last_change > self.stale_seconds:
+                    self._detach()
+                continue
+            self._last_seq, _, jpeg, _ = latest
+            self._last_change = time.monotonic()
+            self.frames_streamed += 1
+            await self.broadcaster.publish(jpeg)
+
+    async def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self._detach()
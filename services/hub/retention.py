@@ -0,0 +1,252 @@
+"""
+Telemetry retention for pulse.db.
+
+Driven by the ``telemetry.retention`` / ``telemetry.archive`` sections of
+config.yaml. Expired rows are removed in bounded chunks, with a commit and a
+short pause after each chunk, so the telemetry writer is never locked out for
+long. Freed pages are returned with incremental vacuum. When archiving is
+enabled, each expired UTC day is first exported to a gzip CSV (or Parquet,
+if pyarrow is installed) file under the archive directory.
+"""
+
+import asyncio
+import csv
+import gzip
+import logging
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+try:
+    from . import db
+except ImportError:
+    import db
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    PARQUET_AVAILABLE = True
+except ImportError:
+    PARQUET_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+DAY = 86400
+
+# Config key -> (table, time column, columns exported)
+RETENTION_TABLES = {
+    'raw_days': ('telemetry', 'ts', ['ts', 'source', 'metric', 'value', 'data']),
+    'rollup_1m_days': ('telemetry_1m', 'bucket', ['bucket', 'source', 'metric', 'min_value', 'max_value', 'sum_value', 'count']),
+    'rollup_15m_days': ('telemetry_15m', 'bucket', ['bucket', 'source', 'metric', 'min_value', 'max_value', 'sum_value', 'count']),
+    'rollup_1h_days': ('telemetry_1h', 'bucket', ['bucket', 'source', 'metric', 'min_value', 'max_value', 'sum_value', 'count']),
+}
+
+DEFAULT_RETENTION = {
+    'raw_days': 7,
+    'rollup_1m_days': 90,
+    'rollup_15m_days': 365,
+    'rollup_1h_days': None,   # keep forever
+    'chunk_rows': 5000,
+    'chunk_pause_ms': 50,
+    'vacuum_pages': 1000,
+    'interval_minutes': 60,
+}
+
+DEFAULT_ARCHIVE = {
+    'enabled': False,
+    'format': 'csv',
+    'path': '/opt/pulse/data/archive',
+}
+
+
+class RetentionEngine:
+    """Periodically expire, archive and compact telemetry tables"""
+
+    def __init__(self, telemetry_config: Optional[Dict[str, Any]] = None):
+        telemetry_config = telemetry_config or {}
+        self.retention = dict(DEFAULT_RETENTION, **(telemetry_config.get('retention') or {}))
+        self.archive = dict(DEFAULT_ARCHIVE, **(telemetry_config.get('archive') or {}))
+
+        self.archive_format = str(self.archive.get('format', 'csv')).lower()
+        if self.archive_format == 'parquet' and not PARQUET_AVAILABLE:
+            logger.warning("pyarrow not installed, archiving telemetry as CSV instead of Parquet")
+            self.archive_format = 'csv'
+
+        self.chunk_rows = max(1, int(self.retention['chunk_rows']))
+        self.chunk_pause = max(0.0, float(self.retention['chunk_pause_ms']) / 1000.0)
+        self._task: Optional[asyncio.Task] = None
+
+    # ------------------------------- public ------------------------------ #
+    async def run_once(self, now: Optional[float] = None) -> Dict[str, int]:
+        """One retention pass; returns rows deleted per table"""
+        now = time.time() if now is None else now
+        deleted: Dict[str, int] = {}
+        conn = await db.get_db()
+        try:
+            for key, (table, column, columns) in RETENTION_TABLES.items():
+                days = self.retention.get(key)
+                if days is None:
+                    continue
+                # Whole UTC days only, so each archived partition is complete
+                cutoff = int((now - float(days) * DAY) // DAY * DAY)
+                deleted[table] = await self._expire_table(conn, table, column, columns, cutoff)
+            if any(deleted.values()):
+                await self._compact(conn)
+        finally:
+            await conn.close()
+        if any(deleted.values()):
+            logger.info(f"Telemetry retention removed {deleted}")
+        return deleted
+
+    async def run_forever(self):
+        interval = max(60.0, float(self.retention['interval_minutes']) * 60.0)
+        while True:
+            try:
+                await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Telemetry retention pass failed: {e}")
+            await asyncio.sleep(interval)
+
+    def start(self):
+        self._task = asyncio.create_task(self.run_forever())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    # ------------------------------ internals ---------------------------- #
+    async def _expire_table(self, conn, table: str, column: str, columns: List[str], cutoff: int) -> int:
+        total = 0
+        while True:
+            async with conn.execute(f'SELECT MIN({column}) FROM {table} WHERE {column} < ?', (cutoff,)) as cur:
+                oldest = (await cur.fetchone())[0]
+            if oldest is None:
+                return total
+            # Work one UTC day (partition) at a time
+            day_start = int(oldest // DAY * DAY)
+            day_end = min(day_start + DAY, cutoff)
+            if self.archive.get('enabled'):
+                await self._export_partition(conn, table, column, columns, day_start, day_end)
+            total += await self._delete_range(conn, table, column, day_start, day_end)
+
+    async def _delete_range(self, conn, table: str, column: str, start: int, end: int) -> int:
+        # telemetry has a rowid; the WITHOUT ROWID rollups are keyed by their PK
+        key = 'id' if table == 'telemetry' else '(metric, bucket, source)'
+        key_cols = 'id' if table == 'telemetry' else 'metric, bucket, source'
+        total = 0
+        while True:
+            cur = await conn.execute(
+                f'''DELETE FROM {table} WHERE {key} IN (
+                    SELECT {key_cols} FROM {table} WHERE {column} >= ? AND {column} < ? LIMIT ?
+                )''',
+                (start, end, self.chunk_rows)
+            )
+            count = cur.rowcount
+            await cur.close()
+            await conn.commit()
+            total += count
+            if count < self.chunk_rows:
+                return total
+            # Let the telemetry writer take the lock between chunks
+            await asyncio.sleep(self.chunk_pause)
+
+    def _archive_file(self, table: str, day_start: int) -> Path:
+        day = datetime.fromtimestamp(day_start, tz=timezone.utc).strftime('%Y-%m-%d')
+        suffix = 'parquet' if self.archive_format == 'parquet' else 'csv.gz'
+        directory = Path(self.archive['path']) / table
+        directory.mkdir(parents=True, exist_ok=True)
+        path = directory / f"{day}.{suffix}"
+        n = 1
+        while path.exists():
+            # A later pass can expire the rest of a day already partly archived
+            path = directory / f"{day}_{n}.{suffix}"
+            n += 1
+        return path
+
+    async def _export_partition(self, conn, table: str, column: str, columns: List[str], start: int, end: int):
+        path = self._archive_file(table, start)
+        sql = f'SELECT {", ".join(columns)} FROM {table} WHERE {column} >= ? AND {column} < ? ORDER BY {column}'
+        tmp = path.with_name(path.name + '.part')
+        writer = _ParquetSink(tmp, columns) if self.archive_format == 'parquet' else _CsvSink(tmp, columns)
+        rows_written = 0
+        try:
+            async with conn.execute(sql, (start, end)) as cur:
+                while True:
+                    rows = await cur.fetchmany(self.chunk_rows)
+                    if not rows:
+                        break
+                    await asyncio.to_thread(writer.write, rows)
+                    rows_written += len(rows)
+            await asyncio.to_thread(writer.close)
+        except Exception:
+            await asyncio.to_thread(writer.close)
+            tmp.unlink(missing_ok=True)
+            raise
+        if rows_written:
+            tmp.rename(path)
+            logger.info(f"Archived {rows_written} {table} rows to {path}")
+        else:
+            tmp.unlink(missing_ok=True)
+
+    async def _compact(self, conn):
+        async with conn.execute('PRAGMA auto_vacuum') as cur:
+            mode = (await cur.fetchone())[0]
+        if mode != 2:
+            logger.info("pulse.db is not in incremental auto_vacuum mode; run VACUUM once to enable page reclaim")
+        else:
+            pages = max(1, int(self.retention['vacuum_pages']))
+            previous = None
+            while True:
+                async with conn.execute('PRAGMA freelist_count') as cur:
+                    free = (await cur.fetchone())[0]
+                if free == 0 or free == previous:
+                    break
+                previous = free
+                # The pragma frees one page per step, and execute() stops a
+                # statement without result columns after its first step;
+                # executescript runs it to completion (and commits)
+                await conn.executescript(f'PRAGMA incremental_vacuum({pages});')
+                await asyncio.sleep(self.chunk_pause)
+        # Fold the WAL back into the main file so it does not stay large
+        await conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+
+
+class _CsvSink:
+    def __init__(self, path: Path, columns: List[str]):
+        self._fh = gzip.open(path, 'wt', newline='')
+        self._writer = csv.writer(self._fh)
+        self._writer.writerow(columns)
+
+    def write(self, rows):
+        self._writer.writerows(rows)
+
+    def close(self):
+        if not self._fh.closed:
+            self._fh.close()
+
+
+class _ParquetSink:
+    TYPES = {
+        'ts': 'int64', 'bucket': 'int64', 'count': 'int64',
+        'source': 'string', 'metric': 'string', 'data': 'string',
+        'value': 'float64', 'min_value': 'float64', 'max_value': 'float64', 'sum_value': 'float64',
+    }
+
+    def __init__(self, path: Path, columns: List[str]):
+        self._columns = columns
+        # Explicit schema: a chunk of all-NULL data must not decide the type
+        self._schema = pa.schema([(name, self.TYPES[name]) for name in columns])
+        self._writer = pq.ParquetWriter(str(path), self._schema, compression='zstd')
+
+    def write(self, rows):
+        columns = {name: [row[i] for row in rows] for i, name in enumerate(self._columns)}
+        self._writer.write_table(pa.table(columns, schema=self._schema))
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
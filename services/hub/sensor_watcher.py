@@ -0,0 +1,224 @@
+"""
+Sensor file watcher for the Pulse hub.
+
+Watches the cache files written by the sensor services and reports which of
+them changed, so the hub re-reads only those files. Uses Linux inotify through
+ctypes (no extra dependency); when inotify is unavailable, or a directory
+cannot be watched, it falls back to cheap os.stat() polling.
+"""
+
+import asyncio
+import ctypes
+import ctypes.util
+import logging
+import os
+import struct
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, Iterable, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# inotify constants from <sys/inotify.h>
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+
+# Sensors write with write_text() (close-after-write) or an atomic rename
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_TO | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF
+
+_EVENT_HEADER = struct.Struct('iIII')
+_READ_SIZE = 64 * 1024
+
+ChangeCallback = Callable[[Set[Path]], Awaitable[None]]
+
+
+def _load_libc():
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        libc.inotify_init1  # noqa: B018 - raises AttributeError off Linux
+        libc.inotify_add_watch
+        return libc
+    except (OSError, AttributeError):
+        return None
+
+
+class SensorWatcher:
+    """Report changed sensor files via inotify, with a polling fallback.
+
+    Events are coalesced: if a file changes several times before the callback
+    runs, the callback sees it once. The callback is never run concurrently
+    with itself.
+    """
+
+    def __init__(self, files: Iterable[Path], on_change: ChangeCallback, poll_interval: float = 2.0):
+        self.files: Set[Path] = {Path(f) for f in files}
+        self.on_change = on_change
+        self.poll_interval = poll_interval
+
+        self._fd: Optional[int] = None
+        self._wd_dirs: Dict[int, Path] = {}
+        self._polled: Set[Path] = set()
+        self._stat_cache: Dict[Path, Optional[Tuple[int, int]]] = {}
+
+        self._pending: Set[Path] = set()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._tasks: list = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @property
+    def mode(self) -> str:
+        if self._fd is None:
+            return 'polling'
+        return 'inotify' if not self._polled else 'mixed'
+
+    def _directories(self) -> Set[Path]:
+        return {f.parent for f in self.files}
+
+    # ------------------------------ inotify ------------------------------ #
+    def _start_inotify(self) -> None:
+        libc = _load_libc()
+        if libc is None:
+            logger.info("inotify not available, polling sensor files")
+            self._polled = set(self.files)
+            return
+
+        fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if fd < 0:
+            err = ctypes.get_errno()
+            logger.warning(f"inotify_init1 failed ({os.strerror(err)}), polling sensor files")
+            self._polled = set(self.files)
+            return
+        self._fd = fd
+
+        for directory in self._directories():
+            self._add_watch(libc, directory)
+
+        self._loop.add_reader(fd, self._on_readable)
+        logger.info(f"Watching sensor files with inotify ({len(self._wd_dirs)} directories)")
+
+    def _add_watch(self, libc, directory: Path) -> bool:
+        wd = -1
+        if directory.is_dir():
+            wd = libc.inotify_add_watch(self._fd, os.fsencode(str(directory)), WATCH_MASK)
+        if wd < 0:
+            # Missing or unwatchable directory: poll its files until it appears
+            self._polled.update(f for f in self.files if f.parent == directory)
+            return False
+        self._wd_dirs[wd] = directory
+        self._polled.difference_update(f for f in self.files if f.parent == directory)
+        return True
+
+    def _on_readable(self) -> None:
+        changed: Set[Path] = set()
+        while True:
+            try:
+                buf = os.read(self._fd, _READ_SIZE)
+            except BlockingIOError:
+                break
+            except OSError as e:
+                logger.error(f"inotify read failed: {e}")
+                break
+            if not buf:
+                break
+            offset = 0
+            while offset + _EVENT_HEADER.size <= len(buf):
+                wd, mask, _cookie, length = _EVENT_HEADER.unpack_from(buf, offset)
+                offset += _EVENT_HEADER.size
+                name = buf[offset:offset + length].rstrip(b'\0')
+                offset += length
+
+                if mask & IN_Q_OVERFLOW:
+                    # Kernel dropped events; re-read everything once
+                    changed.update(self.files)
+                    continue
+                directory = self._wd_dirs.get(wd)
+                if directory is None:
+                    continue
+                if mask & (IN_DELETE_SELF | IN_MOVE_SELF | IN_IGNORED):
+                    # Directory went away; fall back to polling its files
+                    del self._wd_dirs[wd]
+                    self._polled.update(f for f in self.files if f.parent == directory)
+                    continue
+                path = directory / os.fsdecode(name)
+                if path in self.files:
+                    changed.add(path)
+        if changed:
+            self._schedule(changed)
+
+    # ------------------------------ polling ------------------------------ #
+    @staticmethod
+    def _stat(path: Path) -> Optional[Tuple[int, int]]:
+        try:
+            st = path.stat()
+            return (st.st_mtime_ns, st.st_size)
+        except OSError:
+            return None
+
+    def _poll_once(self, paths: Iterable[Path]) -> Set[Path]:
+        changed: Set[Path] = set()
+        for path in paths:
+            current = self._stat(path)
+            if self._stat_cache.get(path) != current:
+                self._stat_cache[path] = current
+                if current is not None:
+                    changed.add(path)
+        return changed
+
+    async def _poll_loop(self) -> None:
+        libc = _load_libc() if self._fd is not None else None
+        for path in self._polled:
+            self._stat_cache[path] = self._stat(path)
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            if not self._polled:
+                continue
+            # Retry directories that were missing at startup
+            if libc is not None:
+                for directory in {f.parent for f in self._polled}:
+                    if self._add_watch(libc, directory):
+                        logger.info(f"Now watching {directory} with inotify")
+                        self._schedule({f for f in self.files if f.parent == directory})
+            changed = await asyncio.to_thread(self._poll_once, list(self._polled))
+            if changed:
+                self._schedule(changed)
+
+    # ----------------------------- dispatch ------------------------------ #
+    def _schedule(self, paths: Set[Path]) -> None:
+        self._pending.update(paths)
+        self._wakeup.set()
+
+    async def _dispatch_loop(self) -> None:
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            paths, self._pending = self._pending, set()
+            try:
+                await self.on_change(paths)
+            except Exception as e:
+                logger.error(f"Sensor change handler failed: {e}")
+
+    async def start(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._start_inotify()
+        self._tasks = [
+            asyncio.create_task(self._dispatch_loop()),
+            asyncio.create_task(self._poll_loop()),
+        ]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+        if self._fd is not None:
+            try:
+                self._loop.remove_reader(self._fd)
+            except Exception:
+                pass
+            os.close(self._fd)
+            self._fd = None
+            self._wd_dirs.clear()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+assignment.py - Vectorized detection-to-track association helpers
+
+IoU matrices over whole box arrays and optimal (Hungarian) assignment of a
+cost matrix with gating. scipy.optimize.linear_sum_assignment is used when
+SciPy is installed; otherwise an equivalent NumPy implementation runs.
+"""
+
+from typing import Tuple
+
+import numpy as np
+
+try:
+    from scipy.optimize import linear_sum_assignment as _scipy_assignment
+    SCIPY_AVAILABLE = True
+except ImportError:
+    SCIPY_AVAILABLE = False
+
+
+def xywh_to_xyxy(boxes: np.ndarray) -> np.ndarray:
+    """(N, 4) [x, y, w, h] -> (N, 4) [x1, y1, x2, y2]"""
+    boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+    out = boxes.copy()
+    out[:, 2:] += boxes[:, :2]
+    return out
+
+
+def iou_matrix(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """
+    Pairwise IoU of two sets of [x1, y1, x2, y2] boxes
+
+    Returns:
+        (len(a), len(b)) array
+    """
+    a = np.asarray(a, dtype=np.float64).reshape(-1, 4)
+    b = np.asarray(b, dtype=np.float64).reshape(-1, 4)
+    left = np.maximum(a[:, None, 0], b[None, :, 0])
+    top = np.maximum(a[:, None, 1], b[None, :, 1])
+    right = np.minimum(a[:, None, 2], b[None, :, 2])
+    bottom = np.minimum(a[:, None, 3], b[None, :, 3])
+    intersection = np.clip(right - left, 0, None) * np.clip(bottom - top, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    union = area_a[:, None] + area_b[None, :] - intersection
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(union > 0, intersection / union, 0.0)
+
+
+def _hungarian(cost: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Minimum-cost assignment for a finite (n, m) matrix with n <= m"""
+    n, m = cost.shape
+    u = np.zeros(n + 1)
+    v = np.zeros(m + 1)
+    owner = np.zeros(m + 1, dtype=np.int64)   # column -> row (1-based, 0 = free)
+    way = np.zeros(m + 1, dtype=np.int64)
+    for i in range(1, n + 1):
+        owner[0] = i
+        j0 = 0
+        minv = np.full(m + 1, np.inf)
+        used = np.zeros(m + 1, dtype=bool)
+        while True:
+            used[j0] = True
+            i0 = owner[j0]
+            free = ~used
+            free[0] = False
+            reduced = cost[i0 - 1] - u[i0] - v[1:]
+            better = free[1:] & (reduced < minv[1:])
+            minv[1:][better] = reduced[better]
+            way[1:][better] = j0
+            candidates = np.flatnonzero(free)
+            j1 = candidates[np.argmin(minv[candidates])]
+            delta = minv[j1]
+            u[owner[used]] += delta
+            v[used] -= delta
+            minv[free] -= delta
+            j0 = j1
+            if owner[j0] == 0:
+                break
+        while j0:
+            j1 = way[j0]
+            owner[j0] = owner[j1]
+            j0 = j1
+    cols = np.flatnonzero(owner[1:])
+    rows = owner[1:][cols] - 1
+    order = np.argsort(rows)
+    return rows[order], cols[order]
+
+
+def linear_assignment(cost: np.ndarray, gate: float = np.inf) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Optimal one-to-one assignment minimizing total cost
+
+    Pairs whose cost is not below ``gate`` (or is not finite) are never
+    returned; the remaining rows/columns are left unassigned.
+
+    Returns:
+        (rows, cols): index arrays of the assigned pairs, sorted by row
+    """
+    cost = np.asarray(cost, dtype=np.float64)
+    empty = np.empty(0, dtype=np.int64)
+    if cost.size == 0:
+        return empty, empty
+    allowed = np.isfinite(cost) & (cost < gate)
+    if not allowed.any():
+        return empty, empty
+    # Forbidden pairs get a cost no useful assignment can beat, then are dropped
+    finite = cost[allowed]
+    big = (np.abs(finite).max() + 1.0) * (min(cost.shape) + 1)
+    padded = np.where(allowed, cost, big)
+
+    if SCIPY_AVAILABLE:
+        rows, cols = _scipy_assignment(padded)
+    elif padded.shape[0] <= padded.shape[1]:
+        rows, cols = _hungarian(padded)
+    else:
+        cols, rows = _hungarian(padded.T)
+        order = np.argsort(rows)
+        rows, cols = rows[order], cols[order]
+    keep = allowed[rows, cols]
+    return rows[keep].astype(np.int64), cols[keep].astype(np.int64)
@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+batch_inference.py - Batched multi-camera person detection
+
+Collects the latest frame from each registered camera, stacks them into one
+NCHW blob and runs a single SSD/YOLO forward pass for the whole batch. The
+results are scattered back per camera through the detector's own
+post-processing and filtering, so a camera gets the same detections it would
+get from PersonDetector.detect_people().
+
+Usage:
+    detector = PersonDetector(model_type="ssd")
+    engine = BatchInferenceEngine(detector, ["door", "floor"])
+    engine.start()
+    ...
+    engine.submit("door", door_frame)
+    people = engine.get_detections("door")
+
+The engine drives the detector's networks directly; frames for cameras
+managed by an engine should not also be passed to detector.detect_people().
+"""
+
+import logging
+import threading
+import time
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+try:
+    from .dnn_utils import DnnInferenceContext
+except ImportError:
+    from dnn_utils import DnnInferenceContext
+
+logger = logging.getLogger(__name__)
+
+# blobFromImage parameters for each batched model type, as in PersonDetector
+BATCH_MODELS = {
+    'yolo': {'scale': 1 / 255.0, 'mean': 0.0, 'swap_rb': True},
+    'ssd': {'scale': 0.007843, 'mean': 127.5, 'swap_rb': False, 'input_size': (300, 300)},
+}
+
+
+class BatchInferenceEngine:
+    def __init__(self, detector, cameras: Iterable[str], max_wait: float = 0.05):
+        """
+        Initialize the batching engine
+
+        Args:
+            detector: PersonDetector whose models and filtering are used
+            cameras: Camera ids that contribute frames to each batch
+            max_wait: Longest time (s) to wait for the other cameras once the
+                first frame of a batch has arrived
+        """
+        self.detector = detector
+        self.cameras: List[str] = list(cameras)
+        self.max_wait = max_wait
+
+        # One context per batched model, sized for all cameras
+        self.contexts: Dict[str, DnnInferenceContext] = {}
+
+        # Latest pending frame per camera and latest results per camera
+        self._pending: Dict[str, np.ndarray] = {}
+        self._first_pending = 0.0
+        self._detections: Dict[str, List[Dict]] = {camera: [] for camera in self.cameras}
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._active = False
+
+        # Statistics
+        self.batches = 0
+        self.frames = 0
+        self.frames_replaced = 0
+        self.last_batch_ms = 0.0
+        self._batch_time_total = 0.0
+
+    # ------------------------------ Frames in ----------------------------- #
+    def submit(self, camera_id: str, frame: np.ndarray) -> None:
+        """Queue the latest frame for a camera, replacing an unprocessed one"""
+        if camera_id not in self._detections:
+            raise KeyError(f"Unknown camera '{camera_id}'")
+        frame = frame.copy()
+        with self._cond:
+            if camera_id in self._pending:
+                self.frames_replaced += 1
+            elif not self._pending:
+                self._first_pending = time.monotonic()
+            self._pending[camera_id] = frame
+            self._cond.notify()
+
+    def get_detections(self, camera_id: str) -> List[Dict]:
+        with self._cond:
+            return list(self._detections[camera_id])
+
+    # ------------------------------- Worker ------------------------------- #
+    def start(self) -> None:
+        if self._thread is None or not self._thread.is_alive():
+            self._active = True
+            self._thread = threading.Thread(target=self._worker, daemon=True)
+            self._thread.start()
+            logger.info(f"Batch inference started for cameras: {', '.join(self.cameras)}")
+
+    def stop(self) -> None:
+        with self._cond:
+            self._active = False
+            self._cond.notify()
+        if self._thread and self._thread.is_alive():
+            self._thread.join(timeout=2.0)
+
+    def _batch_ready(self) -> bool:
+        if not self._pending:
+            return False
+        if len(self._pending) == len(self.cameras):
+            return True
+        return time.monotonic() - self._first_pending >= self.max_wait
+
+    def _worker(self) -> None:
+        while True:
+            with self._cond:
+                while self._active and not self._batch_ready():
+                    timeout = None
+                    if self._pending:
+                        timeout = max(0.0, self.max_wait - (time.monotonic() - self._first_pending))
+                    self._cond.wait(timeout)
+                if not self._active:
+                    return
+                batch = self._pending
+                self._pending = {}
+            try:
+                results = self.run_batch(batch)
+            except Exception as e:
+                logger.error(f"Batch inference failed: {e}")
+                continue
+            with self._cond:
+                self._detections.update(results)
+
+    # ------------------------------ Inference ----------------------------- #
+    def _context(self, model_type: str) -> DnnInferenceContext:
+        context = self.contexts.get(model_type)
+        if context is None:
+            model = self.detector.models[model_type]
+            params = BATCH_MODELS[model_type]
+            context = DnnInferenceContext(
+                model['detector'],
+                params.get('input_size', model.get('input_size')),
+                scale=params['scale'],
+                mean=params['mean'],
+                swap_rb=params['swap_rb'],
+                max_batch=len(self.cameras),
+            )
+            self.contexts[model_type] = context
+        return context
+
+    def run_batch(self, frames: Dict[str, np.ndarray]) -> Dict[str, List[Dict]]:
+        """
+        Detect people in one frame per camera
+
+        Args:
+            frames: camera id -> frame
+
+        Returns:
+            dict: camera id -> filtered detections
+        """
+        start = time.perf_counter()
+        detector = self.detector
+        model_type = detector.model_type
+        cameras = list(frames)
+        images = [frames[camera] for camera in cameras]
+        sizes = [(image.shape[1], image.shape[0]) for image in images]
+
+        if model_type in BATCH_MODELS and detector.models.get(model_type, {}).get('loaded'):
+            context = self._context(model_type)
+            outputs = context.forward_batch(images)
+            post_start = time.perf_counter()
+            if model_type == 'ssd':
+                people = self._scatter_ssd(outputs[0], sizes)
+            else:
+                people = self._scatter_yolo(outputs, sizes)
+            context.record_postprocess(post_start)
+        else:
+            # HOG and Hailo have no batched path; run them frame by frame
+            people = [detector._detect_with_model(image, model_type) for image in images]
+
+        results = {
+            camera: detector._filter_detections(dets, size)
+            for camera, dets, size in zip(cameras, people, sizes)
+        }
+
+        elapsed = time.perf_counter() - start
+        self.batches += 1
+        self.frames += len(cameras)
+        self.last_batch_ms = elapsed * 1000.0
+        self._batch_time_total += elapsed
+        return results
+
+    def _scatter_ssd(self, detections: np.ndarray, sizes) -> List[List[Dict]]:
+        # DetectionOutput rows for the whole batch; column 0 is the image index
+        rows = detections.reshape(-1, 7)
+        image_ids = rows[:, 0].astype(int)
+        return [
+            self.detector._ssd_people(rows[image_ids == index], w, h)
+            for index, (w, h) in enumerate(sizes)
+        ]
+
+    def _scatter_yolo(self, outputs, sizes) -> List[List[Dict]]:
+        # Each output layer holds the rows of all images, batch-major
+        count = len(sizes)
+        per_image = [o.reshape(count, -1, o.shape[-1]) for o in outputs]
+        return [
+            self.detector._yolo_people([layer[index] for layer in per_image], w, h)
+            for index, (w, h) in enumerate(sizes)
+        ]
+
+    def stats(self) -> Dict:
+        batches = max(1, self.batches)
+        return {
+            'cameras': len(self.cameras),
+            'batches': self.batches,
+            'frames': self.frames,
+            'frames_replaced': self.frames_replaced,
+            'avg_batch_size': round(self.frames / batches, 2),
+            'last_batch_ms': round(self.last_batch_ms, 3),
+            'avg_batch_ms': round(self._batch_time_total * 1000.0 / batches, 3),
+            'models': {name: context.stats() for name, context in self.contexts.items()},
+        }
@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+"""
+bench_pipeline.py - Replay recorded video through PersonDetector + PersonTracker
+
+Reads a video file or a directory of frames, runs every frame through the
+detector and the tracker as fast as possible (detection is synchronous, so
+no frame is dropped), and reports throughput, per-stage latency percentiles,
+memory and entry/exit counts. Frames are stamped with their capture time
+(from the video, or index / --fps), so a replay gives the same counts on a
+laptop as on the device, at any speed.
+
+With --ground-truth, counts are compared against an annotation file (JSON):
+
+    {
+      "entries": 12,
+      "exits": 10,
+      "lines": {"front_door": {"entries": 7, "exits": 6}},
+      "occupancy": [[0, 0], [150, 3], [300, 5]]
+    }
+
+Every key is optional. "lines" needs --zones with matching counting lines;
+"occupancy" lists [frame index, people in view] pairs and is scored as the
+mean absolute error of the tracker's current count at those frames.
+
+Usage:
+    python3 bench_pipeline.py recording.mp4 --model ssd
+    python3 bench_pipeline.py frames/ --fps 10 --model yolo --ground-truth truth.json
+    python3 bench_pipeline.py recording.mp4 --motion --zones door --json result.json
+    python3 bench_pipeline.py recording.mp4 --output annotated.mp4
+"""
+
+import argparse
+import json
+import logging
+import resource
+import sys
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+try:
+    from .camera_zones import CameraZones
+    from .motion_gate import MotionGate
+    from .person_detector import PersonDetector
+    from .person_tracker import OVERLAY_ALWAYS, OVERLAY_NEVER, PersonTracker
+except ImportError:
+    from camera_zones import CameraZones
+    from motion_gate import MotionGate
+    from person_detector import PersonDetector
+    from person_tracker import OVERLAY_ALWAYS, OVERLAY_NEVER, PersonTracker
+
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.bmp'}
+DNN_STAGES = ('preprocess', 'inference', 'postprocess')
+
+
+def iter_frames(source, fps=None):
+    """
+    Yield (index, timestamp, frame) from a video file or a directory of images
+
+    Directory frames are read in name order and stamped index / fps. Video
+    frames use the container timestamps, falling back to index / fps.
+    """
+    source = Path(source)
+    if source.is_dir():
+        paths = sorted(p for p in source.iterdir() if p.suffix.lower() in IMAGE_EXTENSIONS)
+        interval = 1.0 / (fps or 10.0)
+        for index, path in enumerate(paths):
+            frame = cv2.imread(str(path))
+            if frame is None:
+                logging.warning(f"Skipping unreadable frame {path}")
+                continue
+            yield index, index * interval, frame
+        return
+
+    capture = cv2.VideoCapture(str(source))
+    if not capture.isOpened():
+        raise SystemExit(f"Cannot open {source}")
+    interval = 1.0 / (fps or capture.get(cv2.CAP_PROP_FPS) or 10.0)
+    index = 0
+    try:
+        while True:
+            ok, frame = capture.read()
+            if not ok:
+                break
+            position = capture.get(cv2.CAP_PROP_POS_MSEC) / 1000.0
+            yield index, (position if position > 0 and not fps else index * interval), frame
+            index += 1
+    finally:
+        capture.release()
+
+
+def percentiles(values_ms):
+    values = np.asarray(values_ms, dtype=np.float64)
+    if values.size == 0:
+        return None
+    p50, p90, p99 = np.percentile(values, [50, 90, 99])
+    return {'mean': float(values.mean()), 'p50': float(p50), 'p90': float(p90),
+            'p99': float(p99), 'max': float(values.max())}
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / (1024.0 * 1024.0) if sys.platform == 'darwin' else peak / 1024.0
+
+
+def _dnn_totals(detector):
+    """Cumulative milliseconds per DNN stage over all loaded models"""
+    totals = dict.fromkeys(DNN_STAGES, 0.0)
+    for stats in detector.get_inference_stats().values():
+        for stage, ms in stats['total_ms'].items():
+            totals[stage] = totals.get(stage, 0.0) + ms
+    return totals
+
+
+def compare(counts, truth):
+    """Differences between replay counts and the ground truth annotation"""
+    report = {}
+    for key in ('entries', 'exits'):
+        if key in truth:
+            report[key] = {'expected': truth[key], 'counted': counts[key], 'error': counts[key] - truth[key]}
+    for name, expected in (truth.get('lines') or {}).items():
+        counted = counts.get('lines', {}).get(name, {'entries': 0, 'exits': 0})
+        report[f'line {name}'] = {
+            key: {'expected': expected[key], 'counted': counted[key], 'error': counted[key] - expected[key]}
+            for key in ('entries', 'exits') if key in expected
+        }
+    return report
+
+
+def run(args):
+    zones = CameraZones.load(args.zones, args.config) if args.zones else None
+    detector = PersonDetector(
+        confidence_threshold=args.confidence,
+        model_type=args.model,
+        threaded=False,
+        motion_gate=MotionGate() if args.motion else None,
+    )
+    tracker = PersonTracker(
+        min_detection_frames=args.min_frames,
+        zones=zones,
+        overlay=OVERLAY_ALWAYS if args.output else OVERLAY_NEVER,
+    )
+    truth = json.loads(Path(args.ground_truth).read_text()) if args.ground_truth else {}
+    occupancy_truth = {int(index): count for index, count in truth.get('occupancy') or []}
+    rss_before = peak_rss_mb()
+
+    stages = {name: [] for name in ('decode', 'detect', 'track', 'total') + DNN_STAGES}
+    occupancy_errors = []
+    writer = None
+    frames = 0
+    counting_info = {'entries': 0, 'exits': 0, 'current': 0}
+    dnn_before = _dnn_totals(detector)
+    started = time.perf_counter()
+
+    source = iter_frames(args.source, args.fps)
+    while args.max_frames is None or frames < args.max_frames:
+        t0 = time.perf_counter()
+        item = next(source, None)
+        if item is None:
+            break
+        index, timestamp, frame = item
+        t1 = time.perf_counter()
+
+        if frames == 0 and zones is not None:
+            # ROIs are known in pixels once the frame size is
+            zones.scale(frame.shape[1], frame.shape[0])
+            detector.set_roi(zones.roi_box)
+        detections = detector.detect_people(frame, timestamp)
+        t2 = time.perf_counter()
+        frame, counting_info = tracker.process_detections(detections, frame, timestamp)
+        t3 = time.perf_counter()
+
+        if frames >= args.warmup:
+            stages['decode'].append((t1 - t0) * 1000)
+            stages['detect'].append((t2 - t1) * 1000)
+            stages['track'].append((t3 - t2) * 1000)
+            stages['total'].append((t3 - t0) * 1000)
+            dnn_after = _dnn_totals(detector)
+            if any(dnn_after[stage] != dnn_before[stage] for stage in DNN_STAGES):
+                for stage in DNN_STAGES:
+                    stages[stage].append(dnn_after[stage] - dnn_before[stage])
+            dnn_before = dnn_after
+        else:
+            dnn_before = _dnn_totals(detector)
+
+        if index in occupancy_truth:
+            occupancy_errors.append(abs(counting_info['current'] - occupancy_truth[index]))
+
+        if args.output:
+            if writer is None:
+                writer = cv2.VideoWriter(args.output, cv2.VideoWriter_fourcc(*'mp4v'),
+                                         args.fps or 10.0, (frame.shape[1], frame.shape[0]))
+            writer.write(frame)
+        frames += 1
+
+    elapsed = time.perf_counter() - started
+    if writer is not None:
+        writer.release()
+    detector.cleanup()
+
+    result = {
+        'source': str(args.source),
+        'model': detector.model_type,
+        'frames': frames,
+        'seconds': elapsed,
+        'fps': frames / elapsed if elapsed > 0 else 0.0,
+        'latency_ms': {name: percentiles(values) for name, values in stages.items() if values},
+        'memory_mb': {'peak_rss': peak_rss_mb(), 'growth_during_replay': peak_rss_mb() - rss_before},
+        'tracks': {'created': tracker.next_id, 'slots': tracker.tracks.capacity},
+        'counts': counting_info,
+    }
+    if args.motion:
+        result['motion'] = detector.get_motion_stats()
+    if truth:
+        result['accuracy'] = compare(counting_info, truth)
+        if occupancy_errors:
+            result['accuracy']['occupancy_mae'] = float(np.mean(occupancy_errors))
+    return result
+
+
+def print_report(result):
+    print(f"{result['source']}: {result['frames']} frames with {result['model']} in "
+          f"{result['seconds']:.1f}s ({result['fps']:.1f} FPS)")
+    print(f"{'stage':<12} {'mean':>8} {'p50':>8} {'p90':>8} {'p99':>8} {'max':>8}  (ms)")
+    for name, p in result['latency_ms'].items():
+        print(f"{name:<12} {p['mean']:>8.2f} {p['p50']:>8.2f} {p['p90']:>8.2f} {p['p99']:>8.2f} {p['max']:>8.2f}")
+    memory = result['memory_mb']
+    print(f"Memory: peak RSS {memory['peak_rss']:.0f} MB, +{memory['growth_during_replay']:.0f} MB during replay; "
+          f"{result['tracks']['created']} tracks in {result['tracks']['slots']} slots")
+    counts = result['counts']
+    print(f"Counts: {counts['entries']} entries, {counts['exits']} exits, {counts['current']} in view at the end")
+    for name, line in counts.get('lines', {}).items():
+        print(f"  {name}: {line['entries']} entries, {line['exits']} exits")
+    if result.get('motion'):
+        print(f"Motion gate: {result['motion']}")
+    for name, value in result.get('accuracy', {}).items():
+        if name == 'occupancy_mae':
+            print(f"Occupancy MAE: {value:.2f} people")
+        elif 'expected' in value:
+            print(f"{name}: {value['counted']} counted vs {value['expected']} expected ({value['error']:+d})")
+        else:
+            for key, v in value.items():
+                print(f"{name} {key}: {v['counted']} counted vs {v['expected']} expected ({v['error']:+d})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay video through the detection + tracking pipeline")
+    parser.add_argument('source', help="Video file or directory of frames")
+    parser.add_argument('--model', default='ssd', choices=['hog', 'ssd', 'yolo', 'hailo'])
+    parser.add_argument('--confidence', type=float, default=0.45, help="Detector confidence threshold")
+    parser.add_argument('--min-frames', type=int, default=5, help="Frames before a track is confirmed")
+    parser.add_argument('--fps', type=float, help="Frame rate for timestamps (default: from the video, else 10)")
+    parser.add_argument('--motion', action='store_true', help="Gate detection on motion")
+    parser.add_argument('--zones', help="Camera name in config.yaml whose ROIs/counting lines to use")
+    parser.add_argument('--config', help="config.yaml to read --zones from")
+    parser.add_argument('--ground-truth', help="JSON annotation to score counts against")
+    parser.add_argument('--max-frames', type=int)
+    parser.add_argument('--warmup', type=int, default=3, help="Frames left out of the latency statistics")
+    parser.add_argument('--output', help="Write the annotated video here")
+    parser.add_argument('--json', help="Also write the report as JSON")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    result = run(args)
+    print_report(result)
+    if args.json:
+        Path(args.json).write_text(json.dumps(result, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+bench_tracker.py - Benchmark PersonTracker matching on synthetic crowds
+
+Simulates crowds of 10 to 200 people walking around a 1920x1080 floor and
+times, per frame, the old greedy per-detection matching loop against the
+vectorized cost matrix + optimal assignment in PersonTracker. It also counts
+how often the greedy loop hands one track to two detections ("stolen" IDs).
+
+Usage:
+    python3 bench_tracker.py
+    python3 bench_tracker.py --crowds 10 50 100 200 --frames 50
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+try:
+    from . import assignment
+    from .person_tracker import PersonTracker
+    from .track_store import ACTIVE, TENTATIVE
+except ImportError:
+    import assignment
+    from person_tracker import PersonTracker
+    from track_store import ACTIVE, TENTATIVE
+
+WIDTH, HEIGHT = 1920, 1080
+FRAME_INTERVAL = 0.1   # Simulated seconds between frames
+
+
+def legacy_match(tracker, detection, now):
+    """The previous per-detection greedy matching loop, kept as the reference"""
+    x, y, w, h = detection['box']
+    new_center = (x + w // 2, y + h // 2)
+    new_area = w * h
+    new_aspect = h / w if w > 0 else 0
+    best_id = None
+    best_score = float('inf')
+    new_box = [x, y, x + w, y + h]
+    tracks = tracker.tracks
+    for slot in tracks.slots_with(TENTATIVE, ACTIVE):
+        slot = int(slot)
+        px, py, pw, ph = tracks.box[slot].tolist()
+        old_area = pw * ph
+        old_aspect = ph / pw if pw > 0 else 0
+        time_gap = now - tracks.last_seen[slot]
+        if time_gap > 1.0:
+            continue
+        predicted_x, predicted_y = tracker.kalman.positions([tracks.kf_slot[slot]])[0]
+        distance = np.sqrt((new_center[0] - predicted_x) ** 2 + (new_center[1] - predicted_y) ** 2)
+        area_ratio = new_area / old_area if old_area > 0 else float('inf')
+        if area_ratio < 1:
+            area_ratio = 1 / area_ratio
+        aspect_diff = abs(new_aspect - old_aspect)
+        old_box = [px, py, px + pw, py + ph]
+        x_left, y_top = max(new_box[0], old_box[0]), max(new_box[1], old_box[1])
+        x_right, y_bottom = min(new_box[2], old_box[2]), min(new_box[3], old_box[3])
+        if x_right < x_left or y_bottom < y_top:
+            iou = 0.0
+        else:
+            inter = (x_right - x_left) * (y_bottom - y_top)
+            union = (new_box[2] - new_box[0]) * (new_box[3] - new_box[1]) + old_area - inter
+            iou = inter / union if union > 0 else 0.0
+        score = distance * 0.5 + (area_ratio - 1) * 20 + aspect_diff * 10 + (1 - iou) * 50 + time_gap * 10
+        if score < 100 and score < best_score:
+            best_score = score
+            best_id = slot
+    return best_id
+
+
+class Crowd:
+    """People with a box size and a slowly changing walking direction"""
+
+    def __init__(self, people, seed=0):
+        self.rng = np.random.default_rng(seed)
+        self.size = np.column_stack([
+            self.rng.integers(40, 70, people),
+            self.rng.integers(110, 190, people),
+        ])
+        self.pos = self.rng.random((people, 2)) * [WIDTH - 80, HEIGHT - 200]
+        self.vel = self.rng.normal(0, 4, (people, 2))
+
+    def step(self):
+        self.vel += self.rng.normal(0, 0.5, self.vel.shape)
+        self.pos = np.clip(self.pos + self.vel, 0, [WIDTH - 80, HEIGHT - 200])
+        jitter = self.rng.integers(-2, 3, self.size.shape)
+        return [
+            {'box': (int(x), int(y), int(w), int(h)), 'confidence': 0.9}
+            for (x, y), (w, h) in zip(self.pos, self.size + jitter)
+        ]
+
+
+def run(people, frames, warmup=5):
+    crowd = Crowd(people, seed=people)
+    tracker = PersonTracker(min_detection_frames=3)
+    frame = np.zeros((HEIGHT, WIDTH, 3), dtype=np.uint8)
+    tracker.update_frame_dimensions(frame)
+    now = 0.0
+    for _ in range(warmup):
+        now += FRAME_INTERVAL
+        tracker.process_detections(crowd.step(), frame, now)
+
+    legacy_times, vector_times, stolen, disagree = [], [], 0, 0
+    for _ in range(frames):
+        detections = [d for d in crowd.step() if tracker._is_valid_person(d)]
+        now += FRAME_INTERVAL
+        tracker.kalman.predict(now)
+
+        start = time.perf_counter()
+        greedy = [legacy_match(tracker, d, now) for d in detections]
+        legacy_times.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        optimal = tracker._match_detections(detections, now)
+        vector_times.append(time.perf_counter() - start)
+
+        matched = [m for m in greedy if m is not None]
+        stolen += len(matched) - len(set(matched))
+        disagree += sum(1 for a, b in zip(greedy, optimal) if a != b)
+        tracker.process_detections(detections, frame, now)
+
+    return {
+        'people': people,
+        'legacy_ms': np.median(legacy_times) * 1000,
+        'vector_ms': np.median(vector_times) * 1000,
+        'stolen': stolen,
+        'disagree': disagree,
+        'tracks': tracker.tracks.count(ACTIVE),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark PersonTracker matching")
+    parser.add_argument('--crowds', type=int, nargs='+', default=[10, 25, 50, 100, 200])
+    parser.add_argument('--frames', type=int, default=30)
+    args = parser.parse_args()
+
+    solver = 'scipy' if assignment.SCIPY_AVAILABLE else 'numpy'
+    print(f"Assignment solver: {solver}")
+    print(f"{'people':>6} {'greedy ms':>10} {'vector ms':>10} {'speed-up':>9} {'stolen IDs':>11} {'differ':>7} {'active':>7}")
+    for people in args.crowds:
+        r = run(people, args.frames)
+        print(f"{r['people']:>6} {r['legacy_ms']:>10.2f} {r['vector_ms']:>10.2f} "
+              f"{r['legacy_ms'] / r['vector_ms']:>8.1f}x {r['stolen']:>11} {r['disagree']:>7} {r['tracks']:>7}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+bench_yolo_decode.py - Micro-benchmark for YOLOv3 output decoding
+
+Times the old per-row Python loop against the vectorized
+dnn_utils.decode_yolo_outputs() on the same output tensor and checks that
+both produce identical boxes.
+
+Usage:
+    # Record real network outputs for one image (needs the YOLO model files)
+    python3 bench_yolo_decode.py --record frame.jpg --outputs yolo_outputs.npz
+
+    # Benchmark on a recorded tensor, or on a synthetic one if omitted
+    python3 bench_yolo_decode.py --outputs yolo_outputs.npz --runs 200
+"""
+
+import argparse
+import os
+import time
+
+import numpy as np
+
+try:
+    from .dnn_utils import decode_yolo_outputs
+except ImportError:
+    from dnn_utils import decode_yolo_outputs
+
+# YOLOv3 at 416x416: 13x13, 26x26 and 52x52 grids, 3 anchors each
+YOLO_GRIDS = (13, 26, 52)
+NUM_CLASSES = 80
+
+
+def decode_yolo_outputs_loop(outputs, w, h, confidence_threshold):
+    """The original per-row decoding loop, kept as the reference"""
+    boxes = []
+    confidences = []
+    for output in outputs:
+        for detection in output:
+            scores = detection[5:]
+            class_id = np.argmax(scores)
+            confidence = scores[class_id]
+            if class_id == 0 and confidence > confidence_threshold:
+                box = detection[0:4] * np.array([w, h, w, h])
+                (center_x, center_y, width, height) = box.astype("int")
+                x = int(center_x - (width / 2))
+                y = int(center_y - (height / 2))
+                boxes.append([x, y, int(width), int(height)])
+                confidences.append(float(confidence))
+    return boxes, confidences
+
+
+def synthetic_outputs(people=12, seed=0):
+    """Output layers shaped like YOLOv3-416 with a handful of person hits"""
+    rng = np.random.default_rng(seed)
+    outputs = []
+    for grid in YOLO_GRIDS:
+        rows = grid * grid * 3
+        out = np.zeros((rows, 5 + NUM_CLASSES), dtype=np.float32)
+        out[:, 0:2] = rng.random((rows, 2), dtype=np.float32)
+        out[:, 2:4] = rng.random((rows, 2), dtype=np.float32) * 0.3
+        out[:, 4] = rng.random(rows, dtype=np.float32) * 0.05
+        out[:, 5:] = rng.random((rows, NUM_CLASSES), dtype=np.float32) * 0.05
+        hits = rng.choice(rows, size=people, replace=False)
+        out[hits, 5] = rng.uniform(0.5, 0.99, size=people).astype(np.float32)
+        outputs.append(out)
+    return outputs
+
+
+def record_outputs(image_path, outputs_path, models_dir):
+    import cv2
+
+    net = cv2.dnn.readNetFromDarknet(
+        os.path.join(models_dir, "yolov3.cfg"),
+        os.path.join(models_dir, "yolov3.weights"),
+    )
+    frame = cv2.imread(image_path)
+    if frame is None:
+        raise SystemExit(f"Could not read {image_path}")
+    blob = cv2.dnn.blobFromImage(frame, 1 / 255.0, (416, 416), swapRB=True, crop=False)
+    net.setInput(blob)
+    layer_names = net.getLayerNames()
+    output_layers = [layer_names[i - 1] for i in net.getUnconnectedOutLayers().flatten()]
+    outputs = net.forward(output_layers)
+    h, w = frame.shape[:2]
+    np.savez(outputs_path, *outputs, frame_size=np.array([w, h]))
+    print(f"Recorded {len(outputs)} output layers ({sum(o.shape[0] for o in outputs)} rows) to {outputs_path}")
+
+
+def load_outputs(path):
+    data = np.load(path)
+    outputs = [data[key] for key in sorted(k for k in data.files if k.startswith("arr_"))]
+    w, h = (int(v) for v in data["frame_size"]) if "frame_size" in data.files else (1280, 720)
+    return outputs, w, h
+
+
+def time_per_frame(fn, runs):
+    fn()  # warm-up
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    samples.sort()
+    return samples[len(samples) // 2], samples[int(len(samples) * 0.95) - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark YOLO output decoding")
+    parser.add_argument("--outputs", help="Recorded output tensor (.npz); synthetic if omitted")
+    parser.add_argument("--record", metavar="IMAGE", help="Run YOLO on IMAGE and save outputs to --outputs")
+    parser.add_argument("--models-dir", default="/opt/pulse/models")
+    parser.add_argument("--runs", type=int, default=100)
+    parser.add_argument("--threshold", type=float, default=0.45)
+    args = parser.parse_args()
+
+    if args.record:
+        if not args.outputs:
+            parser.error("--record needs --outputs to write to")
+        record_outputs(args.record, args.outputs, args.models_dir)
+        return
+
+    if args.outputs:
+        outputs, w, h = load_outputs(args.outputs)
+        source = args.outputs
+    else:
+        outputs, w, h = synthetic_outputs(), 1280, 720
+        source = "synthetic YOLOv3-416 tensor"
+    rows = sum(o.shape[0] for o in outputs)
+
+    ref_boxes, ref_conf = decode_yolo_outputs_loop(outputs, w, h, args.threshold)
+    vec_boxes, vec_conf = decode_yolo_outputs(outputs, w, h, args.threshold)
+    identical = ref_boxes == vec_boxes.tolist() and np.allclose(ref_conf, vec_conf)
+
+    loop_p50, loop_p95 = time_per_frame(lambda: decode_yolo_outputs_loop(outputs, w, h, args.threshold), args.runs)
+    vec_p50, vec_p95 = time_per_frame(lambda: decode_yolo_outputs(outputs, w, h, args.threshold), args.runs)
+
+    print(f"Input: {source} ({rows} rows, {len(ref_boxes)} person candidates)")
+    print(f"Results identical: {identical}")
+    print(f"Python loop : p50 {loop_p50 * 1000:8.3f} ms   p95 {loop_p95 * 1000:8.3f} ms")
+    print(f"Vectorized  : p50 {vec_p50 * 1000:8.3f} ms   p95 {vec_p95 * 1000:8.3f} ms")
+    print(f"Speed-up    : {loop_p50 / vec_p50:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,9 +5,13 @@ import random
 from pathlib import Path
 from datetime import datetime
 
+try:
+    from .sensor_bus import BusPublisher, Environment
+except ImportError:
+    from sensor_bus import BusPublisher, Environment
+
 STATUS_FILE = Path(__file__).resolve().parents[2] / 'config' / 'hardware_status.json'
 DATA_DIR = Path('/opt/pulse/data/sensors')
-BME_FILE = DATA_DIR / 'bme280.json'
 
 async def has_sensor() -> bool:
     try:
@@ -18,6 +22,7 @@ async def has_sensor() -> bool:
 
 async def read_loop():
     DATA_DIR.mkdir(parents=True, exist_ok=True)
+    bus = BusPublisher()
     
     # Baseline temperature and humidity
     base_temp = 72.0
@@ -48,24 +53,17 @@ async def read_loop():
             humidity += random.uniform(-2, 2)
             humidity = max(20, min(80, humidity))
             
-            data = {
-                'temperature': round(temp, 1),
-                'humidity': round(humidity, 1),
-                'pressure': round(1013.25 + random.uniform(-5, 5), 2),
-                'timestamp': datetime.now().isoformat()
-            }
+            reading = Environment(
+                temperature=round(temp, 1),
+                humidity=round(humidity, 1),
+                pressure=round(1013.25 + random.uniform(-5, 5), 2)
+            )
             
-            BME_FILE.write_text(json.dumps(data, indent=2))
-            print(f"[BME280] Temp: {data['temperature']}°F, Humidity: {data['humidity']}%")
+            bus.publish(reading)
+            print(f"[BME280] Temp: {reading.temperature}°F, Humidity: {reading.humidity}%")
         else:
-            # Write default values
-            data = {
-                'temperature': base_temp,
-                'humidity': base_humidity,
-                'pressure': 1013.25,
-                'timestamp': datetime.now().isoformat()
-            }
-            BME_FILE.write_text(json.dumps(data, indent=2))
+            # Publish default values
+            bus.publish(Environment(temperature=base_temp, humidity=base_humidity, pressure=1013.25))
             print("[BME280] Sensor not available, using defaults")
         
         await asyncio.sleep(10)
@@ -1,21 +1,52 @@
 #!/usr/bin/env python3
+"""
+camera_people.py - Camera capture and people counting service
+
+With a camera, a capture thread reads V4L2 frames through OpenCV straight into
+the shared-memory frame ring (frame_ring.py), which the detector below reads
+in place. A pipeline thread runs PersonDetector + PersonTracker on the newest
+frame and publishes the tracker's occupancy to the hub. The frames it
+processes are JPEG-encoded once - with the tracking overlay while someone
+watches the stream - and shared with the hub and the light sensor through
+frame_publisher.py. Without a camera, counts are
+simulated and a placeholder frame is published instead.
+"""
 import asyncio
 import json
+import logging
 import os
 import random
+import threading
+import time
 from pathlib import Path
 from datetime import datetime
 
 import cv2
 import numpy as np
 
+try:
+    from .sensor_bus import BusPublisher, CameraStatus, PeopleCount
+    from .frame_ring import CAMERA_RING_NAME, DEFAULT_SLOTS, FrameRingReader, FrameRingWriter
+    from .frame_publisher import FramePublisher
+except ImportError:
+    from sensor_bus import BusPublisher, CameraStatus, PeopleCount
+    from frame_ring import CAMERA_RING_NAME, DEFAULT_SLOTS, FrameRingReader, FrameRingWriter
+    from frame_publisher import FramePublisher
+
 STATUS_FILE = Path(__file__).resolve().parents[2] / 'config' / 'hardware_status.json'
 DATA_DIR = Path('/opt/pulse/data/sensors')
 CAMERA_DIR = Path('/opt/pulse/data/camera')
-PEOPLE_COUNT_FILE = DATA_DIR / 'people_count.txt'
-CAMERA_STATUS_FILE = DATA_DIR / 'camera_active.txt'
 LATEST_FRAME_FILE = CAMERA_DIR / 'latest_frame.jpg'
 
+CAMERA_DEVICE = os.environ.get('PULSE_CAMERA_DEVICE', '/dev/video0')
+CAPTURE_WIDTH = int(os.environ.get('PULSE_CAMERA_WIDTH', '1280'))
+CAPTURE_HEIGHT = int(os.environ.get('PULSE_CAMERA_HEIGHT', '720'))
+CAPTURE_FPS = int(os.environ.get('PULSE_CAMERA_FPS', '15'))
+DETECTOR_MODEL = os.environ.get('PULSE_DETECTOR_MODEL', 'ssd')
+# Camera name in config.yaml whose ROIs and counting lines apply
+CAMERA_NAME = os.environ.get('PULSE_CAMERA_NAME', 'door')
+COUNT_INTERVAL = float(os.environ.get('PULSE_COUNT_INTERVAL', '2'))
+
 def _read_hardware_status() -> dict:
     try:
         return json.loads(STATUS_FILE.read_text())
@@ -49,38 +80,306 @@ async def has_camera() -> bool:
             return False
     return True
 
-def _write_placeholder_frame(people: int) -> None:
-    try:
-        CAMERA_DIR.mkdir(parents=True, exist_ok=True)
-        # Create simple placeholder image with the count overlay
-        h, w = 360, 640
-        img = np.zeros((h, w, 3), dtype=np.uint8)
-        # Draw a grid for visual texture
+PLACEHOLDER_SHAPE = (360, 640, 3)
+_placeholder_background = None
+
+def _placeholder_frame(people: int) -> np.ndarray:
+    global _placeholder_background
+    h, w = PLACEHOLDER_SHAPE[:2]
+    if _placeholder_background is None:
+        # Grid and title for visual texture; drawn once
+        img = np.zeros(PLACEHOLDER_SHAPE, dtype=np.uint8)
         for x in range(0, w, 40):
             cv2.line(img, (x, 0), (x, h), (32, 32, 32), 1)
         for y in range(0, h, 40):
             cv2.line(img, (0, y), (w, y), (32, 32, 32), 1)
-        # Title and count
         cv2.putText(img, 'Pulse Camera', (20, 40), cv2.FONT_HERSHEY_SIMPLEX, 1.0, (200, 200, 200), 2, cv2.LINE_AA)
-        cv2.putText(img, f'People detected: {people}', (20, 100), cv2.FONT_HERSHEY_SIMPLEX, 1.2, (0, 200, 255), 3, cv2.LINE_AA)
-        # Timestamp
-        ts = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        cv2.putText(img, ts, (20, h - 20), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (160, 160, 160), 1, cv2.LINE_AA)
-        # Save JPEG
-        cv2.imwrite(str(LATEST_FRAME_FILE), img, [int(cv2.IMWRITE_JPEG_QUALITY), 80])
+        _placeholder_background = img
+    img = _placeholder_background.copy()
+    # Count and timestamp
+    cv2.putText(img, f'People detected: {people}', (20, 100), cv2.FONT_HERSHEY_SIMPLEX, 1.2, (0, 200, 255), 3, cv2.LINE_AA)
+    ts = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    cv2.putText(img, ts, (20, h - 20), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (160, 160, 160), 1, cv2.LINE_AA)
+    return img
+
+def _publish_placeholder_frame(publisher, people: int) -> None:
+    try:
+        img = _placeholder_frame(people)
+        if publisher is not None:
+            publisher.publish(img, time.time())
+        else:
+            CAMERA_DIR.mkdir(parents=True, exist_ok=True)
+            cv2.imwrite(str(LATEST_FRAME_FILE), img, [int(cv2.IMWRITE_JPEG_QUALITY), 80])
     except Exception:
         pass
 
-async def main():
-    # Ensure data directories exist
-    DATA_DIR.mkdir(parents=True, exist_ok=True)
-    CAMERA_DIR.mkdir(parents=True, exist_ok=True)
-    
+class CameraCapture:
+    """Capture thread: V4L2 frames straight into the shared-memory frame ring"""
+
+    def __init__(self, device=CAMERA_DEVICE, width=CAPTURE_WIDTH, height=CAPTURE_HEIGHT, fps=CAPTURE_FPS,
+                 slots=DEFAULT_SLOTS, ring_name=CAMERA_RING_NAME):
+        self.device = device
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.slots = slots
+        self.ring_name = ring_name
+        self.ring = None
+        self.capture = None
+        self.frames = 0
+        self.failures = 0
+        self.reopens = 0
+        self.copies = 0
+        self.last_frame_time = None
+        self._running = False
+        self._thread = None
+
+    def _open_device(self):
+        capture = cv2.VideoCapture(self.device, cv2.CAP_V4L2)
+        if not capture.isOpened():
+            capture.release()
+            return None
+        capture.set(cv2.CAP_PROP_FRAME_WIDTH, self.width)
+        capture.set(cv2.CAP_PROP_FRAME_HEIGHT, self.height)
+        capture.set(cv2.CAP_PROP_FPS, self.fps)
+        # Keep the driver queue short so the ring holds the newest frames
+        capture.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        return capture
+
+    def open(self):
+        """Open the camera and size the ring from its first frame; False without a camera"""
+        self.capture = self._open_device()
+        if self.capture is None:
+            logging.warning(f"Cannot open camera {self.device}")
+            return False
+        ok, frame = self.capture.read()
+        if not ok or frame is None:
+            logging.warning(f"Camera {self.device} opened but returned no frame")
+            self.capture.release()
+            self.capture = None
+            return False
+        self.ring = FrameRingWriter.create(frame.shape, self.slots, self.ring_name)
+        self.ring.write(frame, time.time())
+        self.last_frame_time = time.time()
+        logging.info(f"Capturing {frame.shape[1]}x{frame.shape[0]} from {self.device}")
+        return True
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name='camera-capture', daemon=True)
+        self._thread.start()
+
+    def _reopen(self):
+        if self.capture is not None:
+            self.capture.release()
+        delay = 1.0
+        while self._running:
+            self.capture = self._open_device()
+            if self.capture is not None:
+                self.reopens += 1
+                logging.info(f"Camera {self.device} reopened")
+                return
+            time.sleep(delay)
+            delay = min(delay * 2, 30.0)
+
+    def _run(self):
+        shape = self.ring.shape
+        failed = 0
+        while self._running:
+            # Decode straight into the next slot; readers see it once committed
+            slot = self.ring.acquire()
+            ok, frame = self.capture.read(slot)
+            if not ok or frame is None:
+                self.failures += 1
+                failed += 1
+                if failed >= 10:
+                    logging.warning(f"Camera {self.device}: {failed} failed reads in a row, reopening")
+                    self._reopen()
+                    failed = 0
+                else:
+                    time.sleep(0.05)
+                continue
+            failed = 0
+            if frame is not slot:
+                # The driver changed size or format, so OpenCV allocated a new image
+                self.copies += 1
+                if frame.shape == shape:
+                    np.copyto(slot, frame)
+                elif frame.ndim == 3 and frame.shape[2] == shape[2]:
+                    cv2.resize(frame, (shape[1], shape[0]), dst=slot)
+                else:
+                    continue
+            self.last_frame_time = time.time()
+            self.ring.commit(self.last_frame_time)
+            self.frames += 1
+
+    @property
+    def alive(self):
+        """True while frames keep arriving"""
+        return self.last_frame_time is not None and time.time() - self.last_frame_time < 5.0
+
+    def stop(self):
+        self._running = False
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+        if self.capture is not None:
+            self.capture.release()
+        if self.ring is not None:
+            self.ring.close()
+
+    def stats(self):
+        return {'frames': self.frames, 'failures': self.failures, 'reopens': self.reopens, 'copies': self.copies}
+
+class PeoplePipeline:
+    """Detection thread: PersonDetector + PersonTracker on the newest ring frame"""
+
+    def __init__(self, ring=None, model_type=DETECTOR_MODEL, camera_name=CAMERA_NAME, publisher=None,
+                 detector=None):
+        """
+        Args:
+            ring: Frame ring to read; the capture's own ring in this process,
+                default: attach to the camera ring by name
+            model_type: PersonDetector model
+            camera_name: Camera in config.yaml whose ROIs and counting lines apply
+            publisher: FramePublisher for the processed frames, default: none;
+                the tracking overlay is drawn while its stream is watched
+            detector: Detector to use instead of a PersonDetector of ``model_type``
+        """
+        try:
+            from .camera_zones import CameraZones
+            from .motion_gate import MotionGate
+            from .person_detector import PersonDetector
+            from .person_tracker import OVERLAY_NEVER, OVERLAY_ON_DEMAND, PersonTracker
+        except ImportError:
+            from camera_zones import CameraZones
+            from motion_gate import MotionGate
+            from person_detector import PersonDetector
+            from person_tracker import OVERLAY_NEVER, OVERLAY_ON_DEMAND, PersonTracker
+
+        self._own_ring = ring is None
+        self.ring = FrameRingReader.attach() if ring is None else ring
+        if self.ring is None:
+            raise RuntimeError(f"Frame ring '{CAMERA_RING_NAME}' is not available")
+        self.zones = CameraZones.load(camera_name)
+        # Detection runs synchronously in this thread, on the ring view itself
+        # while it outlives detection, otherwise on a copy
+        if detector is None:
+            detector = PersonDetector(model_type=model_type, threaded=False, motion_gate=MotionGate())
+        self.detector = detector
+        self.publisher = publisher
+        if publisher is None:
+            self.tracker = PersonTracker(zones=self.zones, overlay=OVERLAY_NEVER)
+        else:
+            self.tracker = PersonTracker(zones=self.zones, overlay=OVERLAY_ON_DEMAND, viewers=publisher.viewers)
+        self.counts = {'entries': 0, 'exits': 0, 'current': 0}
+        self.frames = 0
+        self.overwritten = 0
+        self.copying = False
+        self.latency = None           # Smoothed detection time (s)
+        self.frame_interval = None    # Smoothed time between ring frames (s)
+        self._lock = threading.Lock()
+        self._running = False
+        self._thread = None
+
+    def start(self):
+        height, width = self.ring.shape[:2]
+        self.zones.scale(width, height)
+        self.detector.set_roi(self.zones.roi_box)
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name='people-pipeline', daemon=True)
+        self._thread.start()
+
+    @staticmethod
+    def _smooth(average, value):
+        return value if average is None else 0.8 * average + 0.2 * value
+
+    def _update_copying(self):
+        """Detect on copies while detection takes longer than a ring view lives"""
+        if self.latency is None or self.frame_interval is None:
+            return
+        # A view is reused once the capture has filled every other slot
+        lifetime = (self.ring.slots - 1) * self.frame_interval
+        if not self.copying and self.latency > 0.5 * lifetime:
+            self._set_copying(True)
+        elif self.copying and self.latency < 0.25 * lifetime:
+            self._set_copying(False)
+
+    def _set_copying(self, copying):
+        self.copying = copying
+        mode = 'a copy of each frame' if copying else 'ring frames in place'
+        logging.info(f"Detection takes {self.latency * 1000:.0f} ms per frame; detecting on {mode}")
+
+    def _run(self):
+        last_seq = 0
+        last_timestamp = None
+        while self._running:
+            latest = self.ring.latest(last_seq)
+            if latest is None:
+                time.sleep(0.005)
+                continue
+            seq, timestamp, view = latest
+            if last_timestamp is not None and timestamp > last_timestamp:
+                self.frame_interval = self._smooth(self.frame_interval, (timestamp - last_timestamp) / (seq - last_seq))
+            last_seq, last_timestamp = seq, timestamp
+            # Ring views are read-only; the overlay is drawn on a copy
+            if self.copying or self.tracker.overlay_enabled(timestamp):
+                frame = view.copy()
+                if not self.ring.valid(seq):
+                    # Overwritten while copying
+                    self.overwritten += 1
+                    continue
+            else:
+                frame = view
+            started = time.monotonic()
+            detections = self.detector.detect_people(frame, timestamp)
+            self.latency = self._smooth(self.latency, time.monotonic() - started)
+            if frame is view and not self.ring.valid(seq):
+                # The capture thread lapped us; the frame changed under the detector
+                self.overwritten += 1
+                if not self.copying:
+                    self._set_copying(True)
+                continue
+            self._update_copying()
+            frame, counts = self.tracker.process_detections(detections, frame, timestamp)
+            with self._lock:
+                self.counts = counts
+            self.frames += 1
+            if self.publisher is not None and self.publisher.due(timestamp):
+                # Encoding a ring view races the capture thread like detection does
+                intact = (lambda: self.ring.valid(seq)) if frame is view else None
+                self.publisher.publish(frame, timestamp, intact)
+
+    def get_counts(self):
+        with self._lock:
+            return dict(self.counts)
+
+    def stop(self):
+        self._running = False
+        if self._thread is not None:
+            self._thread.join(timeout=5.0)
+        self.detector.cleanup()
+        if self._own_ring:
+            self.ring.close()
+
+async def run_camera(bus, capture, pipeline):
+    """Publish tracker occupancy and camera status until cancelled"""
+    last_count = None
+    while True:
+        bus.publish(CameraStatus(active=capture.alive))
+        people = pipeline.get_counts()['current']
+        bus.publish(PeopleCount(count=people))
+        if people != last_count:
+            print(f"[Camera] {people} people in view")
+            last_count = people
+        await asyncio.sleep(COUNT_INTERVAL)
+
+async def simulate(bus, publisher=None):
+    """Simulated counts and a placeholder frame, for devices without a camera"""
     while True:
         has_cam = await has_camera()
         
         # Write camera status
-        CAMERA_STATUS_FILE.write_text('true' if has_cam else 'false')
+        bus.publish(CameraStatus(active=has_cam))
         
         # Simulate realistic occupancy variations
         hour = datetime.now().hour
@@ -96,20 +395,54 @@ async def main():
         people = max(0, people)
 
         if has_cam:
-            PEOPLE_COUNT_FILE.write_text(str(people))
+            bus.publish(PeopleCount(count=people))
             print(f"[Camera] Detected {people} people in venue")
         else:
             # When no camera, keep count conservative but still nonzero to validate pipeline
             fallback = min(people, 10)
-            PEOPLE_COUNT_FILE.write_text(str(fallback))
+            bus.publish(PeopleCount(count=fallback))
             print(f"[Camera] Camera not available, writing fallback count: {fallback}")
 
-        # Always write a placeholder frame so dashboard and light sensor can operate
-        _write_placeholder_frame(people if has_cam else fallback)
+        # Always publish a placeholder frame so dashboard and light sensor can operate
+        _publish_placeholder_frame(publisher, people if has_cam else fallback)
 
         await asyncio.sleep(5)  # Update every 5 seconds
 
+async def main():
+    # Ensure data directories exist
+    DATA_DIR.mkdir(parents=True, exist_ok=True)
+    CAMERA_DIR.mkdir(parents=True, exist_ok=True)
+    bus = BusPublisher()
+
+    capture = CameraCapture() if await has_camera() else None
+    if capture is None or not capture.open():
+        try:
+            publisher = FramePublisher(PLACEHOLDER_SHAPE)
+        except Exception as e:
+            logging.warning(f"Cannot publish frames through shared memory ({e}); writing {LATEST_FRAME_FILE}")
+            publisher = None
+        try:
+            await simulate(bus, publisher)
+        finally:
+            if publisher is not None:
+                publisher.close()
+        return
+
+    # Frames are published through shared memory; drop any old placeholder file
+    LATEST_FRAME_FILE.unlink(missing_ok=True)
+    capture.start()
+    publisher = FramePublisher(capture.ring.shape)
+    pipeline = PeoplePipeline(capture.ring, publisher=publisher)
+    pipeline.start()
+    try:
+        await run_camera(bus, capture, pipeline)
+    finally:
+        pipeline.stop()
+        publisher.close()
+        capture.stop()
+
 if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
     try:
         asyncio.run(main())
     except KeyboardInterrupt:
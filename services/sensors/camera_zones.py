@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""
+camera_zones.py - Per-camera regions of interest and counting lines
+
+Reads the ``cameras:`` section of config.yaml. Coordinates there are
+normalized (0..1 of the frame width/height) so they survive a resolution
+change; they are scaled to pixels once the frame size is known.
+
+Example:
+    cameras:
+      door:
+        roi:                       # polygons; detection runs on their bounding box
+          - [[0.0, 0.3], [1.0, 0.3], [1.0, 1.0], [0.0, 1.0]]
+        counting_lines:
+          - name: front_door
+            points: [[0.05, 0.65], [0.95, 0.65]]
+            entry_side: right      # side of A->B, as seen on screen, people walk in to
+"""
+
+import logging
+import os
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+try:
+    import yaml
+except ImportError:
+    yaml = None
+
+logger = logging.getLogger(__name__)
+
+CONFIG_FILE = Path(os.environ.get('CONFIG_FILE', '/opt/pulse/config/config.yaml'))
+# Repository copy, used when the installed config is missing
+REPO_CONFIG_FILE = Path(__file__).resolve().parents[2] / 'config.yaml'
+
+Point = Tuple[float, float]
+Box = Tuple[int, int, int, int]
+
+ENTRY = 1
+EXIT = -1
+
+
+def load_cameras_config(path: Optional[Path] = None) -> Dict[str, Dict]:
+    """Return the ``cameras`` section of config.yaml ({} when absent)"""
+    if yaml is None:
+        logger.warning("PyYAML not installed; camera zones disabled")
+        return {}
+    for candidate in ([Path(path)] if path else [CONFIG_FILE, REPO_CONFIG_FILE]):
+        try:
+            with open(candidate, 'r') as f:
+                return (yaml.safe_load(f) or {}).get('cameras') or {}
+        except FileNotFoundError:
+            continue
+        except Exception as e:
+            logger.error(f"Could not read camera config from {candidate}: {e}")
+            return {}
+    return {}
+
+
+def _cross(o: Point, a: Point, b: Point) -> float:
+    return (a[0] - o[0]) * (b[1] - o[1]) - (a[1] - o[1]) * (b[0] - o[0])
+
+
+def segments_intersect(p1: Point, p2: Point, q1: Point, q2: Point) -> bool:
+    """True when segment p1-p2 properly crosses segment q1-q2"""
+    d1 = _cross(q1, q2, p1)
+    d2 = _cross(q1, q2, p2)
+    d3 = _cross(p1, p2, q1)
+    d4 = _cross(p1, p2, q2)
+    return d1 * d2 < 0 and d3 * d4 < 0
+
+
+class CountingLine:
+    def __init__(self, name: str, points: Sequence[Point], entry_side: str = 'right', band: float = 0.02):
+        """
+        Args:
+            name: Line name used in logs and per-line counts
+            points: Normalized end points A and B
+            entry_side: 'right' or 'left' of A->B as seen on screen; a track
+                moving onto this side is an entry, the other way an exit
+            band: Half-width of the dead band around the line, as a fraction
+                of the frame diagonal; positions inside it do not change side
+        """
+        if len(points) != 2:
+            raise ValueError(f"Counting line '{name}' needs exactly two points")
+        if entry_side not in ('right', 'left'):
+            raise ValueError(f"Counting line '{name}': entry_side must be 'right' or 'left'")
+        self.name = name
+        self.norm_points = [tuple(map(float, p)) for p in points]
+        # With y pointing down, the right of A->B has a positive cross product
+        self.entry_sign = 1 if entry_side == 'right' else -1
+        self.band = band
+        self.a: Point = self.norm_points[0]
+        self.b: Point = self.norm_points[1]
+        self._length = 1.0
+        self._band_px = 0.0
+        self.entries = 0
+        self.exits = 0
+
+    def scale(self, width: int, height: int) -> None:
+        self.a = (self.norm_points[0][0] * width, self.norm_points[0][1] * height)
+        self.b = (self.norm_points[1][0] * width, self.norm_points[1][1] * height)
+        self._length = max(1e-6, float(np.hypot(self.b[0] - self.a[0], self.b[1] - self.a[1])))
+        self._band_px = self.band * float(np.hypot(width, height))
+
+    def side(self, point: Point) -> int:
+        """+1 right of A->B, -1 left, 0 inside the dead band"""
+        distance = _cross(self.a, self.b, point) / self._length
+        if abs(distance) <= self._band_px:
+            return 0
+        return 1 if distance > 0 else -1
+
+    def crossing(self, start: Point, end: Point) -> int:
+        """ENTRY, EXIT or 0 for a move from ``start`` (known side) to ``end``"""
+        before, after = self.side(start), self.side(end)
+        if before == 0 or after == 0 or before == after:
+            return 0
+        if not segments_intersect(start, end, self.a, self.b):
+            # Changed side beyond the ends of the line, e.g. walked around it
+            return 0
+        if after == self.entry_sign:
+            self.entries += 1
+            return ENTRY
+        self.exits += 1
+        return EXIT
+
+
+class CameraZones:
+    def __init__(self, name: str = 'default', rois: Sequence[Sequence[Point]] = (), lines: Sequence[CountingLine] = ()):
+        self.name = name
+        self.norm_rois = [[tuple(map(float, p)) for p in polygon] for polygon in rois]
+        self.lines = list(lines)
+        self.rois: List[np.ndarray] = []
+        self.size: Optional[Tuple[int, int]] = None
+        self._bbox: Optional[Box] = None
+
+    @classmethod
+    def from_config(cls, name: str, camera_config: Optional[Dict]) -> 'CameraZones':
+        camera_config = camera_config or {}
+        rois = camera_config.get('roi') or []
+        for polygon in rois:
+            if len(polygon) < 3:
+                raise ValueError(f"Camera '{name}': ROI polygons need at least three points")
+        lines = [
+            CountingLine(
+                line.get('name', f'line{i}'),
+                line['points'],
+                entry_side=line.get('entry_side', 'right'),
+                band=float(line.get('band', 0.02)),
+            )
+            for i, line in enumerate(camera_config.get('counting_lines') or [])
+        ]
+        return cls(name, rois, lines)
+
+    @classmethod
+    def load(cls, name: str, path: Optional[Path] = None) -> 'CameraZones':
+        """Zones for one camera from config.yaml (empty if not configured)"""
+        return cls.from_config(name, load_cameras_config(path).get(name))
+
+    def scale(self, width: int, height: int) -> None:
+        """Convert normalized coordinates to pixels for this frame size"""
+        if self.size == (width, height):
+            return
+        self.size = (width, height)
+        self.rois = [
+            np.array([(round(x * width), round(y * height)) for x, y in polygon], dtype=np.int32)
+            for polygon in self.norm_rois
+        ]
+        self._bbox = None
+        if self.rois:
+            x, y, w, h = cv2.boundingRect(np.concatenate(self.rois))
+            x, y = max(0, x), max(0, y)
+            self._bbox = (x, y, min(width, x + w) - x, min(height, y + h) - y)
+        for line in self.lines:
+            line.scale(width, height)
+
+    @property
+    def roi_box(self) -> Optional[Box]:
+        """Bounding box (x, y, w, h) of all ROI polygons, None for the full frame"""
+        return self._bbox
+
+    def contains(self, point: Point) -> bool:
+        """True when ``point`` lies in an ROI polygon (always, without ROIs)"""
+        if not self.rois:
+            return True
+        point = (float(point[0]), float(point[1]))
+        return any(cv2.pointPolygonTest(polygon, point, False) >= 0 for polygon in self.rois)
+
+    def line_counts(self) -> Dict[str, Dict[str, int]]:
+        return {line.name: {'entries': line.entries, 'exits': line.exits} for line in self.lines}
@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""
+detector_scheduler.py - Adaptive model and rate scheduling for PersonDetector
+
+Watches measured detection latency and the Pi's CPU temperature and moves the
+detector along a ladder of (model, detections per second) levels: down when
+the box is throttling, running hot or detection is falling behind the
+requested rate, and back up when there is headroom. Hysteresis (separate
+hot/cool temperatures, a minimum dwell per level and a growing back-off after
+a failed step up) keeps it from flapping. Every transition is logged.
+
+Usage:
+    scheduler = AdaptiveScheduler(max_rate=10)
+    detector = PersonDetector(model_type="yolo", scheduler=scheduler)
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+THERMAL_ZONE = Path('/sys/class/thermal/thermal_zone0/temp')
+# Raspberry Pi firmware throttle flags; bit 2 = currently throttled
+THROTTLED_FILE = Path('/sys/devices/platform/soc/soc:firmware/get_throttled')
+
+# Most to least expensive
+DEFAULT_MODELS = ('yolo', 'ssd', 'hog')
+
+
+def read_cpu_temperature(path: Path = THERMAL_ZONE) -> Optional[float]:
+    """CPU temperature in degrees C, or None if unavailable"""
+    try:
+        return int(path.read_text().strip()) / 1000.0
+    except (OSError, ValueError):
+        return None
+
+
+def read_throttled(path: Path = THROTTLED_FILE) -> bool:
+    """True while the Pi firmware reports active throttling"""
+    try:
+        return bool(int(path.read_text().strip(), 16) & 0x4)
+    except (OSError, ValueError):
+        return False
+
+
+class AdaptiveScheduler:
+    def __init__(
+        self,
+        models: Sequence[str] = DEFAULT_MODELS,
+        max_rate: float = 10.0,
+        min_rate: float = 1.0,
+        hot_temp: float = 75.0,
+        cool_temp: float = 65.0,
+        busy_fraction: float = 0.9,
+        headroom_fraction: float = 0.5,
+        hold_seconds: float = 10.0,
+        max_backoff_seconds: float = 600.0,
+        temp_interval: float = 2.0,
+        thermal_path: Path = THERMAL_ZONE,
+        throttled_path: Path = THROTTLED_FILE,
+    ):
+        """
+        Initialize the scheduler
+
+        Args:
+            models: Model ladder, most to least expensive
+            max_rate: Detections per second at the top of each model's range
+            min_rate: Lowest rate, used below the cheapest model
+            hot_temp: Step down at or above this CPU temperature (C)
+            cool_temp: Only step up below this CPU temperature (C)
+            busy_fraction: Step down when latency exceeds this share of the
+                detection interval
+            headroom_fraction: Only step up when latency is below this share
+            hold_seconds: Minimum time on a level before stepping again
+            max_backoff_seconds: Upper bound for the step-up back-off
+            temp_interval: Seconds between temperature reads
+        """
+        self.models = list(models)
+        self.max_rate = float(max_rate)
+        self.min_rate = float(min_rate)
+        self.hot_temp = hot_temp
+        self.cool_temp = cool_temp
+        self.busy_fraction = busy_fraction
+        self.headroom_fraction = headroom_fraction
+        self.hold_seconds = hold_seconds
+        self.max_backoff_seconds = max_backoff_seconds
+        self.temp_interval = temp_interval
+        self.thermal_path = Path(thermal_path)
+        self.throttled_path = Path(throttled_path)
+
+        self.detector = None
+        self.levels: List[Tuple[str, float]] = self._build_levels(self.models)
+        self.level = 0
+        self._lock = threading.Lock()
+
+        self.latency: Optional[float] = None   # EWMA, seconds
+        self.temperature: Optional[float] = None
+        self.throttled = False
+        self._last_temp_read = 0.0
+        self._last_detect = 0.0
+        self._level_since: Optional[float] = None   # set by the first measurement
+        self._last_step_up: Optional[float] = None
+        self._up_hold = hold_seconds
+
+        self.transitions = deque(maxlen=50)
+
+    def _build_levels(self, models: Sequence[str]) -> List[Tuple[str, float]]:
+        # Each model at full then half rate, then the cheapest model down to min_rate
+        half = max(self.min_rate, self.max_rate / 2.0)
+        levels: List[Tuple[str, float]] = []
+        for model in models:
+            levels.append((model, self.max_rate))
+            if half < self.max_rate:
+                levels.append((model, half))
+        if models and self.min_rate < half:
+            levels.append((models[-1], self.min_rate))
+        return levels
+
+    # ------------------------------ Binding ------------------------------- #
+    def bind(self, detector) -> None:
+        """Attach to a detector; levels for models it could not load are dropped"""
+        self.detector = detector
+        loaded = [m for m in self.models if detector.models.get(m, {}).get('loaded')]
+        if detector.model_type not in loaded:
+            # e.g. Hailo: keep the accelerator as the top level
+            loaded.insert(0, detector.model_type)
+        self.levels = self._build_levels(loaded or ['hog'])
+        # Start on the highest level using the detector's current model
+        current = [i for i, (model, _) in enumerate(self.levels) if model == detector.model_type]
+        self.level = current[0] if current else 0
+        self._apply(self.level)
+        logger.info(f"Detector scheduler levels: {', '.join(f'{m}@{r:g}/s' for m, r in self.levels)}")
+
+    def _apply(self, level: int) -> None:
+        model, _ = self.levels[level]
+        if self.detector is not None and self.detector.model_type != model:
+            self.detector.set_model(model)
+
+    # --------------------------- Per-frame hooks -------------------------- #
+    @property
+    def rate(self) -> float:
+        return self.levels[self.level][1]
+
+    def should_detect(self, now: Optional[float] = None) -> bool:
+        """Rate limiter: True when a detection is due at the current level"""
+        now = time.monotonic() if now is None else now
+        if now - self._last_detect >= 1.0 / self.rate:
+            self._last_detect = now
+            return True
+        return False
+
+    def record(self, latency: float, now: Optional[float] = None) -> None:
+        """Feed one measured detection latency (seconds) and re-evaluate"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self.latency = latency if self.latency is None else 0.8 * self.latency + 0.2 * latency
+            if now - self._last_temp_read >= self.temp_interval:
+                self._last_temp_read = now
+                self.temperature = read_cpu_temperature(self.thermal_path)
+                self.throttled = read_throttled(self.throttled_path)
+            self._evaluate(now)
+
+    # ------------------------------ Decisions ----------------------------- #
+    def _evaluate(self, now: float) -> None:
+        if self._level_since is None:
+            self._level_since = now
+        dwell = now - self._level_since
+        interval = 1.0 / self.rate
+        hot = self.throttled or (self.temperature is not None and self.temperature >= self.hot_temp)
+        behind = self.latency > interval * self.busy_fraction
+
+        if (hot or behind) and dwell >= self.hold_seconds and self.level < len(self.levels) - 1:
+            if self._last_step_up is not None and now - self._last_step_up < 2 * self._up_hold:
+                # The last step up did not hold; wait longer before the next one
+                self._up_hold = min(self.max_backoff_seconds, self._up_hold * 2)
+            reason = 'throttled' if self.throttled else 'hot' if hot else 'falling behind'
+            self._transition(self.level + 1, reason, now)
+            return
+
+        if self.level == 0 or hot or dwell < self._up_hold:
+            return
+        cool = self.temperature is None or self.temperature < self.cool_temp
+        # Latency must fit the faster interval of the level above
+        upper_interval = 1.0 / self.levels[self.level - 1][1]
+        if cool and self.latency < upper_interval * self.headroom_fraction:
+            self._last_step_up = now
+            self._transition(self.level - 1, 'headroom', now)
+        elif dwell >= 2 * self._up_hold:
+            # Stable here for a while; let a future step up try sooner again
+            self._up_hold = max(self.hold_seconds, self._up_hold / 2)
+
+    def _transition(self, level: int, reason: str, now: float) -> None:
+        old_model, old_rate = self.levels[self.level]
+        new_model, new_rate = self.levels[level]
+        temp = f"{self.temperature:.1f} C" if self.temperature is not None else "n/a"
+        logger.info(
+            f"Detector scheduler {old_model}@{old_rate:g}/s -> {new_model}@{new_rate:g}/s ({reason}): "
+            f"latency {self.latency * 1000:.1f} ms, temp {temp}, "
+            f"{now - self._level_since:.1f}s on previous level"
+        )
+        self.transitions.append({
+            'time': time.time(),
+            'from': f"{old_model}@{old_rate:g}",
+            'to': f"{new_model}@{new_rate:g}",
+            'reason': reason,
+            'latency_ms': round(self.latency * 1000, 1),
+            'temperature': self.temperature,
+            'dwell_s': round(now - self._level_since, 1),
+        })
+        self.level = level
+        self._level_since = now
+        # Judge the new level on its own measurements
+        self.latency = None
+        self._apply(level)
+
+    def stats(self) -> Dict:
+        model, rate = self.levels[self.level]
+        return {
+            'model': model,
+            'rate': rate,
+            'level': self.level,
+            'levels': len(self.levels),
+            'latency_ms': round(self.latency * 1000, 1) if self.latency is not None else None,
+            'temperature': self.temperature,
+            'throttled': self.throttled,
+            'up_hold_s': self._up_hold,
+            'transitions': list(self.transitions),
+        }
@@ -0,0 +1,203 @@
+"""
+dnn_utils.py - Shared helpers for the OpenCV DNN person detectors
+
+Pre- and post-processing that both person_detector.py and
+party_person_detector.py need, written as whole-array NumPy operations
+instead of per-row Python loops, plus a per-model inference context that
+keeps its buffers across frames.
+"""
+
+import time
+from typing import Dict, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+# COCO class id for "person" in YOLO outputs
+YOLO_PERSON_CLASS = 0
+
+
+def decode_yolo_outputs(
+    outputs: Sequence[np.ndarray],
+    frame_width: int,
+    frame_height: int,
+    confidence_threshold: float,
+    class_id: int = YOLO_PERSON_CLASS,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Decode raw YOLOv3 output layers into person boxes
+
+    Each output row is (cx, cy, w, h, objectness, class scores...), normalized
+    to the input size. A row is kept when ``class_id`` is its best class and
+    that score exceeds the threshold - the same rule as the old per-row loop.
+
+    Args:
+        outputs: Output layer arrays from ``net.forward(output_layers)``
+        frame_width, frame_height: Size of the frame the boxes map back to
+        confidence_threshold: Minimum class score
+
+    Returns:
+        tuple: (boxes, confidences) where boxes is an (N, 4) int array of
+        top-left (x, y, w, h) in frame pixels and confidences is (N,) float
+    """
+    if len(outputs) == 1:
+        rows = outputs[0].reshape(-1, outputs[0].shape[-1])
+    else:
+        rows = np.concatenate([o.reshape(-1, o.shape[-1]) for o in outputs])
+
+    # Cheap column test first; argmax only over the few surviving rows
+    rows = rows[rows[:, 5 + class_id] > confidence_threshold]
+    if rows.shape[0] == 0:
+        return np.empty((0, 4), dtype=np.int64), np.empty((0,), dtype=np.float32)
+    scores = rows[:, 5:]
+    rows = rows[scores.argmax(axis=1) == class_id]
+    confidences = rows[:, 5 + class_id]
+
+    # Scale to frame pixels; truncate like the previous astype("int") path
+    cxcywh = (rows[:, 0:4] * np.array([frame_width, frame_height, frame_width, frame_height])).astype(np.int64)
+    boxes = np.empty_like(cxcywh)
+    boxes[:, 0] = (cxcywh[:, 0] - cxcywh[:, 2] / 2).astype(np.int64)
+    boxes[:, 1] = (cxcywh[:, 1] - cxcywh[:, 3] / 2).astype(np.int64)
+    boxes[:, 2:4] = cxcywh[:, 2:4]
+    return boxes, confidences
+
+
+class DnnInferenceContext:
+    """
+    Reusable input/output buffers for one cv2.dnn network
+
+    Output layer names are resolved once at load time. The input blob, the
+    resize buffer and the forward outputs are allocated on the first frame
+    (or when the frame shape changes) and then written in place, so steady-state
+    inference does no per-frame allocation on the Python side. The result of
+    ``prepare`` is equivalent to ``cv2.dnn.blobFromImage(frame, scale, size,
+    mean, swap_rb, crop=False)``; like there, a scalar ``mean`` is a
+    ``cv2.Scalar`` and only applies to the first output channel.
+
+    With ``max_batch`` > 1 the blob has room for that many frames and
+    ``forward_batch`` runs them through the network in a single pass.
+    """
+
+    STAGES = ("preprocess", "inference", "postprocess")
+
+    def __init__(
+        self,
+        net,
+        input_size: Tuple[int, int],
+        scale: float = 1.0,
+        mean=0.0,
+        swap_rb: bool = False,
+        max_batch: int = 1,
+    ) -> None:
+        self.net = net
+        self.input_size = tuple(input_size)
+        self.scale = float(scale)
+        mean = (float(mean),) if np.isscalar(mean) else tuple(float(m) for m in mean)
+        self.mean = np.zeros((3, 1, 1), dtype=np.float32)
+        self.mean[:min(3, len(mean)), 0, 0] = mean[:3]
+        self.swap_rb = swap_rb
+        self.max_batch = max(1, int(max_batch))
+        self.output_names = list(net.getUnconnectedOutLayersNames())
+
+        width, height = self.input_size
+        self._blob = np.empty((self.max_batch, 3, height, width), dtype=np.float32)
+        self._resized: Optional[np.ndarray] = None
+        # Output buffers per batch size
+        self._outputs: Dict[int, list] = {}
+
+        self.batches = 0
+        self.frames = 0
+        self.allocations = {"blob": 1, "resize": 0, "outputs": 0}
+        self._stage_totals = dict.fromkeys(self.STAGES, 0.0)
+        self._stage_last = dict.fromkeys(self.STAGES, 0.0)
+
+    def prepare(self, frame: np.ndarray, index: int = 0) -> np.ndarray:
+        """Resize and normalize ``frame`` into slot ``index`` of the NCHW blob"""
+        width, height = self.input_size
+        channels = frame.shape[2] if frame.ndim == 3 else 1
+        if self._resized is None or self._resized.shape[2] != channels or self._resized.dtype != frame.dtype:
+            self._resized = np.empty((height, width, channels), dtype=frame.dtype)
+            self.allocations["resize"] += 1
+        resized = self._resized
+        if frame.shape[:2] == (height, width):
+            np.copyto(resized.reshape(frame.shape), frame)
+        else:
+            cv2.resize(frame, (width, height), dst=resized.reshape((height, width) + frame.shape[2:]),
+                       interpolation=cv2.INTER_LINEAR)
+
+        # HWC -> CHW (with optional BGR->RGB) straight into the blob, then
+        # (x - mean) * scale in place
+        planes = self._blob[index]
+        if channels == 1:
+            np.copyto(planes, resized[:, :, 0], casting="unsafe")
+        else:
+            src = resized[:, :, 2::-1] if self.swap_rb else resized[:, :, :3]
+            np.copyto(planes, src.transpose(2, 0, 1), casting="unsafe")
+        if self.mean.any():
+            np.subtract(planes, self.mean, out=planes)
+        if self.scale != 1.0:
+            np.multiply(planes, self.scale, out=planes)
+        return self._blob[index:index + 1]
+
+    def forward(self, frame: np.ndarray) -> list:
+        """Run the network on ``frame``; the returned arrays are reused next call"""
+        start = time.perf_counter()
+        self.prepare(frame)
+        self._record("preprocess", start)
+        return self._run(1)
+
+    def forward_batch(self, frames: Sequence[np.ndarray]) -> list:
+        """
+        Run up to ``max_batch`` frames through the network in one pass
+
+        Frames may differ in size; each is resized into its own blob slot.
+        Outputs cover the whole batch and are reused by the next batch of
+        the same size.
+        """
+        count = len(frames)
+        if not 0 < count <= self.max_batch:
+            raise ValueError(f"batch of {count} frames, context holds 1..{self.max_batch}")
+        start = time.perf_counter()
+        for index, frame in enumerate(frames):
+            self.prepare(frame, index)
+        self._record("preprocess", start)
+        return self._run(count)
+
+    def _run(self, count: int) -> list:
+        start = time.perf_counter()
+        self.net.setInput(self._blob[:count])
+        previous = self._outputs.get(count)
+        if previous is None:
+            outputs = list(self.net.forward(self.output_names))
+            self.allocations["outputs"] += 1
+        else:
+            outputs = list(self.net.forward(self.output_names, previous))
+            if any(a is not b for a, b in zip(outputs, previous)):
+                # OpenCV reallocated (output shape changed); keep its arrays
+                self.allocations["outputs"] += 1
+        self._outputs[count] = outputs
+        self._record("inference", start)
+        self.batches += 1
+        self.frames += count
+        return outputs
+
+    def record_postprocess(self, start: float) -> None:
+        """Account post-processing that began at ``time.perf_counter()`` == start"""
+        self._record("postprocess", start)
+
+    def _record(self, stage: str, start: float) -> None:
+        elapsed = time.perf_counter() - start
+        self._stage_last[stage] = elapsed
+        self._stage_totals[stage] += elapsed
+
+    def stats(self) -> Dict:
+        """Stage timings are per forward pass (one frame, or one batch)"""
+        batches = max(1, self.batches)
+        return {
+            "frames": self.frames,
+            "batches": self.batches,
+            "allocations": dict(self.allocations),
+            "last_ms": {k: round(v * 1000.0, 3) for k, v in self._stage_last.items()},
+            "avg_ms": {k: round(v * 1000.0 / batches, 3) for k, v in self._stage_totals.items()},
+            "total_ms": {k: v * 1000.0 for k, v in self._stage_totals.items()},
+        }
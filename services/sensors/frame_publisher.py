@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+frame_publisher.py - Encode camera frames once for every consumer
+
+The camera service hands each frame it wants to share to a FramePublisher,
+which JPEG-encodes it and shrinks it to a grayscale thumbnail exactly once,
+and publishes both in the shared-memory JPEG ring (frame_ring.py). The hub
+streams those bytes to all MJPEG viewers and the light sensor averages the
+thumbnail; nobody writes, reads or decodes a JPEG file any more.
+
+JPEG encoding uses the fastest encoder installed: simplejpeg or PyTurboJPEG
+(libjpeg-turbo called directly on the BGR frame), else OpenCV's imencode.
+PULSE_JPEG_ENCODER forces one of 'simplejpeg', 'turbojpeg' or 'opencv'.
+
+Usage:
+    publisher = FramePublisher(frame.shape)
+    if publisher.due(timestamp):
+        publisher.publish(frame, timestamp)
+    publisher.close()
+"""
+
+import logging
+import os
+from typing import Callable, Optional, Tuple
+
+import cv2
+import numpy as np
+
+try:
+    from .frame_ring import JpegRingWriter, thumbnail_shape
+    from .stream_viewers import StreamViewers
+except ImportError:
+    from frame_ring import JpegRingWriter, thumbnail_shape
+    from stream_viewers import StreamViewers
+
+logger = logging.getLogger(__name__)
+
+JPEG_QUALITY = int(os.environ.get('PULSE_JPEG_QUALITY', '80'))
+JPEG_ENCODERS = ('simplejpeg', 'turbojpeg', 'opencv')
+# Publication rate while nobody watches the stream: keeps snapshots and the
+# light sensor's thumbnail fresh without encoding every frame
+IDLE_INTERVAL = 1.0
+
+
+class JpegEncoder:
+    """BGR frame -> JPEG bytes with the fastest available backend"""
+
+    def __init__(self, quality: int = JPEG_QUALITY, backend: Optional[str] = None):
+        """
+        Args:
+            quality: JPEG quality (0-100)
+            backend: One of JPEG_ENCODERS, default: the first one installed
+        """
+        self.quality = quality
+        backend = backend or os.environ.get('PULSE_JPEG_ENCODER')
+        if backend and backend not in JPEG_ENCODERS:
+            raise ValueError(f"Unknown JPEG encoder '{backend}', expected one of {JPEG_ENCODERS}")
+        for name in ((backend,) if backend else JPEG_ENCODERS):
+            encode = getattr(self, f'_load_{name}')()
+            if encode is not None:
+                self.backend = name
+                self._encode = encode
+                break
+        else:
+            raise RuntimeError(f"JPEG encoder '{backend}' is not available")
+        logger.info(f"JPEG encoder: {self.backend} (quality {quality})")
+
+    def _load_simplejpeg(self):
+        try:
+            import simplejpeg
+        except ImportError:
+            return None
+        return lambda frame: simplejpeg.encode_jpeg(
+            np.ascontiguousarray(frame), quality=self.quality, colorspace='BGR', colorsubsampling='420')
+
+    def _load_turbojpeg(self):
+        try:
+            from turbojpeg import TJPF_BGR, TJSAMP_420, TurboJPEG
+            turbo = TurboJPEG()
+        except Exception:
+            # Not installed, or libturbojpeg itself is missing
+            return None
+        return lambda frame: turbo.encode(frame, quality=self.quality, pixel_format=TJPF_BGR,
+                                          jpeg_subsample=TJSAMP_420)
+
+    def _load_opencv(self):
+        params = [int(cv2.IMWRITE_JPEG_QUALITY), self.quality]
+
+        def encode(frame):
+            ok, buf = cv2.imencode('.jpg', frame, params)
+            return buf if ok else None
+        return encode
+
+    def encode(self, frame: np.ndarray):
+        """JPEG of a BGR (or grayscale) frame as a bytes-like object, or None on failure"""
+        if frame.ndim == 2 and self.backend != 'opencv':
+            frame = cv2.cvtColor(frame, cv2.COLOR_GRAY2BGR)
+        return self._encode(frame)
+
+
+def make_thumbnail(frame: np.ndarray, shape: Tuple[int, int]) -> np.ndarray:
+    """Grayscale ``shape`` (height, width) version of a BGR frame"""
+    # Shrink first: the color conversion then touches a few thousand pixels
+    small = cv2.resize(frame, (shape[1], shape[0]), interpolation=cv2.INTER_AREA)
+    return small if small.ndim == 2 else cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+
+
+class FramePublisher:
+    """Encode-once publication of camera frames to the shared-memory JPEG ring"""
+
+    def __init__(self, frame_shape: Tuple[int, ...], encoder: Optional[JpegEncoder] = None,
+                 viewers: Optional[StreamViewers] = None, idle_interval: float = IDLE_INTERVAL,
+                 ring: Optional[JpegRingWriter] = None):
+        """
+        Args:
+            frame_shape: Shape of the frames that will be published
+            encoder: JPEG encoder, default: JpegEncoder()
+            viewers: Stream viewer count; every frame is published while
+                someone watches, default: the hub's viewer file
+            idle_interval: Seconds between publications while nobody watches
+            ring: JPEG ring to write, default: a new one sized for frame_shape
+        """
+        self.encoder = encoder or JpegEncoder()
+        self.viewers = viewers or StreamViewers()
+        self.idle_interval = idle_interval
+        self.ring = ring or JpegRingWriter.create(frame_shape)
+        self.thumbnail_shape = thumbnail_shape(frame_shape)
+        self.published = 0
+        self.oversized = 0
+        self.torn = 0
+        self.last_published: Optional[float] = None
+
+    def due(self, timestamp: float) -> bool:
+        """True when a frame captured at ``timestamp`` should be published"""
+        if self.last_published is None or self.viewers.active(timestamp):
+            return True
+        return abs(timestamp - self.last_published) >= self.idle_interval
+
+    def publish(self, frame: np.ndarray, timestamp: float, intact: Optional[Callable[[], bool]] = None) -> bool:
+        """
+        Encode a frame and its thumbnail and publish them
+
+        Args:
+            frame: BGR frame
+            timestamp: Capture time of the frame
+            intact: For a frame read in place from the frame ring: returns
+                False once the writer has reused its slot, checked after
+                encoding so a torn frame is never published
+
+        Returns:
+            True when the frame was published
+        """
+        jpeg = self.encoder.encode(frame)
+        if jpeg is None:
+            return False
+        thumbnail = make_thumbnail(frame, self.thumbnail_shape)
+        if intact is not None and not intact():
+            self.torn += 1
+            return False
+        if self.ring.write(jpeg, thumbnail, timestamp) is None:
+            self.oversized += 1
+            logger.warning(f"JPEG of {len(jpeg)} bytes does not fit the ring slot; frame dropped")
+            return False
+        self.last_published = timestamp
+        self.published += 1
+        return True
+
+    def stats(self) -> dict:
+        return {'encoder': self.encoder.backend, 'published': self.published, 'oversized': self.oversized,
+                'torn': self.torn}
+
+    def close(self) -> None:
+        self.ring.close()
@@ -0,0 +1,333 @@
+#!/usr/bin/env python3
+"""
+frame_ring.py - Latest camera frames in shared-memory ring buffers
+
+The camera service captures straight into the slots of one named
+multiprocessing.shared_memory segment. Readers - the people detector, the
+light sensor, the hub's MJPEG stream - attach to the segment by name and get
+NumPy views of the frames in place, without copying or decoding anything.
+
+Layout: a small header (latest sequence number, geometry), per-slot
+sequence numbers and timestamps, then ``slots`` frames of height x width x
+channels uint8. The writer invalidates a slot before reusing it and
+publishes its sequence number only after the frame is complete, so a reader
+can tell whether a view is still intact with ``valid(seq)``. A view stays
+valid for about slots / fps - 400 ms with 6 slots at 15 FPS. Frames are
+dropped when the consumer holding a view is slower than that, so slow
+consumers must copy the frame first.
+
+A second, smaller ring carries what the camera service publishes for
+everyone else: each frame JPEG-encoded once (annotated while the stream is
+watched) plus a downscaled grayscale thumbnail. The hub streams the JPEG
+bytes as they are and the light sensor averages the thumbnail, so neither
+decodes nor re-encodes anything.
+
+Usage:
+    # camera service
+    ring = FrameRingWriter.create((720, 1280, 3))
+    slot = ring.acquire()          # capture into slot, e.g. capture.read(slot)
+    ring.commit(time.time())
+
+    # any other process
+    ring = FrameRingReader.attach()
+    frame = ring.latest()          # (seq, timestamp, view) or None
+
+    published = JpegRingReader.attach()
+    frame = published.latest()     # (seq, timestamp, jpeg bytes, thumbnail) or None
+"""
+
+import logging
+import os
+from multiprocessing import shared_memory
+from typing import Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+CAMERA_RING_NAME = os.environ.get('PULSE_CAMERA_RING', 'pulse_camera_frames')
+CAMERA_JPEG_RING_NAME = os.environ.get('PULSE_CAMERA_JPEG_RING', 'pulse_camera_jpeg')
+DEFAULT_SLOTS = 6
+JPEG_SLOTS = 3
+THUMBNAIL_WIDTH = 160
+
+_MAGIC = 0x50554C5345524E47   # "PULSERNG"
+_JPEG_MAGIC = 0x50554C53454A5047   # "PULSEJPG"
+_VERSION = 1
+# Frame ring: magic, version, slots, height, width, channels, latest seq, reserved
+# JPEG ring:  magic, version, slots, capacity, thumb height, thumb width, latest seq, reserved
+_HEADER_WORDS = 8
+_LATEST = 6
+
+
+def _data_offset(slots: int, slot_words: int = 2) -> int:
+    # Header, then per-slot seq, timestamp (, ...); data starts 64-byte aligned
+    meta = _HEADER_WORDS * 8 + slots * slot_words * 8
+    return (meta + 63) // 64 * 64
+
+
+def _attach(name: str, creator_tracker: bool = False) -> shared_memory.SharedMemory:
+    """
+    Attach without letting this process's resource tracker unlink the segment on exit
+
+    Args:
+        creator_tracker: True in a multiprocessing child of the creator, which
+            shares the creator's resource tracker; there the attach is a no-op
+            for the tracker, and unregistering would drop the creator's entry
+    """
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python < 3.13 always registers attached segments; undo that
+        from multiprocessing import resource_tracker
+        shm = shared_memory.SharedMemory(name=name)
+        if creator_tracker:
+            return shm
+        try:
+            resource_tracker.unregister(shm._name, 'shared_memory')
+        except Exception:
+            pass
+        return shm
+
+
+def _create(name: str, size: int, header) -> shared_memory.SharedMemory:
+    try:
+        shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+    except FileExistsError:
+        # Left over from a previous run that did not shut down cleanly
+        stale = shared_memory.SharedMemory(name=name)
+        stale.close()
+        stale.unlink()
+        shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+    words = np.ndarray((_HEADER_WORDS,), dtype=np.uint64, buffer=shm.buf)
+    words[:] = header
+    del words
+    return shm
+
+
+class _Ring:
+    """Header and per-slot sequence numbers/timestamps shared by both rings"""
+
+    MAGIC = _MAGIC
+    SLOT_WORDS = 2
+
+    def __init__(self, shm: shared_memory.SharedMemory):
+        self.shm = shm
+        self.header = np.ndarray((_HEADER_WORDS,), dtype=np.uint64, buffer=shm.buf)
+        if int(self.header[0]) != self.MAGIC or int(self.header[1]) != _VERSION:
+            raise ValueError(f"Shared memory '{shm.name}' is not a {type(self).__name__}")
+        self.slots = int(self.header[2])
+        meta = _HEADER_WORDS * 8
+        self.slot_seq = np.ndarray((self.slots,), dtype=np.uint64, buffer=shm.buf, offset=meta)
+        self.slot_ts = np.ndarray((self.slots,), dtype=np.float64, buffer=shm.buf, offset=meta + self.slots * 8)
+        self._map(_data_offset(self.slots, self.SLOT_WORDS))
+
+    def _map(self, offset: int) -> None:
+        raise NotImplementedError
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    @property
+    def latest_seq(self) -> int:
+        return int(self.header[_LATEST])
+
+    def valid(self, seq: int) -> bool:
+        """True while the frame with sequence number ``seq`` is still in its slot"""
+        return seq > 0 and int(self.slot_seq[seq % self.slots]) == seq
+
+    def _release(self) -> None:
+        # Views must go before the buffer can be closed
+        for key, value in list(vars(self).items()):
+            if isinstance(value, np.ndarray):
+                setattr(self, key, None)
+        self.shm.close()
+
+
+class _Writer:
+    """Single-producer side of a ring: invalidate a slot, fill it, publish it"""
+
+    _next = 1
+
+    def _claim(self) -> int:
+        slot = self._next % self.slots
+        self.slot_seq[slot] = 0
+        return slot
+
+    def commit(self, timestamp: float) -> int:
+        """Publish the frame written into the acquired slot; returns its sequence number"""
+        seq = self._next
+        slot = seq % self.slots
+        self.slot_ts[slot] = timestamp
+        self.slot_seq[slot] = seq
+        self.header[_LATEST] = seq
+        self._next = seq + 1
+        return seq
+
+    def close(self) -> None:
+        self._release()
+        try:
+            self.shm.unlink()
+        except FileNotFoundError:
+            pass
+
+
+class _Reader:
+    @classmethod
+    def attach(cls, name: Optional[str] = None):
+        """The named ring, or None when no camera service is publishing one"""
+        try:
+            return cls(_attach(name or cls.DEFAULT_NAME))
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def close(self) -> None:
+        self._release()
+
+
+class _FrameRing(_Ring):
+    def _map(self, offset: int) -> None:
+        self.shape = (int(self.header[3]), int(self.header[4]), int(self.header[5]))
+        self.frames = np.ndarray((self.slots,) + self.shape, dtype=np.uint8, buffer=self.shm.buf, offset=offset)
+
+    def latest(self, after: int = 0) -> Optional[Tuple[int, float, np.ndarray]]:
+        """
+        The newest complete frame, if newer than sequence number ``after``
+
+        Returns:
+            (seq, timestamp, view) or None; the view is read-only shared
+            memory and is overwritten ``slots`` frames later
+        """
+        seq = self.latest_seq
+        if seq <= after:
+            return None
+        slot = seq % self.slots
+        timestamp = float(self.slot_ts[slot])
+        if not self.valid(seq):
+            return None
+        view = self.frames[slot]
+        view.flags.writeable = False
+        return seq, timestamp, view
+
+
+class FrameRingWriter(_Writer, _FrameRing):
+    """The single producer of a frame ring (the camera service)"""
+
+    @classmethod
+    def create(cls, shape: Tuple[int, int, int], slots: int = DEFAULT_SLOTS,
+               name: str = CAMERA_RING_NAME) -> 'FrameRingWriter':
+        height, width, channels = shape
+        size = _data_offset(slots) + slots * height * width * channels
+        ring = cls(_create(name, size, (_MAGIC, _VERSION, slots, height, width, channels, 0, 0)))
+        ring.slot_seq[:] = 0
+        logger.info(f"Frame ring '{name}': {slots} slots of {width}x{height}x{channels}")
+        return ring
+
+    def acquire(self) -> np.ndarray:
+        """Writable view of the slot the next frame goes to; readers stop trusting it now"""
+        return self.frames[self._claim()]
+
+    def write(self, frame: np.ndarray, timestamp: float) -> int:
+        """Copy a frame in and publish it (when it could not be captured in place)"""
+        np.copyto(self.acquire(), frame)
+        return self.commit(timestamp)
+
+
+class FrameRingReader(_Reader, _FrameRing):
+    """A consumer attached to a frame ring created by another process (or thread)"""
+
+    DEFAULT_NAME = CAMERA_RING_NAME
+
+
+def thumbnail_shape(frame_shape: Tuple[int, ...], width: int = THUMBNAIL_WIDTH) -> Tuple[int, int]:
+    """(height, width) of the grayscale thumbnail published for frames of ``frame_shape``"""
+    width = min(width, frame_shape[1])
+    height = max(1, round(frame_shape[0] * width / frame_shape[1]))
+    return height, width
+
+
+class _JpegRing(_Ring):
+    MAGIC = _JPEG_MAGIC
+    SLOT_WORDS = 3      # seq, timestamp, JPEG length
+
+    def _map(self, offset: int) -> None:
+        self.capacity = int(self.header[3])
+        self.thumbnail_shape = (int(self.header[4]), int(self.header[5]))
+        self.lengths = np.ndarray((self.slots,), dtype=np.uint64, buffer=self.shm.buf,
+                                  offset=_HEADER_WORDS * 8 + self.slots * 16)
+        self.jpegs = np.ndarray((self.slots, self.capacity), dtype=np.uint8, buffer=self.shm.buf, offset=offset)
+        self.thumbnails = np.ndarray((self.slots,) + self.thumbnail_shape, dtype=np.uint8, buffer=self.shm.buf,
+                                     offset=offset + self.slots * self.capacity)
+
+    def latest(self, after: int = 0) -> Optional[Tuple[int, float, bytes, np.ndarray]]:
+        """
+        The newest published frame, if newer than sequence number ``after``
+
+        Returns:
+            (seq, timestamp, jpeg, thumbnail) or None; both are copies, as the
+            slot is reused ``slots`` frames later
+        """
+        seq = self.latest_seq
+        if seq <= after:
+            return None
+        slot = seq % self.slots
+        timestamp = float(self.slot_ts[slot])
+        length = int(self.lengths[slot])
+        if not self.valid(seq) or length > self.capacity:
+            return None
+        jpeg = self.jpegs[slot, :length].tobytes()
+        thumbnail = self.thumbnails[slot].copy()
+        if not self.valid(seq):
+            # Overwritten while copying
+            return None
+        return seq, timestamp, jpeg, thumbnail
+
+
+class JpegRingWriter(_Writer, _JpegRing):
+    """The single producer of the published-frame ring (the camera service)"""
+
+    @classmethod
+    def create(cls, frame_shape: Tuple[int, ...], slots: int = JPEG_SLOTS,
+               name: str = CAMERA_JPEG_RING_NAME) -> 'JpegRingWriter':
+        """
+        Args:
+            frame_shape: Shape of the frames to publish; sizes the JPEG
+                buffers (half a byte per pixel and channel is far above what
+                a JPEG of a camera frame needs) and the thumbnail
+        """
+        thumb_height, thumb_width = thumbnail_shape(frame_shape)
+        channels = frame_shape[2] if len(frame_shape) > 2 else 1
+        capacity = (frame_shape[0] * frame_shape[1] * channels // 2 + 4095) // 4096 * 4096
+        size = _data_offset(slots, cls.SLOT_WORDS) + slots * (capacity + thumb_height * thumb_width)
+        ring = cls(_create(name, size, (_JPEG_MAGIC, _VERSION, slots, capacity, thumb_height, thumb_width, 0, 0)))
+        ring.slot_seq[:] = 0
+        logger.info(f"JPEG ring '{name}': {slots} slots of {capacity // 1024} KB")
+        return ring
+
+    def write(self, jpeg, thumbnail: np.ndarray, timestamp: float) -> Optional[int]:
+        """
+        Publish one encoded frame and its thumbnail
+
+        Args:
+            jpeg: JPEG bytes (any buffer)
+            thumbnail: Grayscale image of ``thumbnail_shape``
+            timestamp: Capture time of the frame
+
+        Returns:
+            Sequence number, or None when the JPEG does not fit a slot
+        """
+        data = np.frombuffer(jpeg, dtype=np.uint8)
+        if data.size > self.capacity:
+            return None
+        slot = self._claim()
+        self.jpegs[slot, :data.size] = data
+        self.lengths[slot] = data.size
+        self.thumbnails[slot] = thumbnail
+        return self.commit(timestamp)
+
+
+class JpegRingReader(_Reader, _JpegRing):
+    """A consumer of the published-frame ring: the hub and the light sensor"""
+
+    DEFAULT_NAME = CAMERA_JPEG_RING_NAME
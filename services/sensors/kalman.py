@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+kalman.py - Constant-velocity Kalman filters for all tracks at once
+
+Each track is a 2D constant-velocity filter with state [cx, cy, vx, vy] in
+pixels and pixels/second. The states and covariances of every track live in
+contiguous NumPy arrays, and predict/update run as batched array operations,
+so the per-frame cost hardly changes with the number of tracks. Tracks are
+updated at irregular times, so each slot keeps the time its state refers to
+and prediction uses a per-track time step.
+"""
+
+from typing import Optional, Sequence
+
+import numpy as np
+
+
+class KalmanBank:
+    def __init__(
+        self,
+        capacity: int = 64,
+        measurement_std: float = 5.0,
+        acceleration_std: float = 150.0,
+        initial_velocity_std: float = 200.0,
+    ):
+        """
+        Args:
+            capacity: Initial number of slots; grows as needed
+            measurement_std: Detection center noise (pixels)
+            acceleration_std: Process noise as random acceleration (pixels/s^2)
+            initial_velocity_std: Velocity uncertainty of a new track (pixels/s)
+        """
+        self.measurement_var = measurement_std ** 2
+        self.acceleration_var = acceleration_std ** 2
+        self.initial_velocity_var = initial_velocity_std ** 2
+
+        self.x = np.zeros((capacity, 4))
+        self.P = np.zeros((capacity, 4, 4))
+        self.t = np.zeros(capacity)
+        self.active = np.zeros(capacity, dtype=bool)
+        self._free = list(range(capacity - 1, -1, -1))
+
+    # ------------------------------- Slots -------------------------------- #
+    def _grow(self) -> None:
+        old = len(self.t)
+        new = old * 2
+        self.x = np.concatenate([self.x, np.zeros((old, 4))])
+        self.P = np.concatenate([self.P, np.zeros((old, 4, 4))])
+        self.t = np.concatenate([self.t, np.zeros(old)])
+        self.active = np.concatenate([self.active, np.zeros(old, dtype=bool)])
+        self._free.extend(range(new - 1, old - 1, -1))
+
+    def add(self, center: Sequence[float], now: float) -> int:
+        """Start a filter at ``center`` with zero velocity; returns its slot"""
+        if not self._free:
+            self._grow()
+        slot = self._free.pop()
+        self.x[slot] = (center[0], center[1], 0.0, 0.0)
+        self.P[slot] = np.diag([
+            self.measurement_var, self.measurement_var,
+            self.initial_velocity_var, self.initial_velocity_var,
+        ])
+        self.t[slot] = now
+        self.active[slot] = True
+        return slot
+
+    def remove(self, slot: int) -> None:
+        if self.active[slot]:
+            self.active[slot] = False
+            self._free.append(slot)
+
+    def __len__(self) -> int:
+        return int(self.active.sum())
+
+    # ------------------------------ Filtering ----------------------------- #
+    def predict(self, now: float, slots: Optional[np.ndarray] = None) -> None:
+        """Advance the given slots (default: all active) to time ``now``"""
+        if slots is None:
+            slots = np.flatnonzero(self.active)
+        slots = np.asarray(slots, dtype=np.int64)
+        if slots.size == 0:
+            return
+        dt = np.maximum(0.0, now - self.t[slots])
+        x = self.x[slots]
+        P = self.P[slots]
+
+        # x' = F x with F = [[I, dt I], [0, I]]
+        x[:, 0:2] += x[:, 2:4] * dt[:, None]
+
+        # P' = F P F^T, written out per 2x2 block to avoid building F
+        pp, pv = P[:, 0:2, 0:2], P[:, 0:2, 2:4]
+        vp, vv = P[:, 2:4, 0:2], P[:, 2:4, 2:4]
+        d = dt[:, None, None]
+        new_pp = pp + d * (pv + vp) + d * d * vv
+        new_pv = pv + d * vv
+        P[:, 0:2, 0:2] = new_pp
+        P[:, 0:2, 2:4] = new_pv
+        P[:, 2:4, 0:2] = np.swapaxes(new_pv, 1, 2)
+
+        # Q for white-noise acceleration, per axis: q * [[dt^4/4, dt^3/2], [dt^3/2, dt^2]]
+        q = self.acceleration_var
+        dt2 = dt * dt
+        for axis in (0, 1):
+            P[:, axis, axis] += q * dt2 * dt2 / 4.0
+            P[:, axis, axis + 2] += q * dt2 * dt / 2.0
+            P[:, axis + 2, axis] += q * dt2 * dt / 2.0
+            P[:, axis + 2, axis + 2] += q * dt2
+
+        self.x[slots] = x
+        self.P[slots] = P
+        self.t[slots] = np.maximum(self.t[slots], now)
+
+    def update(self, slots: Sequence[int], centers: Sequence[Sequence[float]], now: float) -> None:
+        """Correct the given slots with measured centers taken at ``now``"""
+        slots = np.asarray(slots, dtype=np.int64)
+        if slots.size == 0:
+            return
+        self.predict(now, slots)
+        z = np.asarray(centers, dtype=np.float64).reshape(-1, 2)
+        x = self.x[slots]
+        P = self.P[slots]
+
+        # H = [I 0]: S = P_pp + R, K = P[:, :, :2] S^-1
+        S = P[:, 0:2, 0:2] + np.eye(2) * self.measurement_var
+        K = P[:, :, 0:2] @ np.linalg.inv(S)
+        innovation = z - x[:, 0:2]
+        x += np.einsum('nij,nj->ni', K, innovation)
+        P -= K @ P[:, 0:2, :]
+        # Keep P symmetric against rounding drift
+        P = 0.5 * (P + np.swapaxes(P, 1, 2))
+
+        self.x[slots] = x
+        self.P[slots] = P
+
+    # ------------------------------- Access ------------------------------- #
+    def positions(self, slots: Sequence[int]) -> np.ndarray:
+        """(N, 2) centers of the given slots"""
+        return self.x[np.asarray(slots, dtype=np.int64), 0:2]
+
+    def velocities(self, slots: Sequence[int]) -> np.ndarray:
+        """(N, 2) velocities (pixels/s) of the given slots"""
+        return self.x[np.asarray(slots, dtype=np.int64), 2:4]
@@ -1,16 +1,25 @@
 #!/usr/bin/env python3
 import asyncio
 import os
+import time
 from pathlib import Path
 from datetime import datetime
 
 import cv2
 import numpy as np
 
+try:
+    from .sensor_bus import BusPublisher, LightLevel
+    from .frame_ring import JpegRingReader
+except ImportError:
+    from sensor_bus import BusPublisher, LightLevel
+    from frame_ring import JpegRingReader
+
 DATA_DIR = Path('/opt/pulse/data/sensors')
 CAMERA_DIR = Path('/opt/pulse/data/camera')
 SNAPSHOT_FILE = CAMERA_DIR / 'latest_frame.jpg'
-LIGHT_LEVEL_FILE = DATA_DIR / 'light_level.txt'
+# Re-attach to the published-frame ring when it has not advanced for this long
+RING_STALE_SECONDS = 30.0
 
 def _calc_lux_from_image(img: np.ndarray) -> float:
     try:
@@ -26,28 +35,63 @@ def _calc_lux_from_image(img: np.ndarray) -> float:
     except Exception:
         return 0.0
 
+class RingLight:
+    """Light level from the grayscale thumbnail the camera service publishes with each frame"""
+
+    def __init__(self):
+        self.ring = None
+        self.last_seq = 0
+        self.last_change = time.monotonic()
+
+    def read(self):
+        """Lux of the newest camera frame, or None when the ring is unavailable"""
+        if self.ring is None:
+            self.ring = JpegRingReader.attach()
+            if self.ring is None:
+                return None
+            self.last_seq = 0
+            self.last_change = time.monotonic()
+        latest = self.ring.latest()
+        if latest is not None and latest[0] != self.last_seq:
+            self.last_seq = latest[0]
+            self.last_change = time.monotonic()
+        elif time.monotonic() - self.last_change > RING_STALE_SECONDS:
+            # Camera service stopped or restarted with a new ring
+            self.ring.close()
+            self.ring = None
+            return None
+        if latest is None:
+            return None
+        _, _, _, thumbnail = latest
+        return _calc_lux_from_image(thumbnail)
+
 async def main():
     DATA_DIR.mkdir(parents=True, exist_ok=True)
     CAMERA_DIR.mkdir(parents=True, exist_ok=True)
+    bus = BusPublisher()
+    ring_light = RingLight()
 
     while True:
         try:
-            img = None
-            if SNAPSHOT_FILE.exists():
-                img = cv2.imread(str(SNAPSHOT_FILE))
-            lux = _calc_lux_from_image(img)
-            # If snapshot not available, synthesize daytime/nighttime approximate lux
-            if lux == 0.0 and (not SNAPSHOT_FILE.exists()):
-                hour = datetime.now().hour
-                if 7 <= hour <= 19:
-                    lux = 400.0
-                else:
-                    lux = 50.0
-            LIGHT_LEVEL_FILE.write_text(f"{lux:.1f}")
+            lux = ring_light.read()
+            if lux is None:
+                # No camera frames: fall back to the snapshot file
+                img = None
+                if SNAPSHOT_FILE.exists():
+                    img = cv2.imread(str(SNAPSHOT_FILE))
+                lux = _calc_lux_from_image(img)
+                # If snapshot not available, synthesize daytime/nighttime approximate lux
+                if lux == 0.0 and (not SNAPSHOT_FILE.exists()):
+                    hour = datetime.now().hour
+                    if 7 <= hour <= 19:
+                        lux = 400.0
+                    else:
+                        lux = 50.0
+            bus.publish(LightLevel(lux=lux))
             print(f"[Light] {lux:.1f} lux")
         except Exception as e:
             try:
-                LIGHT_LEVEL_FILE.write_text("0.0")
+                bus.publish(LightLevel(lux=0.0))
             except Exception:
                 pass
         await asyncio.sleep(int(os.getenv('LIGHT_UPDATE_INTERVAL_SEC', '10')))
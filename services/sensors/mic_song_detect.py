@@ -5,10 +5,13 @@ import random
 from pathlib import Path
 from datetime import datetime
 
+try:
+    from .sensor_bus import BusPublisher, AudioLevel, SongDetection
+except ImportError:
+    from sensor_bus import BusPublisher, AudioLevel, SongDetection
+
 STATUS_FILE = Path(__file__).resolve().parents[2] / 'config' / 'hardware_status.json'
 DATA_DIR = Path('/opt/pulse/data/sensors')
-SONG_FILE = DATA_DIR / 'song.json'
-AUDIO_LEVEL_FILE = DATA_DIR / 'audio_level.txt'
 
 def _read_hardware_status() -> dict:
     try:
@@ -55,6 +58,7 @@ SAMPLE_SONGS = [
 
 async def main():
     DATA_DIR.mkdir(parents=True, exist_ok=True)
+    bus = BusPublisher()
     
     song_index = 0
     song_duration = 0
@@ -76,7 +80,7 @@ async def main():
             
             # Add variations
             db_level = base_db + random.uniform(-3, 3)
-            AUDIO_LEVEL_FILE.write_text(f"{db_level:.1f}")
+            bus.publish(AudioLevel(decibels=round(db_level, 1)))
             
             # Song detection (simulate detecting a new song every 3-4 minutes)
             song_duration += 3
@@ -89,33 +93,21 @@ async def main():
             detected = random.random() < 0.85
             
             if detected and song_duration < 200:  # Don't detect at end of song
-                song_data = {
-                    "title": SAMPLE_SONGS[song_index]["title"],
-                    "artist": SAMPLE_SONGS[song_index]["artist"],
-                    "detected": True,
-                    "timestamp": datetime.now().isoformat()
-                }
-                print(f"[Mic] 🎵 Detected: {song_data['title']} by {song_data['artist']}, Audio: {db_level:.1f}dB")
+                song = SongDetection(
+                    title=SAMPLE_SONGS[song_index]["title"],
+                    artist=SAMPLE_SONGS[song_index]["artist"],
+                    detected=True
+                )
+                print(f"[Mic] 🎵 Detected: {song.title} by {song.artist}, Audio: {db_level:.1f}dB")
             else:
-                song_data = {
-                    "title": "No song detected",
-                    "artist": "",
-                    "detected": False,
-                    "timestamp": datetime.now().isoformat()
-                }
+                song = SongDetection()
                 print(f"[Mic] No song detected, Audio: {db_level:.1f}dB")
             
-            SONG_FILE.write_text(json.dumps(song_data, indent=2))
+            bus.publish(song)
         else:
             # No microphone available
-            AUDIO_LEVEL_FILE.write_text("0.0")
-            song_data = {
-                "title": "No song detected",
-                "artist": "",
-                "detected": False,
-                "timestamp": datetime.now().isoformat()
-            }
-            SONG_FILE.write_text(json.dumps(song_data, indent=2))
+            bus.publish(AudioLevel(decibels=0.0))
+            bus.publish(SongDetection())
             print("[Mic] Microphone not available")
         
         await asyncio.sleep(3)
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+motion_gate.py - Cheap motion pre-stage for person detection
+
+Compares small grayscale copies of consecutive frames (or runs a MOG2
+background subtractor on them) and tells the detector whether anything
+moved, and where. Static frames skip inference entirely; when only part of
+the frame moved, inference can be limited to the padded motion regions.
+A periodic keyframe still runs a full-frame pass so slow drift and people
+standing still are re-checked.
+"""
+
+import logging
+import time
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+Box = Tuple[int, int, int, int]
+
+
+class MotionResult(NamedTuple):
+    motion: bool
+    # Regions (x, y, w, h) in full-frame pixels; None means the whole frame
+    rois: Optional[List[Box]]
+    changed_ratio: float
+
+
+def boxes_overlap(a: Box, b: Box) -> bool:
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    return ax < bx + bw and bx < ax + aw and ay < by + bh and by < ay + ah
+
+
+def intersect_boxes(a: Box, b: Box) -> Optional[Box]:
+    """Overlap of two (x, y, w, h) boxes, or None if they do not overlap"""
+    x1, y1 = max(a[0], b[0]), max(a[1], b[1])
+    x2, y2 = min(a[0] + a[2], b[0] + b[2]), min(a[1] + a[3], b[1] + b[3])
+    if x2 <= x1 or y2 <= y1:
+        return None
+    return (x1, y1, x2 - x1, y2 - y1)
+
+
+class MotionGate:
+    def __init__(
+        self,
+        method: str = 'diff',
+        width: int = 160,
+        pixel_threshold: int = 25,
+        min_area_ratio: float = 0.002,
+        roi_padding: float = 0.15,
+        min_roi_size: Tuple[int, int] = (128, 256),
+        max_roi_ratio: float = 0.5,
+        max_rois: int = 2,
+        keyframe_interval: float = 5.0,
+    ):
+        """
+        Initialize the motion gate
+
+        Args:
+            method: 'diff' (difference to the previous frame) or 'mog2'
+            width: Width of the downscaled analysis frame
+            pixel_threshold: Gray-level change that counts as motion ('diff')
+            min_area_ratio: Changed fraction of the frame below which it is static
+            roi_padding: Padding added around each motion region, as a fraction of its size
+            min_roi_size: Smallest crop (w, h) in full-frame pixels handed to a detector
+            max_roi_ratio: Crops covering more than this fraction run full-frame instead
+            max_rois: More separate regions than this also run full-frame
+            keyframe_interval: Seconds between forced full-frame passes (0 disables)
+        """
+        self.method = method
+        self.width = width
+        self.pixel_threshold = pixel_threshold
+        self.min_area_ratio = min_area_ratio
+        self.roi_padding = roi_padding
+        self.min_roi_size = min_roi_size
+        self.max_roi_ratio = max_roi_ratio
+        self.max_rois = max_rois
+        self.keyframe_interval = keyframe_interval
+
+        self._previous: Optional[np.ndarray] = None
+        self._subtractor = None
+        if method == 'mog2':
+            self._subtractor = cv2.createBackgroundSubtractorMOG2(history=300, varThreshold=16, detectShadows=False)
+        elif method != 'diff':
+            raise ValueError(f"Unknown motion method '{method}'")
+        self._kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (3, 3))
+        self._last_keyframe = 0.0
+
+        # Statistics
+        self.frames = 0
+        self.skipped = 0
+        self.cropped = 0
+        self.full = 0
+        self._crop_area_total = 0.0
+
+    def reset(self) -> None:
+        """Forget the reference frame; the next frame runs full-frame"""
+        self._previous = None
+        self._last_keyframe = 0.0
+
+    def _mask(self, frame: np.ndarray) -> np.ndarray:
+        h, w = frame.shape[:2]
+        size = (self.width, max(1, round(h * self.width / w)))
+        # Resize before the color conversion so only the small frame is converted
+        small = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+        if small.ndim == 3:
+            small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        small = cv2.GaussianBlur(small, (5, 5), 0)
+
+        if self._subtractor is not None:
+            mask = self._subtractor.apply(small)
+        elif self._previous is None or self._previous.shape != small.shape:
+            mask = np.full_like(small, 255)
+        else:
+            diff = cv2.absdiff(small, self._previous)
+            _, mask = cv2.threshold(diff, self.pixel_threshold, 255, cv2.THRESH_BINARY)
+        self._previous = small
+        return cv2.dilate(mask, self._kernel, iterations=2)
+
+    def check(self, frame: np.ndarray, now: Optional[float] = None) -> MotionResult:
+        """
+        Decide how much of ``frame`` needs inference
+
+        Returns:
+            MotionResult: motion=False to skip the frame; otherwise rois lists
+            the regions to run on, or None for the whole frame
+        """
+        now = time.monotonic() if now is None else now
+        self.frames += 1
+        h, w = frame.shape[:2]
+        mask = self._mask(frame)
+        changed = cv2.countNonZero(mask) / float(mask.size)
+
+        if self.keyframe_interval and now - self._last_keyframe >= self.keyframe_interval:
+            self._last_keyframe = now
+            self.full += 1
+            return MotionResult(True, None, changed)
+
+        if changed < self.min_area_ratio:
+            self.skipped += 1
+            return MotionResult(False, [], changed)
+
+        rois = self._regions(mask, w, h)
+        area = sum(rw * rh for _, _, rw, rh in rois) / float(w * h)
+        if not rois or len(rois) > self.max_rois or area > self.max_roi_ratio:
+            self.full += 1
+            return MotionResult(True, None, changed)
+        self.cropped += 1
+        self._crop_area_total += area
+        return MotionResult(True, rois, changed)
+
+    def _regions(self, mask: np.ndarray, w: int, h: int) -> List[Box]:
+        contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        scale = w / float(mask.shape[1])
+        min_area = self.min_area_ratio * mask.size
+        boxes: List[Box] = []
+        for contour in contours:
+            if cv2.contourArea(contour) < min_area:
+                continue
+            x, y, bw, bh = cv2.boundingRect(contour)
+            boxes.append(self._pad((x * scale, y * scale, bw * scale, bh * scale), w, h))
+        # Merge padded regions that overlap until none do
+        merged = True
+        while merged and len(boxes) > 1:
+            merged = False
+            for i in range(len(boxes)):
+                for j in range(i + 1, len(boxes)):
+                    if boxes_overlap(boxes[i], boxes[j]):
+                        ax, ay, aw, ah = boxes[i]
+                        bx, by, bw, bh = boxes.pop(j)
+                        x1, y1 = min(ax, bx), min(ay, by)
+                        x2, y2 = max(ax + aw, bx + bw), max(ay + ah, by + bh)
+                        boxes[i] = (x1, y1, x2 - x1, y2 - y1)
+                        merged = True
+                        break
+                if merged:
+                    break
+        return boxes
+
+    def _pad(self, box, w: int, h: int) -> Box:
+        x, y, bw, bh = box
+        pad_w = max(bw * (1 + 2 * self.roi_padding), self.min_roi_size[0])
+        pad_h = max(bh * (1 + 2 * self.roi_padding), self.min_roi_size[1])
+        cx, cy = x + bw / 2.0, y + bh / 2.0
+        x1 = int(max(0, min(w - pad_w, cx - pad_w / 2.0)))
+        y1 = int(max(0, min(h - pad_h, cy - pad_h / 2.0)))
+        x2 = int(min(w, x1 + pad_w))
+        y2 = int(min(h, y1 + pad_h))
+        return (x1, y1, x2 - x1, y2 - y1)
+
+    def stats(self) -> Dict:
+        frames = max(1, self.frames)
+        return {
+            'method': self.method,
+            'frames': self.frames,
+            'skipped': self.skipped,
+            'cropped': self.cropped,
+            'full': self.full,
+            'skip_ratio': round(self.skipped / frames, 3),
+            'crop_ratio': round(self.cropped / frames, 3),
+            'avg_crop_area': round(self._crop_area_total / max(1, self.cropped), 3),
+        }
@@ -20,6 +20,11 @@ import numpy as np
 import cv2
 import threading
 
+try:
+    from .dnn_utils import DnnInferenceContext, decode_yolo_outputs
+except ImportError:
+    from dnn_utils import DnnInferenceContext, decode_yolo_outputs
+
 logger = logging.getLogger(__name__)
 
 # Optional Hailo accelerator support (if available in environment)
@@ -71,6 +76,11 @@ class PersonDetector:
         self._frame_for_detection: np.ndarray | None = None
         self._detections: List[Dict] = []
         self._lock = threading.Lock()
+        # Signals the worker that _frame_for_detection holds a new frame
+        self._frame_ready = threading.Condition(self._lock)
+        self.frames_submitted = 0
+        self.frames_processed = 0
+        self.frames_dropped = 0
 
         self._start_detection_thread()
 
@@ -105,6 +115,7 @@ class PersonDetector:
         try:
             net = cv2.dnn.readNetFromCaffe(prototxt, caffemodel)
             self.models["ssd"]["detector"] = net
+            self.models["ssd"]["context"] = DnnInferenceContext(net, (300, 300), scale=0.007843, mean=127.5)
             self.models["ssd"]["loaded"] = True
             logger.info("MobileNet-SSD model loaded")
         except Exception as e:
@@ -130,6 +141,10 @@ class PersonDetector:
             net.setPreferableBackend(cv2.dnn.DNN_BACKEND_OPENCV)
             net.setPreferableTarget(cv2.dnn.DNN_TARGET_CPU)
             self.models["yolo"]["detector"] = net
+            # Output layers and input/output buffers are resolved once here
+            self.models["yolo"]["context"] = DnnInferenceContext(
+                net, self.models["yolo"]["input_size"], scale=1 / 255.0, swap_rb=True
+            )
             self.models["yolo"]["loaded"] = True
             logger.info("YOLOv3 model loaded")
         except Exception as e:
@@ -143,18 +158,20 @@ class PersonDetector:
             self._det_thread.start()
 
     def _detection_worker(self) -> None:
-        while self._det_thread_active:
-            frame = None
+        while True:
+            # Sleep until a frame is handed over; the worker then owns it
+            with self._frame_ready:
+                while self._det_thread_active and self._frame_for_detection is None:
+                    self._frame_ready.wait()
+                if not self._det_thread_active:
+                    return
+                frame = self._frame_for_detection
+                self._frame_for_detection = None
+            detections = self._detect_with_model(frame, self.model_type)
+            filtered = self._filter_detections(detections, frame)
             with self._lock:
-                if self._frame_for_detection is not None:
-                    frame = self._frame_for_detection.copy()
-                    self._frame_for_detection = None
-            if frame is not None:
-                detections = self._detect_with_model(frame, self.model_type)
-                filtered = self._filter_detections(detections, frame)
-                with self._lock:
-                    self._detections = filtered
-            time.sleep(0.005)
+                self._detections = filtered
+                self.frames_processed += 1
 
     # ---------------------------- Model helpers --------------------------- #
     def _detect_with_model(self, frame: np.ndarray, model_type: str) -> List[Dict]:
@@ -171,41 +188,27 @@ class PersonDetector:
 
     def _detect_with_yolo(self, frame: np.ndarray) -> List[Dict]:
         h, w = frame.shape[:2]
-        blob = cv2.dnn.blobFromImage(frame, 1 / 255.0, self.models["yolo"]["input_size"], swapRB=True, crop=False)
-        net = self.models["yolo"]["detector"]
-        net.setInput(blob)
-        layer_names = net.getLayerNames()
-        output_layers = [layer_names[i - 1] for i in net.getUnconnectedOutLayers().flatten()]
-        outputs = net.forward(output_layers)
-
-        boxes: List[List[int]] = []
-        confidences: List[float] = []
+        context: DnnInferenceContext = self.models["yolo"]["context"]
+        outputs = context.forward(frame)
+        post_start = time.perf_counter()
+
+        box_array, conf_array = decode_yolo_outputs(outputs, w, h, self.confidence_threshold)
+        boxes: List[List[int]] = box_array.tolist()
+        confidences: List[float] = conf_array.tolist()
         people: List[Dict] = []
-        for output in outputs:
-            for detection in output:
-                scores = detection[5:]
-                class_id = int(np.argmax(scores))
-                confidence = float(scores[class_id])
-                if class_id == 0 and confidence > self.confidence_threshold:
-                    bx = detection[0:4] * np.array([w, h, w, h])
-                    cx, cy, bw, bh = bx.astype(int)
-                    x = int(cx - bw / 2)
-                    y = int(cy - bh / 2)
-                    boxes.append([x, y, int(bw), int(bh)])
-                    confidences.append(confidence)
         if boxes:
             indices = cv2.dnn.NMSBoxes(boxes, confidences, self.confidence_threshold, 0.4)
             for i in (indices.flatten() if len(indices) > 0 else []):
                 x, y, bw, bh = boxes[i]
                 people.append({"box": (x, y, bw, bh), "confidence": confidences[i], "detector": "YOLO"})
+        context.record_postprocess(post_start)
         return people
 
     def _detect_with_ssd(self, frame: np.ndarray) -> List[Dict]:
         h, w = frame.shape[:2]
-        blob = cv2.dnn.blobFromImage(frame, 0.007843, (300, 300), 127.5)
-        net = self.models["ssd"]["detector"]
-        net.setInput(blob)
-        detections = net.forward()
+        context: DnnInferenceContext = self.models["ssd"]["context"]
+        detections = context.forward(frame)[0]
+        post_start = time.perf_counter()
         people: List[Dict] = []
         for i in range(detections.shape[2]):
             confidence = float(detections[0, 0, i, 2])
@@ -219,6 +222,7 @@ class PersonDetector:
             bw = x2 - x1
             bh = y2 - y1
             people.append({"box": (max(0, x1), max(0, y1), bw, bh), "confidence": confidence, "detector": "SSD"})
+        context.record_postprocess(post_start)
         return people
 
     def _detect_with_hog(self, frame: np.ndarray) -> List[Dict]:
@@ -274,10 +278,15 @@ class PersonDetector:
                 self._fps_start = time.time()
 
             if self._det_thread_active:
-                with self._lock:
-                    if self._frame_for_detection is None:
-                        self._frame_for_detection = frame.copy()
-                with self._lock:
+                # One copy per frame, made outside the lock; the worker owns it
+                frame_copy = frame.copy()
+                with self._frame_ready:
+                    # Drop-oldest: replace a frame the worker has not taken yet
+                    if self._frame_for_detection is not None:
+                        self.frames_dropped += 1
+                    self._frame_for_detection = frame_copy
+                    self.frames_submitted += 1
+                    self._frame_ready.notify()
                     return list(self._detections)
 
             # Synchronous path
@@ -317,8 +326,27 @@ class PersonDetector:
     def get_fps(self) -> float:
         return float(self._fps)
 
+    def get_queue_stats(self) -> Dict[str, int]:
+        """Frames handed to the detection thread, processed, and dropped"""
+        with self._lock:
+            return {
+                "submitted": self.frames_submitted,
+                "processed": self.frames_processed,
+                "dropped": self.frames_dropped,
+            }
+
+    def get_inference_stats(self) -> Dict[str, Dict]:
+        """Allocation counts and per-stage timings of the loaded DNN models"""
+        return {
+            name: model["context"].stats()
+            for name, model in self.models.items()
+            if model.get("loaded") and "context" in model
+        }
+
     def cleanup(self) -> None:
-        self._det_thread_active = False
+        with self._frame_ready:
+            self._det_thread_active = False
+            self._frame_ready.notify_all()
         if self._det_thread and self._det_thread.is_alive():
             try:
                 self._det_thread.join(timeout=1.0)
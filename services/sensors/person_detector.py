@@ -14,6 +14,14 @@ import time
 import threading
 import numpy as np
 import cv2
+try:
+    from .dnn_utils import DnnInferenceContext, decode_yolo_outputs
+except ImportError:
+    from dnn_utils import DnnInferenceContext, decode_yolo_outputs
+try:
+    from .motion_gate import boxes_overlap, intersect_boxes
+except ImportError:
+    from motion_gate import boxes_overlap, intersect_boxes
 # Try to import Hailo detector
 try:
     from .hailo_detector import HailoPersonDetector, HAILO_AVAILABLE
@@ -22,17 +30,27 @@ except ImportError:
     logging.warning("Hailo detector module not available")
 
 class PersonDetector:
-    def __init__(self, confidence_threshold=0.45, model_type="hog"):
+    def __init__(self, confidence_threshold=0.45, model_type="hog", threaded=True, motion_gate=None,
+                 scheduler=None):
         """
         Initialize the person detector
         
         Args:
             confidence_threshold: Minimum confidence for detection
             model_type: Detection model to use (hog, ssd, yolo, or hailo)
+            threaded: Run detection in a background thread; when False,
+                detect_people() detects synchronously
+            motion_gate: Optional MotionGate; static frames are then skipped
+                and partly changed frames are only searched in the moving regions
+            scheduler: Optional AdaptiveScheduler that picks the model and the
+                detection rate from measured latency and CPU temperature
         """
         # Configuration
         self.confidence_threshold = confidence_threshold
         self.model_type = model_type
+        self.motion_gate = motion_gate
+        # Static region (x, y, w, h) detection is limited to, see set_roi()
+        self.roi = None
         
         # Initialize models
         self.models = {}
@@ -67,16 +85,28 @@ class PersonDetector:
         self.detection_thread = None
         self.detection_thread_active = False
         self.frame_for_detection = None
+        self.rois_for_detection = None
         self.detections = []
         self.detection_lock = threading.Lock()
+        # Signals the worker that frame_for_detection holds a new frame
+        self.frame_ready = threading.Condition(self.detection_lock)
+        self.frames_submitted = 0
+        self.frames_processed = 0
+        self.frames_dropped = 0
         
         # Filtering parameters
         self.min_person_height = 80
         self.min_person_width = 30
         self.min_aspect_ratio = 1.2  # Height should be at least this times width for a person
         
+        # Adaptive model/rate scheduling
+        self.scheduler = scheduler
+        if scheduler is not None:
+            scheduler.bind(self)
+        
         # Start detection thread
-        self.start_detection_thread()
+        if threaded:
+            self.start_detection_thread()
     
     def initialize_models(self):
         """Initialize detection models"""
@@ -152,6 +182,13 @@ class PersonDetector:
                 # Prefer CPU for compatibility, change to DNN_TARGET_OPENCL for GPU
                 self.models['yolo']['detector'].setPreferableBackend(cv2.dnn.DNN_BACKEND_OPENCV)
                 self.models['yolo']['detector'].setPreferableTarget(cv2.dnn.DNN_TARGET_CPU)
+                # Output layers and input/output buffers are resolved once here
+                self.models['yolo']['context'] = DnnInferenceContext(
+                    self.models['yolo']['detector'],
+                    self.models['yolo']['input_size'],
+                    scale=1/255.0,
+                    swap_rb=True
+                )
                 self.models['yolo']['loaded'] = True
                 logging.info("YOLO model loaded successfully")
             except Exception as e:
@@ -181,6 +218,12 @@ class PersonDetector:
         if os.path.exists(prototxt_path) and os.path.exists(model_path):
             try:
                 self.models['ssd']['detector'] = cv2.dnn.readNetFromCaffe(prototxt_path, model_path)
+                self.models['ssd']['context'] = DnnInferenceContext(
+                    self.models['ssd']['detector'],
+                    (300, 300),
+                    scale=0.007843,
+                    mean=127.5
+                )
                 self.models['ssd']['loaded'] = True
                 logging.info("MobileNet SSD model loaded successfully")
             except Exception as e:
@@ -197,24 +240,56 @@ class PersonDetector:
     
     def _detection_worker(self):
         """Worker thread for detection processing"""
-        while self.detection_thread_active:
-            if self.frame_for_detection is not None:
-                with self.detection_lock:
-                    frame = self.frame_for_detection.copy()
-                    self.frame_for_detection = None
-                
-                # Run detection with selected model
-                detections = self._detect_with_model(frame, self.model_type)
-                
-                # Apply improved filtering
-                filtered_detections = self._filter_detections(detections)
-                
-                # Update detections
-                with self.detection_lock:
-                    self.detections = filtered_detections
+        while True:
+            # Sleep until a frame is handed over; the worker then owns it
+            with self.frame_ready:
+                while self.detection_thread_active and self.frame_for_detection is None:
+                    self.frame_ready.wait()
+                if not self.detection_thread_active:
+                    return
+                frame = self.frame_for_detection
+                rois = self.rois_for_detection
+                self.frame_for_detection = None
             
-            # Sleep to avoid consuming too much CPU
-            time.sleep(0.01)
+            # Run detection with selected model and apply improved filtering
+            started = time.perf_counter()
+            filtered_detections = self._detect_frame(frame, rois)
+            if self.scheduler is not None:
+                self.scheduler.record(time.perf_counter() - started)
+            
+            # Update detections
+            with self.detection_lock:
+                self.detections = filtered_detections
+                self.frames_processed += 1
+    
+    def _detect_frame(self, frame, rois=None):
+        """
+        Detect and filter people in a frame, optionally only inside regions
+        
+        Args:
+            frame: Input frame
+            rois: (x, y, w, h) regions to search, or None for the whole frame
+            
+        Returns:
+            list: Filtered detections in frame coordinates
+        """
+        frame_size = (frame.shape[1], frame.shape[0])
+        if not rois:
+            return self._filter_detections(self._detect_with_model(frame, self.model_type), frame_size)
+        
+        detections = []
+        for x, y, w, h in rois:
+            # Slicing gives a view; the crop is not copied
+            for detection in self._detect_with_model(frame[y:y + h, x:x + w], self.model_type):
+                bx, by, bw, bh = detection['box']
+                detection['box'] = (bx + x, by + y, bw, bh)
+                detections.append(detection)
+        
+        # Nothing moved outside the regions, so earlier detections there still hold
+        with self.detection_lock:
+            previous = self.detections
+        detections.extend(d for d in previous if not any(boxes_overlap(d['box'], roi) for roi in rois))
+        return self._filter_detections(detections, frame_size)
     
     def _detect_with_model(self, frame, model_type):
         """
@@ -241,49 +316,33 @@ class PersonDetector:
         # Get frame dimensions
         (h, w) = frame.shape[:2]
         
-        # Create a blob from the frame
-        blob = cv2.dnn.blobFromImage(
-            frame, 
-            1/255.0, 
-            self.models['yolo']['input_size'], 
-            swapRB=True, 
-            crop=False
-        )
-        
-        # Set input and get output layer names
-        self.models['yolo']['detector'].setInput(blob)
-        layer_names = self.models['yolo']['detector'].getLayerNames()
-        output_layers = [layer_names[i-1] for i in self.models['yolo']['detector'].getUnconnectedOutLayers().flatten()]
-        
-        # Forward pass through the network
-        outputs = self.models['yolo']['detector'].forward(output_layers)
+        # Forward pass through the network using the preallocated blob and
+        # output buffers
+        context = self.models['yolo']['context']
+        outputs = context.forward(frame)
+        post_start = time.perf_counter()
+        people = self._yolo_people(outputs, w, h)
+        context.record_postprocess(post_start)
+        return people
+    
+    def _yolo_people(self, outputs, w, h):
+        """
+        Turn YOLO output layers for one frame into person detections
         
+        Args:
+            outputs: Output layer arrays for a single frame
+            w, h: Size of the frame the outputs belong to
+            
+        Returns:
+            list: List of detections
+        """
         people = []
-        boxes = []
-        confidences = []
-        class_ids = []
-        
-        # Process each output layer
-        for output in outputs:
-            for detection in output:
-                scores = detection[5:]
-                class_id = np.argmax(scores)
-                confidence = scores[class_id]
-                
-                # Filter for person class (ID 0 in COCO dataset)
-                if class_id == 0 and confidence > self.confidence_threshold:
-                    # Scale the bounding box coordinates back to the frame size
-                    box = detection[0:4] * np.array([w, h, w, h])
-                    (center_x, center_y, width, height) = box.astype("int")
-                    
-                    # Calculate top-left corner coordinates
-                    x = int(center_x - (width / 2))
-                    y = int(center_y - (height / 2))
-                    
-                    # Add to lists
-                    boxes.append([x, y, int(width), int(height)])
-                    confidences.append(float(confidence))
-                    class_ids.append(class_id)
+        
+        # Decode all output layers at once: person-class rows above the
+        # threshold, scaled to frame pixels as top-left (x, y, w, h)
+        box_array, conf_array = decode_yolo_outputs(outputs, w, h, self.confidence_threshold)
+        boxes = box_array.tolist()
+        confidences = conf_array.tolist()
         
         # Apply non-maximum suppression to remove overlapping boxes
         if boxes:
@@ -311,29 +370,39 @@ class PersonDetector:
         # Get frame dimensions
         (h, w) = frame.shape[:2]
         
-        # Create a blob from the frame
-        blob = cv2.dnn.blobFromImage(frame, 0.007843, (300, 300), 127.5)
-        
-        # Set the blob as input to the network
-        self.models['ssd']['detector'].setInput(blob)
-        
         # Forward pass to get detections
-        detections = self.models['ssd']['detector'].forward()
+        context = self.models['ssd']['context']
+        detections = context.forward(frame)[0]
+        post_start = time.perf_counter()
+        people = self._ssd_people(detections[0, 0], w, h)
+        context.record_postprocess(post_start)
+        return people
+    
+    def _ssd_people(self, detections, w, h):
+        """
+        Turn SSD DetectionOutput rows for one frame into person detections
         
+        Args:
+            detections: (N, 7) rows of [image_id, class_id, confidence, x1, y1, x2, y2]
+            w, h: Size of the frame the rows belong to
+            
+        Returns:
+            list: List of detections
+        """
         people = []
         
         # Process the detections
-        for i in range(detections.shape[2]):
-            confidence = detections[0, 0, i, 2]
+        for i in range(detections.shape[0]):
+            confidence = detections[i, 2]
             
             if confidence > self.confidence_threshold:
                 # Extract the class ID
-                class_id = int(detections[0, 0, i, 1])
+                class_id = int(detections[i, 1])
                 
                 # Person class is ID 15 in MobileNet SSD
                 if class_id == 15:
                     # Get bounding box coordinates
-                    box = detections[0, 0, i, 3:7] * np.array([w, h, w, h])
+                    box = detections[i, 3:7] * np.array([w, h, w, h])
                     (startX, startY, endX, endY) = box.astype("int")
                     
                     # Calculate width and height
@@ -393,16 +462,19 @@ class PersonDetector:
         
         return people
     
-    def _filter_detections(self, detections):
+    def _filter_detections(self, detections, frame_size=None):
         """
         Filter detections to remove body parts and false positives
         
         Args:
             detections: List of detection dictionaries
+            frame_size: (width, height) of the source frame, defaults to the
+                last frame passed to detect_people
             
         Returns:
             list: Filtered detections
         """
+        frame_width, frame_height = frame_size or (self.frame_width, self.frame_height)
         filtered = []
         
         for detection in detections:
@@ -418,7 +490,7 @@ class PersonDetector:
                 continue
             
             # Position check - reject detections that are mostly outside the frame
-            if y + h < 0 or y > self.frame_height or x + w < 0 or x > self.frame_width:
+            if y + h < 0 or y > frame_height or x + w < 0 or x > frame_width:
                 continue
             
             # Add to filtered detections
@@ -451,12 +523,15 @@ class PersonDetector:
         
         return filtered
     
-    def detect_people(self, frame):
+    def detect_people(self, frame, timestamp=None):
         """
         Detect people in a frame
         
         Args:
             frame: Input frame
+            timestamp: Capture time of the frame; when given, the motion
+                keyframe interval and the scheduler follow frame time instead
+                of the clock (for replays). Use it for every frame or none
             
         Returns:
             list: List of detections after filtering
@@ -472,16 +547,48 @@ class PersonDetector:
             self.frame_count = 0
             self.start_time = time.time()
         
+        # Scheduler rate limit, then the motion pre-stage: a frame that is
+        # not due or is static keeps the last detections
+        if self.scheduler is not None and not self.scheduler.should_detect(timestamp):
+            with self.detection_lock:
+                return self.detections.copy()
+        rois = None
+        if self.motion_gate is not None:
+            motion = self.motion_gate.check(frame, timestamp)
+            if not motion.motion:
+                with self.detection_lock:
+                    return self.detections.copy()
+            rois = motion.rois
+        if self.roi is not None:
+            # Restrict to the configured region; motion elsewhere is ignored
+            if rois is None:
+                rois = [self.roi]
+            else:
+                rois = [box for box in (intersect_boxes(r, self.roi) for r in rois) if box]
+                if not rois:
+                    with self.detection_lock:
+                        return self.detections.copy()
+        
         # Submit frame for background processing if thread is active
         if self.detection_thread_active:
-            with self.detection_lock:
-                # Only update if previous frame has been processed
-                if self.frame_for_detection is None:
-                    self.frame_for_detection = frame.copy()
+            # The caller keeps using its frame, so hand the worker its own
+            # copy; made outside the lock so the worker is never blocked on it
+            frame_copy = frame.copy()
+            with self.frame_ready:
+                # Drop-oldest: a frame the worker has not picked up yet is
+                # replaced by the newer one
+                if self.frame_for_detection is not None:
+                    self.frames_dropped += 1
+                self.frame_for_detection = frame_copy
+                self.rois_for_detection = rois
+                self.frames_submitted += 1
+                self.frame_ready.notify()
         else:
             # Fallback to synchronous detection
-            detections = self._detect_with_model(frame, self.model_type)
-            filtered_detections = self._filter_detections(detections)
+            started = time.perf_counter()
+            filtered_detections = self._detect_frame(frame, rois)
+            if self.scheduler is not None:
+                self.scheduler.record(time.perf_counter() - started, timestamp)
             with self.detection_lock:
                 self.detections = filtered_detections
         
@@ -540,6 +647,37 @@ class PersonDetector:
         """Get current detection FPS"""
         return self.fps
     
+    def get_queue_stats(self):
+        """Frames handed to the detection thread, processed, and dropped"""
+        with self.detection_lock:
+            return {
+                'submitted': self.frames_submitted,
+                'processed': self.frames_processed,
+                'dropped': self.frames_dropped
+            }
+    
+    def set_roi(self, box):
+        """
+        Limit detection to a region of the frame
+        
+        Args:
+            box: (x, y, w, h) in frame pixels, e.g. CameraZones.roi_box,
+                or None for the full frame
+        """
+        self.roi = tuple(int(v) for v in box) if box else None
+    
+    def get_motion_stats(self):
+        """Skip and crop ratios of the motion pre-stage, or None without one"""
+        return self.motion_gate.stats() if self.motion_gate is not None else None
+    
+    def get_inference_stats(self):
+        """Allocation counts and per-stage timings of the loaded DNN models"""
+        return {
+            name: model['context'].stats()
+            for name, model in self.models.items()
+            if model.get('loaded') and 'context' in model
+        }
+    
     def set_confidence_threshold(self, threshold):
         """
         Set new confidence threshold
@@ -552,7 +690,9 @@ class PersonDetector:
     def cleanup(self):
         """Clean up resources"""
         # Stop detection thread
-        self.detection_thread_active = False
+        with self.frame_ready:
+            self.detection_thread_active = False
+            self.frame_ready.notify_all()
         if self.detection_thread and self.detection_thread.is_alive():
             self.detection_thread.join(timeout=1.0)
             logging.info("Detection thread stopped")
@@ -14,23 +14,78 @@ import time
 import logging
 import numpy as np
 import cv2
+try:
+    from .camera_zones import ENTRY, EXIT
+    from .assignment import iou_matrix, linear_assignment, xywh_to_xyxy
+    from .kalman import KalmanBank
+    from .track_store import ACTIVE, EXITED, INVALID, TENTATIVE, TrackStore
+    from .stream_viewers import StreamViewers
+except ImportError:
+    from camera_zones import ENTRY, EXIT
+    from assignment import iou_matrix, linear_assignment, xywh_to_xyxy
+    from kalman import KalmanBank
+    from track_store import ACTIVE, EXITED, INVALID, TENTATIVE, TrackStore
+    from stream_viewers import StreamViewers
+
+# Detection/track pairs scoring this or more are never matched
+MATCH_GATE = 100
+
+# Trajectory points kept per track
+TRAJECTORY_LENGTH = 30
+
+# Seconds finished tracks are kept (for debug drawing) before their slot is reused
+TRACK_RETENTION = ((INVALID, 1.0), (EXITED, 30.0))
+
+# When the tracking overlay is drawn into the frame
+OVERLAY_ALWAYS = 'always'
+OVERLAY_ON_DEMAND = 'on_demand'   # Only while someone watches the camera stream
+OVERLAY_NEVER = 'never'           # Headless: counting only, frames are left untouched
+OVERLAY_MODES = (OVERLAY_ALWAYS, OVERLAY_ON_DEMAND, OVERLAY_NEVER)
+
+def _dashed_box(x, y, w, h, step=5, dash=3):
+    """Dash segments ((K, 2, 2) int32) outlining a box, for a single cv2.polylines call"""
+    along_w = np.arange(0, w, step)
+    along_h = np.arange(0, h, step)
+    segments = []
+    for top in (y, y + h):
+        row = np.full_like(along_w, top)
+        segments.append(np.stack([np.stack([x + along_w, row], 1), np.stack([x + along_w + dash, row], 1)], 1))
+    for left in (x, x + w):
+        col = np.full_like(along_h, left)
+        segments.append(np.stack([np.stack([col, y + along_h], 1), np.stack([col, y + along_h + dash], 1)], 1))
+    return np.concatenate(segments).astype(np.int32)
 
 class PersonTracker:
-    def __init__(self, confidence_threshold=0.5, min_detection_frames=5):
+    def __init__(self, confidence_threshold=0.5, min_detection_frames=5, zones=None,
+                 overlay=OVERLAY_ALWAYS, viewers=None):
         """
         Initialize the person tracker
         
         Args:
             confidence_threshold: Minimum confidence for a detection to be considered
             min_detection_frames: Minimum number of consecutive frames to track before counting
+            zones: Optional CameraZones; detections outside its ROI polygons are
+                ignored, and with counting lines entries/exits are only counted
+                when a trajectory crosses a line
+            overlay: 'always' draws tracking info into every frame, 'on_demand'
+                only while a stream viewer is connected, 'never' runs headless
+            viewers: StreamViewers used by 'on_demand' (default: the hub's viewer file)
         """
+        if overlay not in OVERLAY_MODES:
+            raise ValueError(f"overlay must be one of {OVERLAY_MODES}, not {overlay!r}")
+        
         # Configuration
         self.confidence_threshold = confidence_threshold
         self.min_detection_frames = min_detection_frames
+        self.zones = zones
+        self.overlay = overlay
+        self.viewers = viewers if viewers is not None or overlay != OVERLAY_ON_DEMAND else StreamViewers()
         
         # Tracking state
-        self.tracked_people = {}      # Dictionary of all tracked people
+        self.tracks = TrackStore(     # All tracked people, one slot each
+            history=TRAJECTORY_LENGTH, lines=len(zones.lines) if zones is not None else 0)
         self.next_id = 0              # ID counter for new detections
+        self.kalman = KalmanBank()    # Constant-velocity filters, one per live track
         
         # Counting state
         self.entry_count = 0          # People who entered the frame
@@ -55,6 +110,12 @@ class PersonTracker:
         if self.frame_height != height or self.frame_width != width:
             self.frame_height = height
             self.frame_width = width
+            if self.zones is not None:
+                self.zones.scale(width, height)
+    
+    def _uses_lines(self):
+        """True when entries/exits come from counting lines"""
+        return self.zones is not None and bool(self.zones.lines)
             
     def _is_valid_person(self, detection):
         """
@@ -84,233 +145,154 @@ class PersonTracker:
         # Confidence check
         if detection.get('confidence', 0) < self.confidence_threshold:
             return False
+        
+        # ROI check on the feet (bottom center of the box)
+        if self.zones is not None and not self.zones.contains((x + w / 2, y + h)):
+            return False
             
         return True
         
-    def _calculate_detection_features(self, detection):
+    def _match_detections(self, detections, now):
         """
-        Calculate additional features from a detection to help with tracking
+        Match detections to tracked people by optimal assignment
         
-        Args:
-            detection: Dictionary with detection information
-            
-        Returns:
-            tuple: Center point, area, aspect ratio
-        """
-        x, y, w, h = detection['box']
-        center = (x + w // 2, y + h // 2)
-        area = w * h
-        aspect_ratio = h / w if w > 0 else 0
-        
-        return center, area, aspect_ratio
-        
-    def _match_detection_to_tracked(self, detection):
-        """
-        Match a detection to existing tracked people using improved matching algorithm
+        Every detection/track pair is scored at once on predicted-center
+        distance, shape change, IoU and time since last seen, and the total
+        score is minimized over all pairs. Pairs scoring MATCH_GATE or more
+        are never matched, and each track takes at most one detection.
         
         Args:
-            detection: Dictionary with detection information
+            detections: List of valid detections for this frame
+            now: Frame time
             
         Returns:
-            int or None: ID of the matched person, or None if no match
+            list: Matched track slot, or None for a new person, per detection
         """
-        if not self._is_valid_person(detection):
-            return None
-            
-        x, y, w, h = detection['box']
-        new_center, new_area, new_aspect = self._calculate_detection_features(detection)
-        
-        best_id = None
-        best_score = float('inf')
-        
-        # Box representation as (x1, y1, x2, y2)
-        new_box = [x, y, x + w, y + h]
-        
-        for person_id, data in self.tracked_people.items():
-            # Skip people who have exited
-            if data['status'] in ('exited', 'invalid'):
-                continue
-                
-            px, py, pw, ph = data['box']
-            old_center = data['center']
-            old_area = pw * ph
-            old_aspect = ph / pw if pw > 0 else 0
-            
-            # Time since last seen (for predicting movement)
-            time_gap = time.time() - data['last_seen']
-            if time_gap > 1.0:  # Skip if not seen for more than 1 second
-                continue
-                
-            # Calculate predicted position based on velocity
-            velocity = data['velocity']
-            predicted_x = old_center[0] + velocity[0] * time_gap
-            predicted_y = old_center[1] + velocity[1] * time_gap
-            
-            # Distance between centers (using prediction)
-            distance = np.sqrt((new_center[0] - predicted_x)**2 + (new_center[1] - predicted_y)**2)
-            
-            # Area difference ratio (1 = same area)
-            area_ratio = new_area / old_area if old_area > 0 else float('inf')
-            if area_ratio < 1:
-                area_ratio = 1 / area_ratio
-                
-            # Aspect ratio difference
-            aspect_diff = abs(new_aspect - old_aspect)
-            
-            # Calculate IoU (Intersection over Union)
-            old_box = [px, py, px + pw, py + ph]
-            iou = self._calculate_iou(new_box, old_box)
-            
-            # Calculate overall matching score (lower is better)
-            # We prioritize IoU and distance for matching
-            position_score = distance * 0.5
-            shape_score = (area_ratio - 1) * 20 + aspect_diff * 10
-            iou_score = (1 - iou) * 50  # Higher weight for IoU
-            time_score = time_gap * 10
-            
-            score = position_score + shape_score + iou_score + time_score
-            
-            # Use a threshold for matching
-            if score < 100 and score < best_score:
-                best_score = score
-                best_id = person_id
-                
-        return best_id
-        
-    def _calculate_iou(self, box1, box2):
-        """
-        Calculate Intersection over Union between two bounding boxes
-        
-        Args:
-            box1, box2: Bounding boxes in format [x1, y1, x2, y2]
-            
-        Returns:
-            float: IoU value between 0 and 1
-        """
-        # Calculate intersection
-        x_left = max(box1[0], box2[0])
-        y_top = max(box1[1], box2[1])
-        x_right = min(box1[2], box2[2])
-        y_bottom = min(box1[3], box2[3])
-        
-        if x_right < x_left or y_bottom < y_top:
-            return 0.0
-            
-        intersection = (x_right - x_left) * (y_bottom - y_top)
-        
-        # Calculate union
-        box1_area = (box1[2] - box1[0]) * (box1[3] - box1[1])
-        box2_area = (box2[2] - box2[0]) * (box2[3] - box2[1])
-        union = box1_area + box2_area - intersection
-        
-        # Calculate IoU
-        iou = intersection / union if union > 0 else 0.0
-        
-        return iou
-        
-    def process_detections(self, detections, frame):
+        matches = [None] * len(detections)
+        tracks = self.tracks
+        
+        # Skip people who have exited or were not seen for more than 1 second
+        candidates = tracks.slots_with(TENTATIVE, ACTIVE)
+        candidates = candidates[now - tracks.last_seen[candidates] <= 1.0]
+        if not detections or candidates.size == 0:
+            return matches
+        
+        det_boxes = np.array([d['box'] for d in detections])
+        old_boxes = tracks.box[candidates]
+        time_gap = now - tracks.last_seen[candidates]
+        
+        # Kalman-predicted position (filters were advanced to this frame), and distance to it
+        new_cx = det_boxes[:, 0] + det_boxes[:, 2] // 2
+        new_cy = det_boxes[:, 1] + det_boxes[:, 3] // 2
+        predicted = self.kalman.positions(tracks.kf_slot[candidates])
+        distance = np.hypot(new_cx[:, None] - predicted[None, :, 0], new_cy[:, None] - predicted[None, :, 1])
+        
+        # Area ratio (>= 1, 1 = same area) and aspect ratio difference
+        det_boxes = det_boxes.astype(np.float64)
+        old_boxes = old_boxes.astype(np.float64)
+        new_area = det_boxes[:, 2] * det_boxes[:, 3]
+        old_area = old_boxes[:, 2] * old_boxes[:, 3]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            area_ratio = new_area[:, None] / old_area[None, :]
+            area_ratio = np.where(area_ratio < 1, 1 / area_ratio, area_ratio)
+            new_aspect = np.where(det_boxes[:, 2] > 0, det_boxes[:, 3] / det_boxes[:, 2], 0)
+            old_aspect = np.where(old_boxes[:, 2] > 0, old_boxes[:, 3] / old_boxes[:, 2], 0)
+        aspect_diff = np.abs(new_aspect[:, None] - old_aspect[None, :])
+        
+        iou = iou_matrix(xywh_to_xyxy(det_boxes), xywh_to_xyxy(old_boxes))
+        
+        # Overall matching score (lower is better); IoU and distance dominate
+        position_score = distance * 0.5
+        shape_score = (area_ratio - 1) * 20 + aspect_diff * 10
+        iou_score = (1 - iou) * 50
+        time_score = time_gap[None, :] * 10
+        cost = position_score + shape_score + iou_score + time_score
+        
+        rows, cols = linear_assignment(cost, gate=MATCH_GATE)
+        for row, col in zip(rows, cols):
+            matches[row] = int(candidates[col])
+        return matches
+        
+    def process_detections(self, detections, frame, timestamp=None):
         """
         Process new detections and update tracking information
         
+        All timing (matching windows, motion prediction, exits) uses the frame
+        timestamp, so replaying recorded frames with their capture times gives
+        the same result at any processing speed.
+        
         Args:
             detections: List of detections from the detector
             frame: Current frame for visualization
+            timestamp: Capture time of the frame in seconds; the clock is read
+                once when omitted
             
         Returns:
-            frame: Updated frame with visualization
+            frame: The frame, with visualization unless the overlay is off
             dict: Counting information
         """
         self.update_frame_dimensions(frame)
         
-        # ID set for current frame
-        current_ids = set()
+        tracks = self.tracks
+        
+        # Slots seen in the current frame
+        current_slots = set()
+        
+        # Advance every track's motion filter to this frame
+        now = time.time() if timestamp is None else timestamp
+        self.kalman.predict(now)
+        
+        # Skip detections that are not valid people, then match the rest to
+        # existing tracks in one assignment
+        valid_detections = [d for d in detections if self._is_valid_person(d)]
+        matches = self._match_detections(valid_detections, now)
+        updated_slots = []
         
         # First pass: update existing tracks and create new ones
-        for detection in detections:
-            # Skip if not a valid person
-            if not self._is_valid_person(detection):
-                continue
-                
-            x, y, w, h = detection['box']
+        for detection, slot in zip(valid_detections, matches):
+            box = tuple(detection['box'])
             confidence = detection.get('confidence', 0.5)
-            detector_type = detection.get('detector', 'Unknown')
             
-            # Match to existing track or create new one
-            person_id = self._match_detection_to_tracked(detection)
-            
-            # New person
-            if person_id is None:
-                person_id = self.next_id
+            # New person: a tentative track that needs more confirmations
+            if slot is None:
+                slot = tracks.add(self.next_id, box, now, confidence,
+                                  detection.get('detector', 'Unknown'))
                 self.next_id += 1
-                
-                # Calculate center and create new tracking entry
-                center = (x + w // 2, y + h // 2)
-                
-                self.tracked_people[person_id] = {
-                    'box': (x, y, w, h),
-                    'center': center,
-                    'first_seen': time.time(),
-                    'last_seen': time.time(),
-                    'frames_tracked': 1,
-                    'confidence': confidence,
-                    'detector': detector_type,
-                    'status': 'tentative',  # New status: need more confirmations
-                    'trajectory': [center],
-                    'velocity': (0, 0)
-                }
+                tracks.kf_slot[slot] = self.kalman.add(tracks.center[slot], now)
+                if self._uses_lines():
+                    self._check_line_crossings(slot)
                 
             # Update existing person
             else:
-                # Get previous state
-                old_center = self.tracked_people[person_id]['center']
-                old_time = self.tracked_people[person_id]['last_seen']
-                current_time = time.time()
-                time_gap = current_time - old_time
-                
-                # Calculate new center and velocity
-                new_center = (x + w // 2, y + h // 2)
-                
-                # Only update velocity with a reasonable time gap to avoid extreme values
-                if time_gap > 0.01:
-                    velocity = (
-                        (new_center[0] - old_center[0]) / time_gap,
-                        (new_center[1] - old_center[1]) / time_gap
-                    )
-                else:
-                    velocity = self.tracked_people[person_id]['velocity']
+                # New box, center and trajectory point; the motion filter is
+                # corrected for all tracks after this pass
+                tracks.observe(slot, box, now, confidence)
+                updated_slots.append(slot)
                 
-                # Update tracking record
-                self.tracked_people[person_id].update({
-                    'box': (x, y, w, h),
-                    'center': new_center,
-                    'last_seen': current_time,
-                    'frames_tracked': self.tracked_people[person_id]['frames_tracked'] + 1,
-                    'confidence': max(self.tracked_people[person_id]['confidence'], confidence),
-                    'velocity': velocity
-                })
-                
-                # Keep trajectory history bounded
-                self.tracked_people[person_id]['trajectory'].append(new_center)
-                if len(self.tracked_people[person_id]['trajectory']) > 30:  # Increased history
-                    self.tracked_people[person_id]['trajectory'] = self.tracked_people[person_id]['trajectory'][-30:]
+                # With counting lines, entries/exits come from line crossings
+                if self._uses_lines():
+                    self._check_line_crossings(slot)
                 
                 # Update status after tracking for several frames
-                if self.tracked_people[person_id]['status'] == 'tentative':
-                    if self.tracked_people[person_id]['frames_tracked'] >= self.min_detection_frames:
+                if tracks.status[slot] == TENTATIVE and tracks.frames[slot] >= self.min_detection_frames:
+                    tracks.status[slot] = ACTIVE
+                    if not self._uses_lines():
                         # Person is confirmed stable - count as an entry
-                        self.tracked_people[person_id]['status'] = 'active'
                         self.entry_count += 1
-                        logging.info(f"Person {person_id} ENTERED (confirmed). Count: {self.entry_count}")
+                        logging.info(f"Person {tracks.id[slot]} ENTERED (confirmed). Count: {self.entry_count}")
             
-            # Add to current IDs
-            current_ids.add(person_id)
+            # Add to current slots
+            current_slots.add(slot)
+        
+        # Kalman update of every matched track at once
+        if updated_slots:
+            self.kalman.update(tracks.kf_slot[updated_slots], tracks.center[updated_slots], now)
         
         # Second pass: handle missing people and cleanup
-        self._handle_missing_people(current_ids, frame)
+        self._handle_missing_people(current_slots, frame, now)
         
-        # Update current count - active or counted people
-        self.current_count = len([pid for pid, data in self.tracked_people.items() 
-                                if data['status'] == 'active'])
+        # Update current count - confirmed people
+        self.current_count = tracks.count(ACTIVE)
         
         # Create counting info dictionary
         counting_info = {
@@ -318,165 +300,191 @@ class PersonTracker:
             'exits': self.exit_count,
             'current': self.current_count
         }
+        if self._uses_lines():
+            counting_info['lines'] = self.zones.line_counts()
+        
+        # Draw visualizations, unless nobody will see them
+        if self.overlay_enabled(now):
+            frame = self._draw_visualizations(frame, now)
+        return frame, counting_info
+    
+    def overlay_enabled(self, now=None):
+        """True when this frame should get the tracking overlay"""
+        if self.overlay == OVERLAY_ALWAYS:
+            return True
+        if self.overlay == OVERLAY_NEVER:
+            return False
+        return self.viewers.active(time.time() if now is None else now)
+    
+    def _check_line_crossings(self, slot):
+        """
+        Count entries/exits for the latest trajectory step of a person
+        
+        Each line keeps the person's last position outside its dead band, so
+        jitter on the line itself is not counted as repeated crossings.
         
-        # Draw visualizations
-        return self._draw_visualizations(frame), counting_info
+        Args:
+            slot: Track slot whose trajectory was just extended
+        """
+        tracks = self.tracks
+        person_id = tracks.id[slot]
+        point = (int(tracks.center[slot, 0]), int(tracks.center[slot, 1]))
+        for index, line in enumerate(self.zones.lines):
+            anchor = tracks.get_anchor(slot, index)
+            if anchor is not None:
+                direction = line.crossing(anchor, point)
+                if direction == ENTRY:
+                    self.entry_count += 1
+                    logging.info(f"Person {person_id} ENTERED across {line.name}. Count: {self.entry_count}")
+                elif direction == EXIT:
+                    self.exit_count += 1
+                    logging.info(f"Person {person_id} EXITED across {line.name}. Count: {self.exit_count}")
+            if line.side(point) != 0:
+                tracks.set_anchor(slot, index, point)
     
-    def _handle_missing_people(self, current_ids, frame):
+    def _handle_missing_people(self, current_slots, frame, current_time):
         """
         Handle people not detected in the current frame
         
         Args:
-            current_ids: Set of IDs detected in the current frame
+            current_slots: Set of track slots detected in the current frame
             frame: Current frame
+            current_time: Frame timestamp
         """
-        current_time = time.time()
+        tracks = self.tracks
         
         # Predict locations for briefly missing people
-        self._predict_missing_people(current_ids, frame)
-        
-        # Check for people who are gone
-        for person_id, data in list(self.tracked_people.items()):
-            # Skip already handled people
-            if data['status'] in ('exited', 'invalid'):
-                continue
-                
-            # Mark as exited if not seen for some time
-            if person_id not in current_ids:
-                time_missing = current_time - data['last_seen']
-                
-                # Short disappearance - might be occlusion or detection error
-                if time_missing > 0.5 and time_missing <= 2.0:
-                    # Keep as is, prediction will handle visualization
-                    pass
-                    
-                # Longer disappearance - person likely left
-                elif time_missing > 2.0:
-                    if data['status'] == 'active':
-                        # Count as an exit since they disappeared
-                        self.exit_count += 1
-                        logging.info(f"Person {person_id} EXITED. Count: {self.exit_count}")
-                        
-                        # Mark as exited
-                        self.tracked_people[person_id]['status'] = 'exited'
-                    elif data['status'] == 'tentative':
-                        # Was never a confirmed person - invalid
-                        self.tracked_people[person_id]['status'] = 'invalid'
-        
-        # Cleanup old records periodically
-        if len(self.tracked_people) > 50:  # Only clean up when we have many records
-            ids_to_remove = []
-            for person_id, data in self.tracked_people.items():
-                # Remove invalid tracks immediately
-                if data['status'] == 'invalid' and (current_time - data['last_seen'] > 1.0):
-                    ids_to_remove.append(person_id)
-                # Remove exited tracks after some time
-                elif data['status'] == 'exited' and (current_time - data['last_seen'] > 30.0):
-                    ids_to_remove.append(person_id)
+        self._predict_missing_people(current_slots, frame, current_time)
+        
+        # People not seen for more than 2 seconds are gone; shorter
+        # disappearances might be occlusion or detection errors, and
+        # prediction handles their visualization
+        live = tracks.slots_with(TENTATIVE, ACTIVE)
+        gone = live[current_time - tracks.last_seen[live] > 2.0]
+        for slot in gone:
+            if tracks.status[slot] == ACTIVE:
+                # Count as an exit since they disappeared, unless
+                # counting lines decide entries and exits
+                if not self._uses_lines():
+                    self.exit_count += 1
+                    logging.info(f"Person {tracks.id[slot]} EXITED. Count: {self.exit_count}")
+                tracks.status[slot] = EXITED
+            else:
+                # Was never a confirmed person - invalid
+                tracks.status[slot] = INVALID
             
-            for person_id in ids_to_remove:
-                del self.tracked_people[person_id]
+            # Finished tracks are never matched again; free their filter
+            self.kalman.remove(tracks.kf_slot[slot])
+        
+        # Recycle the slots of invalid tracks right away and of exited ones
+        # after some time
+        tracks.release_expired(current_time, TRACK_RETENTION)
     
-    def _predict_missing_people(self, current_ids, frame):
+    def _predict_missing_people(self, current_slots, frame, current_time):
         """
         Predict positions for temporarily missing people
         
+        Uses the Kalman state, which process_detections has already advanced
+        to the current frame, so all missing people are placed in one pass.
+        
         Args:
-            current_ids: Set of currently visible person IDs
+            current_slots: Set of currently visible track slots
             frame: Current frame for visualization
+            current_time: Frame timestamp
         """
-        current_time = time.time()
-        
-        for person_id, data in self.tracked_people.items():
-            # Skip people already detected in this frame or invalid/exited
-            if person_id in current_ids or data['status'] in ('exited', 'invalid'):
-                continue
-            
-            # Only predict for briefly missing people (< 2 seconds)
-            time_missing = current_time - data['last_seen']
-            if time_missing > 2.0:
-                continue
-            
-            # Get last known position and velocity
-            px, py, pw, ph = data['box']
-            velocity = data['velocity']
-            
-            # Predict new position using velocity and time
-            new_x = int(px + velocity[0] * time_missing)
-            new_y = int(py + velocity[1] * time_missing)
-            
-            # Ensure predicted position is within frame bounds
-            new_x = max(0, min(new_x, self.frame_width - pw))
-            new_y = max(0, min(new_y, self.frame_height - ph))
-            
-            # Store predicted box
-            data['predicted_box'] = (new_x, new_y, pw, ph)
+        tracks = self.tracks
+        
+        # Only predict for briefly missing people (< 2 seconds) who are still tracked
+        missing = tracks.slots_with(TENTATIVE, ACTIVE)
+        missing = missing[current_time - tracks.last_seen[missing] <= 2.0]
+        missing = np.setdiff1d(missing, list(current_slots))
+        if missing.size == 0:
+            return
+        
+        # Predicted centers -> top-left corners with the last known box size
+        centers = self.kalman.positions(tracks.kf_slot[missing])
+        sizes = tracks.box[missing, 2:]
+        corners = (centers - sizes // 2).astype(np.int32)
+        
+        # Ensure predicted positions are within frame bounds
+        corners = np.maximum(0, np.minimum(corners, [self.frame_width, self.frame_height] - sizes))
+        
+        # Store predicted boxes
+        tracks.predicted_box[missing, :2] = corners
+        tracks.predicted_box[missing, 2:] = sizes
+        tracks.has_prediction[missing] = True
     
-    def _draw_visualizations(self, frame):
+    def _draw_visualizations(self, frame, now):
         """
         Draw tracking and counting visualization on the frame
         
         Args:
             frame: Current video frame
+            now: Frame timestamp
             
         Returns:
             frame: Frame with visualizations
         """
-        # Draw people boxes and trajectories
-        for person_id, data in self.tracked_people.items():
-            # Skip invalid tracks
-            if data['status'] == 'invalid':
-                continue
-                
+        # Draw people boxes and trajectories; invalid tracks are skipped
+        tracks = self.tracks
+        for slot in tracks.slots_with(TENTATIVE, ACTIVE, EXITED):
+            person_id = tracks.id[slot]
+            status = tracks.status[slot]
+            
             # Exited people are drawn differently if in debug mode
-            if data['status'] == 'exited':
+            if status == EXITED:
                 if self.debug_mode:
                     # Show exited people with a different color when debugging
-                    time_since_exit = time.time() - data['last_seen']
+                    time_since_exit = now - tracks.last_seen[slot]
                     if time_since_exit < 5.0:  # Only show recently exited people
-                        x, y, w, h = data['box']
+                        x, y, w, h = tracks.box[slot].tolist()
                         cv2.rectangle(frame, (x, y), (x + w, y + h), (100, 100, 100), 1)
                         cv2.putText(frame, f"X-{person_id}", (x, y - 5),
                                    cv2.FONT_HERSHEY_SIMPLEX, 0.4, (100, 100, 100), 1)
                 continue
             
             # Choose color based on status
-            if data['status'] == 'tentative':
+            if status == TENTATIVE:
                 color = (0, 165, 255)  # Orange - not yet confirmed
-            elif data['status'] == 'active':
+            else:
                 color = (0, 255, 0)    # Green - confirmed person
             
             # Draw actual box if seen in this frame
-            if time.time() - data['last_seen'] < 0.1:  # Very recently seen
-                x, y, w, h = data['box']
+            if now - tracks.last_seen[slot] < 0.1:  # Seen in this frame
+                x, y, w, h = tracks.box[slot].tolist()
                 cv2.rectangle(frame, (x, y), (x + w, y + h), color, 2)
                 
                 # Add label with ID and status
                 label = f"ID:{person_id}"
-                if data['status'] == 'tentative':
-                    label += f" ({data['frames_tracked']}/{self.min_detection_frames})"
+                if status == TENTATIVE:
+                    label += f" ({tracks.frames[slot]}/{self.min_detection_frames})"
                 
                 cv2.putText(frame, label, (x, y - 5),
                            cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
             
             # Draw predicted box for missing people
-            elif 'predicted_box' in data:
-                x, y, w, h = data['predicted_box']
-                # Draw with dashed line
-                for i in range(0, w, 5):
-                    cv2.line(frame, (x + i, y), (x + i + 3, y), color, 1)
-                    cv2.line(frame, (x + i, y + h), (x + i + 3, y + h), color, 1)
-                for i in range(0, h, 5):
-                    cv2.line(frame, (x, y + i), (x, y + i + 3), color, 1)
-                    cv2.line(frame, (x + w, y + i), (x + w, y + i + 3), color, 1)
+            elif tracks.has_prediction[slot]:
+                x, y, w, h = tracks.predicted_box[slot].tolist()
+                # Draw with dashed line, all dashes in one call
+                cv2.polylines(frame, _dashed_box(x, y, w, h), False, color, 1)
                     
                 cv2.putText(frame, f"P:{person_id}", (x, y - 5),
                            cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 1)
             
             # Draw trajectory in debug mode
-            if self.debug_mode and len(data['trajectory']) > 1:
-                points = np.array(data['trajectory'], dtype=np.int32)
-                cv2.polylines(frame, [points], False, color, 1)
+            if self.debug_mode and tracks.trail_count[slot] > 1:
+                cv2.polylines(frame, [tracks.trajectory(slot)], False, color, 1)
+        
+        # Draw ROI polygons and counting lines
+        if self.zones is not None:
+            if self.zones.rois:
+                cv2.polylines(frame, self.zones.rois, True, (255, 255, 0), 1)
+            for line in self.zones.lines:
+                a = (int(line.a[0]), int(line.a[1]))
+                b = (int(line.b[0]), int(line.b[1]))
+                cv2.line(frame, a, b, (0, 255, 255), 2)
+                cv2.putText(frame, f"{line.name} +{line.entries}/-{line.exits}", (a[0], a[1] - 5),
+                           cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 255), 1)
         
         # Draw counting info
         cv2.putText(frame, f"Entries: {self.entry_count}", (10, 30),
@@ -1,7 +1,15 @@
 import time
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Tuple
 import numpy as np
 
+try:
+    from .track_store import ACTIVE, EXITED, INVALID, TENTATIVE, TrackStore
+except ImportError:
+    from track_store import ACTIVE, EXITED, INVALID, TENTATIVE, TrackStore
+
+# Seconds finished tracks are kept before their slot is reused
+TRACK_RETENTION = ((INVALID, 1.0), (EXITED, 30.0))
+
 
 class PersonTracker:
     """Simple, robust tracker adapted from party_box for stable people counts.
@@ -15,7 +23,7 @@ class PersonTracker:
         self.confidence_threshold = confidence_threshold
         self.min_detection_frames = min_detection_frames
 
-        self.tracked: Dict[int, Dict] = {}
+        self.tracks = TrackStore(history=0)
         self.next_id: int = 0
 
         self.entries: int = 0
@@ -43,63 +51,47 @@ class PersonTracker:
             return False
         return True
 
-    def process_detections(self, detections: List[Dict], frame) -> Tuple[object, Dict]:
+    def process_detections(self, detections: List[Dict], frame, timestamp: Optional[float] = None) -> Tuple[object, Dict]:
+        """Update tracks with one frame's detections; ``timestamp`` is the frame's capture time"""
         self.height, self.width = frame.shape[:2]
-        now = time.time()
-        current_ids = set()
+        now = time.time() if timestamp is None else timestamp
+        tracks = self.tracks
 
         # Assign each detection to an existing track if close enough; otherwise create new
         for d in detections:
             if not self._valid(d):
                 continue
             c = self._center(d['box'])
-            match_id = None
-            best_dist = 1e12
-            for tid, data in self.tracked.items():
-                if data['status'] in ('exited', 'invalid'):
-                    continue
-                px, py = data['center']
-                dt = now - data['last_seen']
-                if dt > 1.0:
-                    continue
-                dist = (c[0] - px) ** 2 + (c[1] - py) ** 2
-                if dist < best_dist and dist < (100 ** 2):
-                    best_dist = dist
-                    match_id = tid
-
-            if match_id is None:
-                self.tracked[self.next_id] = {
-                    'box': d['box'],
-                    'center': c,
-                    'last_seen': now,
-                    'frames': 1,
-                    'status': 'tentative',
-                }
-                current_ids.add(self.next_id)
+            match_slot = None
+            candidates = tracks.slots_with(TENTATIVE, ACTIVE)
+            candidates = candidates[now - tracks.last_seen[candidates] <= 1.0]
+            if candidates.size:
+                offsets = tracks.center[candidates] - c
+                dist = np.einsum('ij,ij->i', offsets, offsets)
+                best = int(np.argmin(dist))
+                if dist[best] < (100 ** 2):
+                    match_slot = int(candidates[best])
+
+            if match_slot is None:
+                tracks.add(self.next_id, tuple(d['box']), now)
                 self.next_id += 1
             else:
-                t = self.tracked[match_id]
-                t['box'] = d['box']
-                t['center'] = c
-                t['last_seen'] = now
-                t['frames'] = t.get('frames', 0) + 1
-                if t['status'] == 'tentative' and t['frames'] >= self.min_detection_frames:
-                    t['status'] = 'active'
+                tracks.observe(match_slot, tuple(d['box']), now)
+                if tracks.status[match_slot] == TENTATIVE and tracks.frames[match_slot] >= self.min_detection_frames:
+                    tracks.status[match_slot] = ACTIVE
                     self.entries += 1
-                current_ids.add(match_id)
 
         # Handle missing (exits or invalid)
-        for tid, data in list(self.tracked.items()):
-            if tid not in current_ids:
-                dt = now - data['last_seen']
-                if dt > 2.0:
-                    if data['status'] == 'active':
-                        self.exits += 1
-                        data['status'] = 'exited'
-                    elif data['status'] == 'tentative':
-                        data['status'] = 'invalid'
-
-        self.current = sum(1 for _, d in self.tracked.items() if d['status'] == 'active')
+        live = tracks.slots_with(TENTATIVE, ACTIVE)
+        for slot in live[now - tracks.last_seen[live] > 2.0]:
+            if tracks.status[slot] == ACTIVE:
+                self.exits += 1
+                tracks.status[slot] = EXITED
+            else:
+                tracks.status[slot] = INVALID
+        tracks.release_expired(now, TRACK_RETENTION)
+
+        self.current = tracks.count(ACTIVE)
         return frame, {
             'entries': self.entries,
             'exits': self.exits,
@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+"""
+process_detector.py - Multi-process person detection backend
+
+Runs PersonDetector instances in worker processes so NMS, filtering and YOLO
+decoding - pure Python around OpenCV - use every core instead of sharing one
+GIL. Frames are passed through a ring of multiprocessing.shared_memory slots:
+only a small (seq, slot, shape) tuple is pickled per frame, the pixels are
+copied once into shared memory and workers read them in place. Results are
+handed back in submission order.
+
+Usage:
+    pool = ProcessDetectorPool(workers=3, model_type="ssd")
+    pool.start()
+    people = pool.detect_people(frame)   # pipelined, like PersonDetector
+    ...
+    pool.close()
+
+The pool object is meant to be driven from a single thread.
+"""
+
+import logging
+import multiprocessing as mp
+import os
+import queue
+import time
+from collections import deque
+from multiprocessing import shared_memory
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WORKERS = int(os.environ.get('PULSE_DETECTOR_WORKERS', max(1, (os.cpu_count() or 2) - 1)))
+
+
+def _plain(detections: List[Dict]) -> List[Dict]:
+    # Boxes may hold NumPy ints; keep the pickled result small and portable
+    return [
+        dict(det, box=tuple(int(v) for v in det['box']), confidence=float(det['confidence']))
+        for det in detections
+    ]
+
+
+def _worker_main(worker_id: int, detector_kwargs: Dict, tasks, results) -> None:
+    """Worker process: detect people in frames read from shared memory"""
+    try:
+        from .frame_ring import _attach
+        from .person_detector import PersonDetector
+    except ImportError:
+        from frame_ring import _attach
+        from person_detector import PersonDetector
+
+    detector = PersonDetector(threaded=False, **detector_kwargs)
+    attached: Dict[int, shared_memory.SharedMemory] = {}
+    results.put(('ready', worker_id, detector.model_type))
+    try:
+        while True:
+            task = tasks.get()
+            if task is None:
+                break
+            seq, slot, name, shape, dtype = task
+            start = time.perf_counter()
+            frame = None
+            try:
+                shm = attached.get(slot)
+                if shm is None or shm.name != name:
+                    # Slot was (re)allocated by the parent
+                    if shm is not None:
+                        shm.close()
+                    # The parent owns the segment; workers must not unlink it
+                    # or report it as leaked (spawned workers share its tracker)
+                    shm = _attach(name, creator_tracker=True)
+                    attached[slot] = shm
+                frame = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+                detections = detector._detect_with_model(frame, detector.model_type)
+                filtered = detector._filter_detections(detections, (shape[1], shape[0]))
+                results.put(('result', seq, slot, _plain(filtered), time.perf_counter() - start))
+            except Exception as e:
+                results.put(('error', seq, slot, str(e), time.perf_counter() - start))
+            finally:
+                # Views must go before the buffer can be closed
+                frame = None
+    finally:
+        for shm in attached.values():
+            shm.close()
+        detector.cleanup()
+
+
+class ProcessDetectorPool:
+    def __init__(
+        self,
+        workers: int = DEFAULT_WORKERS,
+        model_type: str = 'hog',
+        confidence_threshold: float = 0.45,
+        slots: Optional[int] = None,
+    ):
+        """
+        Initialize the detector pool
+
+        Args:
+            workers: Number of detector processes
+            model_type: Detection model for every worker (hog, ssd, yolo, or hailo)
+            confidence_threshold: Minimum confidence for detection
+            slots: Shared-memory frame buffers; frames in flight are limited
+                to this many (default: two per worker)
+        """
+        self.workers = max(1, int(workers))
+        self.detector_kwargs = {'confidence_threshold': confidence_threshold, 'model_type': model_type}
+        self.slot_count = max(self.workers, int(slots or 2 * self.workers))
+
+        # Spawn, not fork: the parent may already run OpenCV/detector threads
+        self._ctx = mp.get_context('spawn')
+        self._tasks = None
+        self._results = None
+        self._processes: List = []
+
+        self._buffers: List[Optional[shared_memory.SharedMemory]] = [None] * self.slot_count
+        self._free_slots = deque(range(self.slot_count))
+        self._next_submit = 0
+        self._next_result = 0
+        self._ready: Dict[int, List[Dict]] = {}
+        self._latest: List[Dict] = []
+
+        # Statistics
+        self.frames_submitted = 0
+        self.frames_completed = 0
+        self.frames_dropped = 0
+        self.errors = 0
+        self._busy_time = 0.0
+
+    # ------------------------------ Lifecycle ----------------------------- #
+    def start(self, timeout: float = 60.0) -> None:
+        """Start the workers and wait until each has loaded its models"""
+        if self._processes:
+            return
+        self._tasks = self._ctx.Queue()
+        self._results = self._ctx.Queue()
+        for worker_id in range(self.workers):
+            process = self._ctx.Process(
+                target=_worker_main,
+                args=(worker_id, self.detector_kwargs, self._tasks, self._results),
+                name=f'person-detector-{worker_id}',
+                daemon=True,
+            )
+            process.start()
+            self._processes.append(process)
+
+        deadline = time.monotonic() + timeout
+        ready = 0
+        while ready < self.workers:
+            message = self._results.get(timeout=max(0.1, deadline - time.monotonic()))
+            if message[0] == 'ready':
+                ready += 1
+                logger.info(f"Detector worker {message[1]} ready ({message[2]})")
+        logger.info(f"Process detector pool started with {self.workers} workers")
+
+    def close(self) -> None:
+        """Stop the workers and release the shared-memory slots"""
+        if self._processes:
+            for _ in self._processes:
+                self._tasks.put(None)
+            for process in self._processes:
+                process.join(timeout=5.0)
+                if process.is_alive():
+                    process.terminate()
+            self._processes = []
+        for index, shm in enumerate(self._buffers):
+            if shm is not None:
+                shm.close()
+                shm.unlink()
+                self._buffers[index] = None
+        self._free_slots = deque(range(self.slot_count))
+        self._ready.clear()
+        self._next_result = self._next_submit
+
+    # ------------------------------- Frames ------------------------------- #
+    def _slot_buffer(self, slot: int, nbytes: int) -> shared_memory.SharedMemory:
+        shm = self._buffers[slot]
+        if shm is None or shm.size < nbytes:
+            if shm is not None:
+                shm.close()
+                shm.unlink()
+            shm = shared_memory.SharedMemory(create=True, size=nbytes)
+            self._buffers[slot] = shm
+        return shm
+
+    def submit(self, frame: np.ndarray, block: bool = True, timeout: Optional[float] = None) -> Optional[int]:
+        """
+        Queue a frame for detection
+
+        Args:
+            frame: Input frame; copied into a shared-memory slot
+            block: Wait for a free slot instead of returning None
+
+        Returns:
+            int: Sequence number of the frame, or None when no slot was free
+        """
+        if not self._free_slots:
+            if not block:
+                self._collect(block=False)
+            deadline = None if timeout is None else time.monotonic() + timeout
+            while not self._free_slots:
+                if not block:
+                    return None
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return None
+                self._collect(block=True, timeout=remaining)
+
+        slot = self._free_slots.popleft()
+        shm = self._slot_buffer(slot, frame.nbytes)
+        view = np.ndarray(frame.shape, dtype=frame.dtype, buffer=shm.buf)
+        np.copyto(view, frame)
+        del view
+
+        seq = self._next_submit
+        self._next_submit += 1
+        self._tasks.put((seq, slot, shm.name, frame.shape, frame.dtype.str))
+        self.frames_submitted += 1
+        return seq
+
+    def _collect(self, block: bool, timeout: Optional[float] = None) -> bool:
+        """Move finished results into the reorder buffer; True if any arrived"""
+        try:
+            message = self._results.get(block=block, timeout=timeout)
+        except queue.Empty:
+            return False
+        while True:
+            kind, seq, slot, payload, elapsed = message
+            self._free_slots.append(slot)
+            self._busy_time += elapsed
+            if kind == 'error':
+                self.errors += 1
+                logger.error(f"Detection failed for frame {seq}: {payload}")
+                payload = []
+            self._ready[seq] = payload
+            try:
+                message = self._results.get_nowait()
+            except queue.Empty:
+                return True
+
+    def get_result(self, timeout: Optional[float] = None) -> Tuple[int, List[Dict]]:
+        """
+        Next result in frame order
+
+        Returns:
+            tuple: (seq, detections)
+
+        Raises:
+            queue.Empty: Nothing pending, or the timeout expired
+        """
+        if self._next_result >= self._next_submit:
+            raise queue.Empty
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self._next_result not in self._ready:
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                raise queue.Empty
+            self._collect(block=True, timeout=remaining)
+        seq = self._next_result
+        self._next_result += 1
+        self.frames_completed += 1
+        return seq, self._ready.pop(seq)
+
+    def detect_people(self, frame: np.ndarray) -> List[Dict]:
+        """
+        Submit a frame and return the most recent in-order detections
+
+        Mirrors PersonDetector.detect_people(): results lag the input by the
+        pipeline depth, and a frame is dropped when every slot is in flight.
+        """
+        self._collect(block=False)
+        while self._next_result in self._ready:
+            _, self._latest = self.get_result()
+        if self.submit(frame, block=False) is None:
+            self.frames_dropped += 1
+        return list(self._latest)
+
+    def stats(self) -> Dict:
+        completed = max(1, self.frames_completed)
+        return {
+            'workers': self.workers,
+            'slots': self.slot_count,
+            'in_flight': self._next_submit - self._next_result,
+            'submitted': self.frames_submitted,
+            'completed': self.frames_completed,
+            'dropped': self.frames_dropped,
+            'errors': self.errors,
+            'avg_worker_ms': round(self._busy_time * 1000.0 / completed, 3),
+        }
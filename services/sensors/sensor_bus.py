@@ -0,0 +1,260 @@
+"""
+sensor_bus.py - Local publish/subscribe bus between sensor services and the hub
+
+Sensors publish small typed messages as Unix datagrams. Each subscriber binds
+its own socket in the bus directory and every publisher sends each message to
+all of them, so a message is either delivered whole or not at all (no torn
+reads) and nothing touches the SD card.
+
+The legacy text/JSON files under /opt/pulse/data/sensors can still be written
+as a compatibility sink (PULSE_BUS_FILE_SINK=1, the default). They are written
+atomically (temp file + rename), so file readers never see half a file either.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import socket
+import time
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple, Type
+
+logger = logging.getLogger(__name__)
+
+BUS_DIR = Path(os.environ.get('PULSE_BUS_DIR', '/opt/pulse/data/bus'))
+SENSOR_DIR = Path('/opt/pulse/data/sensors')
+FILE_SINK_ENABLED = os.environ.get('PULSE_BUS_FILE_SINK', '1').lower() not in ('0', 'false', 'no')
+
+# Datagrams larger than this are rejected on the receive side
+MAX_MESSAGE_BYTES = 64 * 1024
+
+
+# ------------------------------ Message types ----------------------------- #
+@dataclass
+class SensorMessage:
+    """Base class for bus messages; subclasses set ``topic``"""
+    topic = ''
+    # Creation time; not a dataclass field, so subclass fields stay the only
+    # constructor arguments (kw_only fields need Python 3.10)
+    ts = 0.0
+
+    def __post_init__(self):
+        self.ts = time.time()
+
+    def payload(self) -> dict:
+        return asdict(self)
+
+    def to_file(self) -> Optional[Tuple[str, str]]:
+        """(filename, contents) for the legacy file sink, or None"""
+        return None
+
+
+@dataclass
+class PeopleCount(SensorMessage):
+    topic = 'people_count'
+    count: int = 0
+
+    def to_file(self):
+        return 'people_count.txt', str(self.count)
+
+
+@dataclass
+class Environment(SensorMessage):
+    topic = 'environment'
+    temperature: float = 72.0
+    humidity: float = 45.0
+    pressure: float = 1013.25
+
+    def to_file(self):
+        data = dict(self.payload(), timestamp=datetime.fromtimestamp(self.ts).isoformat())
+        return 'bme280.json', json.dumps(data, indent=2)
+
+
+@dataclass
+class AudioLevel(SensorMessage):
+    topic = 'audio_level'
+    decibels: float = 0.0
+
+    def to_file(self):
+        return 'audio_level.txt', f"{self.decibels:.1f}"
+
+
+@dataclass
+class SongDetection(SensorMessage):
+    topic = 'song'
+    title: str = 'No song detected'
+    artist: str = ''
+    detected: bool = False
+
+    def to_file(self):
+        data = dict(self.payload(), timestamp=datetime.fromtimestamp(self.ts).isoformat())
+        return 'song.json', json.dumps(data, indent=2)
+
+
+@dataclass
+class LightLevel(SensorMessage):
+    topic = 'light_level'
+    lux: float = 0.0
+
+    def to_file(self):
+        return 'light_level.txt', f"{self.lux:.1f}"
+
+
+@dataclass
+class CameraStatus(SensorMessage):
+    topic = 'camera_status'
+    active: bool = False
+
+    def to_file(self):
+        return 'camera_active.txt', 'true' if self.active else 'false'
+
+
+MESSAGE_TYPES: Dict[str, Type[SensorMessage]] = {
+    cls.topic: cls
+    for cls in (PeopleCount, Environment, AudioLevel, SongDetection, LightLevel, CameraStatus)
+}
+
+
+def encode_message(msg: SensorMessage) -> bytes:
+    return json.dumps({'topic': msg.topic, 'ts': msg.ts, 'data': msg.payload()}).encode()
+
+
+def decode_message(raw: bytes) -> Optional[SensorMessage]:
+    """Decode a datagram into its typed message, or None if unknown/invalid"""
+    try:
+        envelope = json.loads(raw)
+        cls = MESSAGE_TYPES[envelope['topic']]
+        msg = cls(**envelope.get('data', {}))
+        if envelope.get('ts'):
+            msg.ts = float(envelope['ts'])
+        return msg
+    except (ValueError, KeyError, TypeError):
+        return None
+
+
+def write_atomic(path: Path, text: str) -> None:
+    """Replace ``path`` in one rename so readers see the old or new file, never half"""
+    tmp = path.with_name(f".{path.name}.tmp")
+    tmp.write_text(text)
+    os.replace(tmp, path)
+
+
+# -------------------------------- Publisher -------------------------------- #
+class BusPublisher:
+    """Send typed messages to every subscriber socket in the bus directory"""
+
+    def __init__(self, bus_dir: Path = BUS_DIR, file_sink: bool = FILE_SINK_ENABLED,
+                 sensor_dir: Path = SENSOR_DIR):
+        self.bus_dir = Path(bus_dir)
+        self.file_sink = file_sink
+        self.sensor_dir = Path(sensor_dir)
+        self.sent = 0
+        self.dropped = 0
+
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self._sock.setblocking(False)
+        self._targets: List[str] = []
+        self._targets_mtime: Optional[int] = None
+
+        if self.file_sink:
+            self.sensor_dir.mkdir(parents=True, exist_ok=True)
+
+    def _subscribers(self) -> List[str]:
+        # Re-list the directory only when a subscriber bound or went away
+        try:
+            mtime = self.bus_dir.stat().st_mtime_ns
+        except OSError:
+            self._targets, self._targets_mtime = [], None
+            return self._targets
+        if mtime != self._targets_mtime:
+            self._targets = [str(p) for p in self.bus_dir.glob('*.sock')]
+            self._targets_mtime = mtime
+        return self._targets
+
+    def publish(self, msg: SensorMessage) -> int:
+        """Publish a message; returns the number of subscribers it reached"""
+        raw = encode_message(msg)
+        delivered = 0
+        for target in self._subscribers():
+            try:
+                self._sock.sendto(raw, target)
+                delivered += 1
+            except BlockingIOError:
+                # Subscriber is not keeping up; drop rather than stall the sensor
+                self.dropped += 1
+            except (ConnectionRefusedError, FileNotFoundError):
+                # Stale socket left by a subscriber that exited
+                pass
+            except OSError as e:
+                logger.debug(f"Bus send to {target} failed: {e}")
+        self.sent += delivered
+
+        if self.file_sink:
+            sink = msg.to_file()
+            if sink is not None:
+                try:
+                    write_atomic(self.sensor_dir / sink[0], sink[1])
+                except OSError as e:
+                    logger.debug(f"File sink write failed: {e}")
+        return delivered
+
+    def close(self) -> None:
+        self._sock.close()
+
+
+# ------------------------------- Subscriber -------------------------------- #
+class _DatagramProtocol(asyncio.DatagramProtocol):
+    def __init__(self, handler: Callable[[SensorMessage], None]):
+        self.handler = handler
+
+    def datagram_received(self, data, addr):
+        if len(data) > MAX_MESSAGE_BYTES:
+            return
+        msg = decode_message(data)
+        if msg is None:
+            return
+        try:
+            self.handler(msg)
+        except Exception as e:
+            logger.error(f"Bus handler failed for {msg.topic}: {e}")
+
+
+class BusSubscriber:
+    """Receive bus messages on the asyncio loop.
+
+    ``handler`` is called synchronously on the loop for every message; schedule
+    any slow work from it instead of doing it inline.
+    """
+
+    def __init__(self, name: str, handler: Callable[[SensorMessage], None], bus_dir: Path = BUS_DIR):
+        self.path = Path(bus_dir) / f"{name}.sock"
+        self.handler = handler
+        self._transport = None
+
+    async def start(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            self.path.unlink()
+        except FileNotFoundError:
+            pass
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        sock.bind(str(self.path))
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1 << 20)
+        os.chmod(self.path, 0o666)
+        loop = asyncio.get_running_loop()
+        self._transport, _ = await loop.create_datagram_endpoint(
+            lambda: _DatagramProtocol(self.handler), sock=sock
+        )
+        logger.info(f"Subscribed to sensor bus at {self.path}")
+
+    async def stop(self) -> None:
+        if self._transport is not None:
+            self._transport.close()
+            self._transport = None
+        try:
+            self.path.unlink()
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+"""
+stream_viewers.py - Whether anyone is watching the camera stream
+
+The hub writes the number of connected MJPEG viewers to a small file
+(see services/hub/mjpeg.py). Sensors read it to skip work, such as drawing
+the tracking overlay, that only matters when someone is looking. The file is
+checked at most once per ``check_interval`` seconds.
+"""
+
+import os
+from pathlib import Path
+from typing import Optional
+
+CAMERA_VIEWERS_FILE = Path(os.environ.get('CAMERA_VIEWERS_FILE', '/opt/pulse/data/camera/viewers'))
+
+
+class StreamViewers:
+    def __init__(self, path: Path = CAMERA_VIEWERS_FILE, check_interval: float = 1.0):
+        self.path = Path(path)
+        self.check_interval = check_interval
+        self.count = 0
+        self._checked_at: Optional[float] = None
+
+    def _read(self) -> int:
+        try:
+            return max(0, int(self.path.read_text().strip() or 0))
+        except (OSError, ValueError):
+            # No hub, or no stream served yet
+            return 0
+
+    def active(self, now: float) -> bool:
+        """True when at least one viewer is connected (as of the last check)"""
+        if self._checked_at is None or abs(now - self._checked_at) >= self.check_interval:
+            self._checked_at = now
+            self.count = self._read()
+        return self.count > 0
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+track_store.py - Struct-of-arrays storage for tracked people
+
+Every track field lives in its own preallocated NumPy array indexed by slot,
+and trajectories are fixed-size ring buffers, so per-frame work is array
+operations over contiguous memory and nothing is re-sliced or re-allocated
+per detection. Slots of finished tracks go back on a free list and are
+reused; the arrays only grow (by doubling) when more tracks are alive at
+once than ever before, so memory stays bounded over long events. Person IDs
+stay unique and increasing; only storage slots are recycled.
+"""
+
+from typing import Iterable, Sequence, Tuple
+
+import numpy as np
+
+# Track status codes
+FREE = 0
+TENTATIVE = 1
+ACTIVE = 2
+EXITED = 3
+INVALID = 4
+
+STATUS_NAMES = ('free', 'tentative', 'active', 'exited', 'invalid')
+
+Box = Tuple[int, int, int, int]
+
+
+class TrackStore:
+    def __init__(self, capacity: int = 64, history: int = 30, lines: int = 0):
+        """
+        Args:
+            capacity: Initial number of slots; grows as needed
+            history: Trajectory points kept per track (0 disables trajectories)
+            lines: Number of counting lines to keep a per-track anchor for
+        """
+        self.history = history
+        self.lines = lines
+        self.capacity = 0
+        self.id = np.empty(0, dtype=np.int64)
+        self.status = np.empty(0, dtype=np.int8)
+        self.box = np.empty((0, 4), dtype=np.int32)
+        self.center = np.empty((0, 2), dtype=np.int32)
+        self.first_seen = np.empty(0)
+        self.last_seen = np.empty(0)
+        self.frames = np.empty(0, dtype=np.int32)
+        self.confidence = np.empty(0, dtype=np.float32)
+        self.detector = np.empty(0, dtype=object)
+        self.kf_slot = np.empty(0, dtype=np.int64)
+        self.predicted_box = np.empty((0, 4), dtype=np.int32)
+        self.has_prediction = np.empty(0, dtype=bool)
+        self.trail = np.empty((0, history, 2), dtype=np.int32)
+        self.trail_count = np.empty(0, dtype=np.int64)
+        # Last position of each track clear of each counting line's dead band
+        self.anchor = np.empty((0, lines, 2))
+        self.anchor_valid = np.empty((0, lines), dtype=bool)
+        self._free = []
+        self._grow(capacity)
+
+    def _grow(self, extra: int) -> None:
+        def extend(array, fill=0):
+            tail = np.full((extra,) + array.shape[1:], fill, dtype=array.dtype)
+            return np.concatenate([array, tail])
+
+        self.id = extend(self.id, -1)
+        self.status = extend(self.status, FREE)
+        self.box = extend(self.box)
+        self.center = extend(self.center)
+        self.first_seen = extend(self.first_seen)
+        self.last_seen = extend(self.last_seen)
+        self.frames = extend(self.frames)
+        self.confidence = extend(self.confidence)
+        self.detector = extend(self.detector, None)
+        self.kf_slot = extend(self.kf_slot, -1)
+        self.predicted_box = extend(self.predicted_box)
+        self.has_prediction = extend(self.has_prediction, False)
+        self.trail = extend(self.trail)
+        self.trail_count = extend(self.trail_count)
+        self.anchor = extend(self.anchor)
+        self.anchor_valid = extend(self.anchor_valid, False)
+        # Lowest slots are handed out first
+        self._free.extend(range(self.capacity + extra - 1, self.capacity - 1, -1))
+        self._free.sort(reverse=True)
+        self.capacity += extra
+
+    # ------------------------------- Slots -------------------------------- #
+    def add(self, track_id: int, box: Box, now: float, confidence: float = 0.0, detector: str = 'Unknown') -> int:
+        """Start a tentative track from one detection; returns its slot"""
+        if not self._free:
+            self._grow(max(1, self.capacity))
+        slot = self._free.pop()
+        x, y, w, h = box
+        self.id[slot] = track_id
+        self.status[slot] = TENTATIVE
+        self.box[slot] = box
+        self.center[slot] = (x + w // 2, y + h // 2)
+        self.first_seen[slot] = now
+        self.last_seen[slot] = now
+        self.frames[slot] = 1
+        self.confidence[slot] = confidence
+        self.detector[slot] = detector
+        self.kf_slot[slot] = -1
+        self.has_prediction[slot] = False
+        self.trail_count[slot] = 0
+        self.anchor_valid[slot] = False
+        self._push_trail(slot)
+        return slot
+
+    def observe(self, slot: int, box: Box, now: float, confidence: float = 0.0) -> None:
+        """Record a matched detection for an existing track"""
+        x, y, w, h = box
+        self.box[slot] = box
+        self.center[slot] = (x + w // 2, y + h // 2)
+        self.last_seen[slot] = now
+        self.frames[slot] += 1
+        self.confidence[slot] = max(self.confidence[slot], confidence)
+        self._push_trail(slot)
+
+    def release(self, slot: int) -> None:
+        """Return a finished track's slot to the free list"""
+        if self.status[slot] != FREE:
+            self.status[slot] = FREE
+            self.id[slot] = -1
+            self.detector[slot] = None
+            self._free.append(slot)
+
+    def __len__(self) -> int:
+        return self.capacity - len(self._free)
+
+    # ------------------------------ Queries ------------------------------- #
+    def slots_with(self, *statuses: int) -> np.ndarray:
+        """Slots whose status is one of ``statuses``, in slot order"""
+        if len(statuses) == 1:
+            return np.flatnonzero(self.status == statuses[0])
+        return np.flatnonzero(np.isin(self.status, statuses))
+
+    def count(self, status: int) -> int:
+        return int(np.count_nonzero(self.status == status))
+
+    # ---------------------------- Trajectories ---------------------------- #
+    def _push_trail(self, slot: int) -> None:
+        if self.history:
+            self.trail[slot, self.trail_count[slot] % self.history] = self.center[slot]
+            self.trail_count[slot] += 1
+
+    def trajectory(self, slot: int) -> np.ndarray:
+        """(K, 2) trajectory of a track, oldest point first"""
+        count = int(self.trail_count[slot])
+        if count <= self.history:
+            return self.trail[slot, :count]
+        return np.roll(self.trail[slot], -(count % self.history), axis=0)
+
+    # ---------------------------- Line anchors ---------------------------- #
+    def set_anchor(self, slot: int, line: int, point: Sequence[float]) -> None:
+        self.anchor[slot, line] = point
+        self.anchor_valid[slot, line] = True
+
+    def get_anchor(self, slot: int, line: int):
+        """Anchor point for one counting line, or None when not yet set"""
+        if not self.anchor_valid[slot, line]:
+            return None
+        return (float(self.anchor[slot, line, 0]), float(self.anchor[slot, line, 1]))
+
+    def release_expired(self, now: float, retention: Iterable[Tuple[int, float]]) -> np.ndarray:
+        """
+        Release tracks in a given status not seen for longer than its retention
+
+        Args:
+            now: Current time
+            retention: (status, seconds) pairs
+
+        Returns:
+            Released slots
+        """
+        age = now - self.last_seen
+        expired = np.zeros(self.capacity, dtype=bool)
+        for status, seconds in retention:
+            expired |= (self.status == status) & (age > seconds)
+        slots = np.flatnonzero(expired)
+        for slot in slots:
+            self.release(int(slot))
+        return slots
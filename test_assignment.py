@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Tests for the gated track/detection assignment
+"""
+
+import itertools
+
+import numpy as np
+import pytest
+
+from services.sensors import assignment
+from services.sensors.assignment import iou_matrix, linear_assignment
+
+
+def _brute_force(cost, gate):
+    """Most allowed pairs, then the lowest total cost, over every matching"""
+    rows, cols = cost.shape
+    if rows > cols:
+        return _brute_force(cost.T, gate)
+    best = (0, 0.0)
+    for perm in itertools.permutations(range(cols), rows):
+        pairs = [cost[r, c] for r, c in zip(range(rows), perm)]
+        allowed = [c for c in pairs if np.isfinite(c) and c < gate]
+        score = (len(allowed), sum(allowed))
+        if (-score[0], score[1]) < (-best[0], best[1]):
+            best = score
+    return best
+
+
+@pytest.fixture(params=['scipy', 'hungarian'])
+def solver(request, monkeypatch):
+    if request.param == 'hungarian':
+        monkeypatch.setattr(assignment, 'SCIPY_AVAILABLE', False)
+    elif not assignment.SCIPY_AVAILABLE:
+        pytest.skip('scipy not installed')
+    return request.param
+
+
+def test_matches_brute_force_reference(solver):
+    rng = np.random.default_rng(7)
+    for _ in range(300):
+        shape = tuple(rng.integers(1, 6, size=2))
+        cost = rng.uniform(0.0, 1.0, size=shape).round(2)
+        cost[rng.random(shape) < 0.15] = np.inf
+        gate = float(rng.choice([np.inf, 0.5, 0.8]))
+
+        rows, cols = linear_assignment(cost, gate)
+
+        assert list(rows) == sorted(rows)
+        assert len(set(rows)) == len(rows) and len(set(cols)) == len(cols)
+        assert np.all(cost[rows, cols] < gate)
+        count, total = _brute_force(cost, gate)
+        assert len(rows) == count
+        assert cost[rows, cols].sum() == pytest.approx(total)
+
+
+def test_gated_pairs_are_left_unassigned(solver):
+    # Greedy would take (0, 0); the optimum pairs both rows
+    cost = np.array([[0.1, 0.2],
+                     [0.3, 0.9]])
+    rows, cols = linear_assignment(cost, gate=0.5)
+    assert list(zip(rows, cols)) == [(0, 1), (1, 0)]
+
+    rows, cols = linear_assignment(cost, gate=0.15)
+    assert list(zip(rows, cols)) == [(0, 0)]
+    assert linear_assignment(np.full((2, 3), np.inf))[0].size == 0
+    assert linear_assignment(np.empty((0, 4)))[0].size == 0
+
+
+def test_iou_matrix():
+    a = np.array([[0, 0, 10, 10]], dtype=float)
+    b = np.array([[0, 0, 10, 10], [5, 0, 15, 10], [20, 20, 30, 30]], dtype=float)
+    np.testing.assert_allclose(iou_matrix(a, b), [[1.0, 50 / 150, 0.0]])
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Tests for the people pipeline reading the shared-memory frame ring
+"""
+
+import threading
+import time
+import uuid
+
+import numpy as np
+
+from services.sensors.camera_people import PeoplePipeline
+from services.sensors.frame_ring import FrameRingWriter
+
+SHAPE = (48, 64, 3)
+
+
+class SlowDetector:
+    """Takes longer than a ring view lives; records whether its frame held still"""
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.intact = []
+
+    def detect_people(self, frame, timestamp=None):
+        value = int(frame[0, 0, 0])
+        time.sleep(self.seconds)
+        self.intact.append(bool((frame == value).all()))
+        return []
+
+    def set_roi(self, box):
+        pass
+
+    def cleanup(self):
+        pass
+
+
+def test_slow_detector_keeps_up_with_a_fast_writer():
+    fps, slots = 60, 3                  # a view lives ~35 ms
+    ring = FrameRingWriter.create(SHAPE, slots=slots, name=f'pulse_test_{uuid.uuid4().hex[:8]}')
+    detector = SlowDetector(0.08)
+    pipeline = PeoplePipeline(ring, camera_name='missing', detector=detector)
+    running = True
+
+    def capture():
+        value = 0
+        while running:
+            value = (value + 1) % 256
+            ring.write(np.full(SHAPE, value, dtype=np.uint8), time.time())
+            time.sleep(1 / fps)
+
+    writer = threading.Thread(target=capture)
+    writer.start()
+    try:
+        pipeline.start()
+        time.sleep(1.5)
+    finally:
+        pipeline.stop()
+        running = False
+        writer.join()
+        ring.close()
+
+    assert pipeline.copying
+    # At most the first frame is lost while the pipeline learns it is slow
+    assert pipeline.overwritten <= 1
+    assert pipeline.frames >= 10
+    assert all(detector.intact[pipeline.overwritten:])
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Tests for camera counting lines: sides, dead band and crossings
+"""
+
+import numpy as np
+import pytest
+
+from services.sensors.camera_zones import ENTRY, EXIT, CameraZones, CountingLine, segments_intersect
+from services.sensors.person_tracker import OVERLAY_NEVER, PersonTracker
+
+SIZE = (1000, 1000)
+
+
+def _line(**kwargs):
+    # Horizontal line across the middle; "right" of A->B is below it on screen
+    line = CountingLine('door', [[0.1, 0.5], [0.9, 0.5]], **kwargs)
+    line.scale(*SIZE)
+    return line
+
+
+def test_side_has_a_dead_band():
+    line = _line(band=0.02)         # ~28 px on a 1000x1000 frame
+    assert line.side((500, 600)) == 1
+    assert line.side((500, 400)) == -1
+    assert line.side((500, 520)) == 0
+    assert line.side((500, 480)) == 0
+    assert line.side((500, 530)) == 1
+
+
+def test_crossing_direction_follows_entry_side():
+    line = _line()
+    assert line.crossing((500, 400), (500, 600)) == ENTRY
+    assert line.crossing((500, 600), (500, 400)) == EXIT
+
+    left = _line(entry_side='left')
+    assert left.crossing((500, 400), (500, 600)) == EXIT
+    assert (line.entries, line.exits) == (1, 1)
+
+
+def test_moves_into_the_band_or_around_the_line_do_not_count():
+    line = _line()
+    assert line.crossing((500, 400), (500, 510)) == 0      # ends in the band
+    assert line.crossing((500, 490), (500, 600)) == 0      # starts in the band
+    assert line.crossing((50, 400), (50, 600)) == 0        # beyond the end of the line
+    assert (line.entries, line.exits) == (0, 0)
+    assert not segments_intersect((50, 400), (50, 600), line.a, line.b)
+
+
+@pytest.fixture
+def tracker():
+    zones = CameraZones('door', lines=[_line()])
+    tracker = PersonTracker(zones=zones, overlay=OVERLAY_NEVER)
+    tracker.update_frame_dimensions(np.zeros(SIZE[::-1] + (3,), dtype=np.uint8))
+    return tracker
+
+
+def _walk(tracker, points):
+    slot = tracker.tracks.add(1, (0, 0, 0, 0), now=0.0)
+    for point in points:
+        tracker.tracks.center[slot] = point
+        tracker._check_line_crossings(slot)
+
+
+def test_jitter_on_the_line_counts_once(tracker):
+    # Walks down onto the line, wobbles across it inside the band, then leaves
+    wobble = [(500, 495), (500, 505), (500, 490), (500, 510), (500, 498), (500, 515)]
+    _walk(tracker, [(500, 300), (500, 400)] + wobble + [(500, 600), (500, 700)])
+    assert (tracker.entry_count, tracker.exit_count) == (1, 0)
+
+
+def test_turning_back_inside_the_band_does_not_count(tracker):
+    _walk(tracker, [(500, 400), (500, 490), (500, 510), (500, 490), (500, 400)])
+    assert (tracker.entry_count, tracker.exit_count) == (0, 0)
+
+
+def test_crossing_back_and_forth_counts_each_way(tracker):
+    _walk(tracker, [(500, 400), (500, 600), (500, 400), (500, 600)])
+    assert (tracker.entry_count, tracker.exit_count) == (2, 1)
+    assert tracker.zones.line_counts() == {'door': {'entries': 2, 'exits': 1}}
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Tests for the shared-memory frame rings: sequence numbers and slot invalidation
+"""
+
+import uuid
+
+import numpy as np
+import pytest
+
+from services.sensors.frame_ring import (FrameRingReader, FrameRingWriter, JpegRingReader, JpegRingWriter,
+                                         _attach, thumbnail_shape)
+
+SHAPE = (4, 6, 3)
+
+
+@pytest.fixture
+def ring_name():
+    return f'pulse_test_{uuid.uuid4().hex[:8]}'
+
+
+@pytest.fixture
+def rings(ring_name):
+    """A writer and a reader of the same frame ring"""
+    opened = []
+
+    def open_rings(slots):
+        writer = FrameRingWriter.create(SHAPE, slots=slots, name=ring_name)
+        # Same process, so the writer's resource tracker entry is shared
+        reader = FrameRingReader(_attach(ring_name, creator_tracker=True))
+        opened.extend([reader, writer])
+        return writer, reader
+    yield open_rings
+    for ring in opened:
+        ring.close()
+
+
+def _frame(value):
+    return np.full(SHAPE, value, dtype=np.uint8)
+
+
+def test_latest_frame_and_sequence_numbers(rings):
+    writer, reader = rings(slots=3)
+    assert reader.latest() is None
+
+    assert writer.write(_frame(1), 10.0) == 1
+    assert writer.write(_frame(2), 11.0) == 2
+
+    seq, timestamp, view = reader.latest()
+    assert (seq, timestamp) == (2, 11.0)
+    assert (view == 2).all()
+    assert not view.flags.writeable
+    assert reader.latest(after=2) is None
+
+
+def test_acquire_invalidates_the_slot_before_it_is_reused(rings):
+    writer, reader = rings(slots=3)
+    for value in (1, 2, 3):
+        writer.write(_frame(value), float(value))
+    seq, _, view = reader.latest()
+    assert [reader.valid(s) for s in (1, 2, 3)] == [True, True, True]
+
+    # Frame 4 goes into frame 1's slot: frame 1 is invalid from acquire() on
+    slot = writer.acquire()
+    assert not reader.valid(1)
+    assert reader.latest()[0] == 3
+    slot[:] = 4
+    assert writer.commit(4.0) == 4
+    assert [reader.valid(s) for s in (1, 2, 3, 4)] == [False, True, True, True]
+
+    for value in (5, 6):
+        writer.write(_frame(value), float(value))
+    # The view taken at seq 3 now shows frame 6
+    assert not reader.valid(seq)
+    assert (view == 6).all()
+    assert not reader.valid(0) and not reader.valid(7)
+
+
+def test_frame_being_written_is_never_returned(rings):
+    writer, reader = rings(slots=1)
+    writer.write(_frame(1), 1.0)
+    writer.acquire()
+    assert reader.latest() is None
+    writer.commit(2.0)
+    assert reader.latest()[0] == 2
+
+
+def test_attach_without_a_writer(ring_name):
+    assert FrameRingReader.attach(ring_name) is None
+    assert JpegRingReader.attach(ring_name) is None
+
+
+def test_jpeg_ring_returns_copies(ring_name):
+    frame_shape = (480, 640, 3)
+    writer = JpegRingWriter.create(frame_shape, slots=2, name=ring_name)
+    reader = JpegRingReader(_attach(ring_name, creator_tracker=True))
+    try:
+        shape = thumbnail_shape(frame_shape)
+        assert shape == (120, 160)
+        assert writer.write(b'\xff\xd8first', np.full(shape, 7, dtype=np.uint8), 1.0) == 1
+
+        seq, timestamp, jpeg, thumbnail = reader.latest()
+        assert (seq, timestamp, jpeg) == (1, 1.0, b'\xff\xd8first')
+
+        # Too large for a slot: dropped, the previous frame stays the latest
+        assert writer.write(bytes(writer.capacity + 1), thumbnail, 2.0) is None
+        assert reader.latest()[0] == 1
+
+        for n in (2, 3):
+            writer.write(b'\xff\xd8next', np.zeros(shape, dtype=np.uint8), float(n))
+        assert not reader.valid(1)
+        assert jpeg == b'\xff\xd8first' and (thumbnail == 7).all()
+        assert reader.latest()[:3] == (3, 3.0, b'\xff\xd8next')
+    finally:
+        reader.close()
+        writer.close()
+
+
+def test_thumbnail_is_never_wider_than_the_frame():
+    assert thumbnail_shape((90, 120, 3)) == (90, 120)
+    assert thumbnail_shape((720, 1280)) == (90, 160)
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Tests for the batched constant-velocity Kalman filter bank
+"""
+
+import numpy as np
+
+from services.sensors.kalman import KalmanBank
+
+
+class ReferenceFilter:
+    """One textbook constant-velocity filter with explicit F, Q and H"""
+
+    def __init__(self, bank, center, now):
+        self.bank = bank
+        self.x = np.array([center[0], center[1], 0.0, 0.0])
+        self.P = np.diag([bank.measurement_var] * 2 + [bank.initial_velocity_var] * 2)
+        self.t = now
+
+    def update(self, z, now):
+        dt = now - self.t
+        F = np.eye(4)
+        F[0, 2] = F[1, 3] = dt
+        G = np.array([[dt * dt / 2, 0], [0, dt * dt / 2], [dt, 0], [0, dt]])
+        self.x = F @ self.x
+        self.P = F @ self.P @ F.T + G @ G.T * self.bank.acceleration_var
+        self.t = now
+        H = np.hstack([np.eye(2), np.zeros((2, 2))])
+        S = H @ self.P @ H.T + np.eye(2) * self.bank.measurement_var
+        K = self.P @ H.T @ np.linalg.inv(S)
+        self.x = self.x + K @ (np.asarray(z) - H @ self.x)
+        self.P = (np.eye(4) - K @ H) @ self.P
+
+
+def test_batched_filters_match_the_reference():
+    rng = np.random.default_rng(5)
+    bank = KalmanBank(capacity=2)
+    slots, references = [], []
+    for i in range(5):
+        center = rng.uniform(0, 500, size=2)
+        slots.append(bank.add(center, now=0.1 * i))
+        references.append(ReferenceFilter(bank, center, 0.1 * i))
+    assert bank.x.shape[0] == 8
+
+    for step in range(1, 40):
+        now = 0.5 + step * 0.066
+        # Only some tracks are matched each frame, so time steps differ
+        matched = [i for i in range(5) if rng.random() < 0.7]
+        centers = [references[i].x[:2] + rng.normal(0, 5, size=2) + (30, -10) for i in matched]
+        bank.update([slots[i] for i in matched], centers, now)
+        for i, center in zip(matched, centers):
+            references[i].update(center, now)
+
+    for slot, reference in zip(slots, references):
+        np.testing.assert_allclose(bank.x[slot], reference.x, rtol=1e-9, atol=1e-6)
+        np.testing.assert_allclose(bank.P[slot], reference.P, rtol=1e-9, atol=1e-6)
+
+
+def test_velocity_converges_on_steady_motion():
+    bank = KalmanBank()
+    slot = bank.add((100.0, 200.0), now=0.0)
+    for step in range(1, 31):
+        t = step / 15
+        bank.update([slot], [(100.0 + 60.0 * t, 200.0 - 30.0 * t)], now=t)
+    np.testing.assert_allclose(bank.velocities([slot])[0], (60.0, -30.0), atol=1.0)
+
+    bank.predict(3.0)
+    np.testing.assert_allclose(bank.positions([slot])[0], (280.0, 110.0), atol=2.0)
+
+
+def test_removed_slots_are_reused():
+    bank = KalmanBank(capacity=2)
+    first, second = bank.add((0, 0), 0.0), bank.add((1, 1), 0.0)
+    bank.remove(first)
+    bank.remove(first)
+    assert len(bank) == 1
+    assert bank.add((5, 5), 1.0) == first
+    assert bank.positions([first, second]).tolist() == [[5.0, 5.0], [1.0, 1.0]]
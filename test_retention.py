@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Tests for telemetry retention: chunked expiry, archival and incremental vacuum
+"""
+
+import asyncio
+import gzip
+import sqlite3
+
+from services.hub import db, retention
+from services.hub.retention import DAY, RetentionEngine
+
+NOW = 100 * DAY + 12 * 3600
+
+
+def _fill(path, rows):
+    """Create the schema, then insert (ts, value) rows with a padded payload"""
+    async def init():
+        conn = await db.get_db()
+        await conn.close()
+    asyncio.run(init())
+    with sqlite3.connect(path) as conn:
+        conn.executemany(db.INSERT_TELEMETRY_SQL,
+                         [(ts, 'sensors', 'temp', value, 'x' * 200) for ts, value in rows])
+
+
+def _engine(**retention_config):
+    config = {'retention': dict({'raw_days': 7, 'rollup_1m_days': None, 'rollup_15m_days': None,
+                                 'chunk_pause_ms': 0}, **retention_config)}
+    return RetentionEngine(config)
+
+
+def _sleeps(monkeypatch, on_sleep=None):
+    calls = []
+
+    async def sleep(seconds):
+        calls.append(seconds)
+        if on_sleep is not None:
+            on_sleep()
+    monkeypatch.setattr(retention.asyncio, 'sleep', sleep)
+    return calls
+
+
+def test_expired_rows_are_deleted_in_chunks(pulse_db, monkeypatch):
+    old = [(NOW - 10 * DAY + i, float(i)) for i in range(2500)]
+    recent = [(NOW - DAY + i, float(i)) for i in range(10)]
+    _fill(pulse_db, old + recent)
+    engine = _engine(chunk_rows=1000)
+
+    async def no_compact(conn):
+        pass
+    monkeypatch.setattr(engine, '_compact', no_compact)
+    sleeps = _sleeps(monkeypatch)
+
+    deleted = asyncio.run(engine.run_once(now=NOW))
+
+    assert deleted['telemetry'] == 2500
+    # Two full chunks pause for the writer; the third, partial chunk ends the range
+    assert len(sleeps) == 2
+    with sqlite3.connect(pulse_db) as conn:
+        assert conn.execute('SELECT COUNT(*), MIN(ts) FROM telemetry').fetchone() == (10, NOW - DAY)
+
+
+def test_partial_days_are_archived_per_partition(pulse_db, tmp_path, monkeypatch):
+    # Rows on two expired UTC days, one kept
+    first_day = (NOW // DAY - 10) * DAY
+    rows = [(first_day + 60, 1.0), (first_day + DAY + 60, 2.0), (first_day + DAY + 120, 3.0), (NOW, 4.0)]
+    _fill(pulse_db, rows)
+    engine = RetentionEngine({'retention': {'raw_days': 7, 'rollup_1m_days': None, 'rollup_15m_days': None,
+                                            'chunk_pause_ms': 0},
+                              'archive': {'enabled': True, 'format': 'csv', 'path': str(tmp_path / 'archive')}})
+    _sleeps(monkeypatch)
+
+    asyncio.run(engine.run_once(now=NOW))
+
+    files = sorted((tmp_path / 'archive' / 'telemetry').iterdir())
+    assert len(files) == 2
+    lines = [gzip.open(f, 'rt').read().splitlines() for f in files]
+    assert [len(f) for f in lines] == [2, 3]    # header + rows
+    assert lines[0][0] == 'ts,source,metric,value,data'
+
+
+def test_incremental_vacuum_frees_vacuum_pages_per_step(pulse_db, monkeypatch):
+    _fill(pulse_db, [(NOW - 10 * DAY + i, float(i)) for i in range(20000)])
+    vacuum_pages = 50
+    engine = _engine(chunk_rows=100000, vacuum_pages=vacuum_pages)
+
+    freelist = []
+
+    def record():
+        with sqlite3.connect(pulse_db) as conn:
+            freelist.append(conn.execute('PRAGMA freelist_count').fetchone()[0])
+    _sleeps(monkeypatch, record)
+
+    asyncio.run(engine.run_once(now=NOW))
+
+    assert freelist[-1] == 0
+    # Each vacuum step hands back vacuum_pages pages, not a single page
+    assert len(freelist) > 3
+    steps = [before - after for before, after in zip(freelist, freelist[1:])]
+    assert all(step == vacuum_pages for step in steps[:-1])
+    assert 0 < steps[-1] <= vacuum_pages
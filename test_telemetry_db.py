@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Tests for the telemetry rollup tables, their backfill and the downsampled query
+"""
+
+import asyncio
+import random
+import sqlite3
+
+from services.hub import db
+
+
+def _rows(count, start=1_000_000, seed=3):
+    rng = random.Random(seed)
+    rows = []
+    for i in range(count):
+        # Halves sum exactly, so rollups can be compared without tolerance
+        value = None if rng.random() < 0.1 else rng.randint(-40, 200) / 2
+        rows.append((start + i * 37, rng.choice(['sensors', 'camera']),
+                     rng.choice(['temp', 'people_count']), value, None))
+    return rows
+
+
+def _expected(path, seconds):
+    """A rollup computed from scratch over the raw rows"""
+    with sqlite3.connect(path) as conn:
+        return conn.execute(
+            f'''SELECT (ts / {seconds}) * {seconds}, source, metric, MIN(value), MAX(value), SUM(value), COUNT(value)
+            FROM telemetry WHERE value IS NOT NULL
+            GROUP BY ts / {seconds}, source, metric ORDER BY 1, 2, 3'''
+        ).fetchall()
+
+
+def _rollup(path, table):
+    with sqlite3.connect(path) as conn:
+        return conn.execute(
+            f'''SELECT bucket, source, metric, min_value, max_value, sum_value, count
+            FROM {table} ORDER BY 1, 2, 3'''
+        ).fetchall()
+
+
+def test_batched_writes_match_a_full_aggregation(pulse_db):
+    rows = _rows(3000)
+
+    async def write():
+        conn = await db.get_db()
+        try:
+            # Batches split buckets, so rows are merged into existing ones
+            for start in range(0, len(rows), 113):
+                await db._write_rows(conn, rows[start:start + 113])
+        finally:
+            await conn.close()
+    asyncio.run(write())
+
+    for table, seconds in db.ROLLUPS:
+        assert _rollup(pulse_db, table) == _expected(pulse_db, seconds)
+
+
+def test_backfill_fills_only_empty_rollups(pulse_db, monkeypatch):
+    async def connect():
+        conn = await db.get_db()
+        await conn.close()
+    asyncio.run(connect())
+    with sqlite3.connect(pulse_db) as conn:
+        # Raw rows from before the rollup tables existed
+        conn.executemany(db.INSERT_TELEMETRY_SQL, _rows(2000))
+        conn.execute("INSERT INTO telemetry_1h VALUES (0, 'sensors', 'temp', 1, 1, 1, 1)")
+
+    monkeypatch.setattr(db, '_schema_ready', False)
+    asyncio.run(connect())
+
+    assert _rollup(pulse_db, 'telemetry_1m') == _expected(pulse_db, 60)
+    assert _rollup(pulse_db, 'telemetry_15m') == _expected(pulse_db, 900)
+    assert _rollup(pulse_db, 'telemetry_1h') == [(0, 'sensors', 'temp', 1, 1, 1, 1)]
+
+
+def test_series_uses_the_finest_rollup_that_fits(pulse_db):
+    start = 1_800_000               # a whole hour
+    rows = [(start + i * 10, 'sensors', 'temp', float(i % 7), None) for i in range(3 * 360)]
+
+    async def scenario():
+        conn = await db.get_db()
+        try:
+            await db._write_rows(conn, rows)
+        finally:
+            await conn.close()
+        end = start + 3 * 3600 - 1
+        return (await db.query_telemetry_series('temp', start, end, max_points=2000),
+                await db.query_telemetry_series('temp', start, end, max_points=200),
+                await db.query_telemetry_series('temp', start + 1800, end, max_points=5))
+    raw, minutes, hours = asyncio.run(scenario())
+
+    assert raw['resolution'] == 0 and len(raw['points']) == len(rows)
+    assert minutes['resolution'] == 60 and len(minutes['points']) == 180
+    assert minutes['points'][0] == {'ts': start, 'source': 'sensors', 'min': 0.0, 'max': 5.0,
+                                    'avg': 15 / 6, 'count': 6}
+    # The bucket holding start_ts is included
+    assert hours['resolution'] == 3600
+    assert [p['ts'] for p in hours['points']] == [start, start + 3600, start + 7200]
+    assert sum(p['count'] for p in hours['points']) == len(rows)
+
+
+def test_concurrent_first_connections_backfill_once(pulse_db, monkeypatch):
+    async def connect():
+        conn = await db.get_db()
+        await conn.close()
+    asyncio.run(connect())
+    with sqlite3.connect(pulse_db) as conn:
+        conn.executemany(db.INSERT_TELEMETRY_SQL, _rows(2000))
+
+    async def startup():
+        # e.g. the telemetry writer and a request handler at hub startup
+        await asyncio.gather(*(connect() for _ in range(4)))
+    monkeypatch.setattr(db, '_schema_ready', False)
+    asyncio.run(startup())
+
+    for table, seconds in db.ROLLUPS:
+        assert _rollup(pulse_db, table) == _expected(pulse_db, seconds)
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Tests for the struct-of-arrays track store: slot recycling and trajectories
+"""
+
+import numpy as np
+
+from services.sensors.track_store import ACTIVE, EXITED, FREE, TENTATIVE, TrackStore
+
+
+def _box(x, y=0):
+    return (x, y, 10, 20)
+
+
+def test_released_slots_are_reused_lowest_first():
+    store = TrackStore(capacity=4, history=5)
+    slots = [store.add(i, _box(i), now=0.0) for i in range(4)]
+    assert slots == [0, 1, 2, 3]
+
+    store.release(2)
+    store.release(0)
+    store.release(0)                    # releasing twice is a no-op
+    assert len(store) == 2
+    assert store.add(10, _box(0), now=1.0) == 0
+    assert store.add(11, _box(0), now=1.0) == 2
+    assert store.capacity == 4
+    assert list(store.id) == [10, 1, 11, 3]
+
+
+def test_recycled_slot_starts_clean():
+    store = TrackStore(capacity=1, history=3, lines=1)
+    slot = store.add(1, _box(0), now=0.0, confidence=0.9, detector='HOG')
+    for x in (10, 20, 30):
+        store.observe(slot, _box(x), now=1.0)
+    store.set_anchor(slot, 0, (5.0, 5.0))
+    store.release(slot)
+
+    assert store.add(2, _box(100), now=2.0) == slot
+    assert store.status[slot] == TENTATIVE and store.frames[slot] == 1
+    assert store.get_anchor(slot, 0) is None
+    assert store.trajectory(slot).tolist() == [[105, 10]]
+
+
+def test_store_grows_when_every_slot_is_live():
+    store = TrackStore(capacity=2, history=2)
+    slots = [store.add(i, _box(i), now=0.0) for i in range(5)]
+    assert slots == [0, 1, 2, 3, 4]
+    assert store.capacity == 8 and len(store) == 5
+    assert list(store.id[:5]) == [0, 1, 2, 3, 4]
+    assert store.count(FREE) == 3
+
+
+def test_trajectory_is_oldest_first_after_wrapping():
+    store = TrackStore(capacity=1, history=4)
+    slot = store.add(1, _box(0), now=0.0)
+    assert store.trajectory(slot).tolist() == [[5, 10]]
+
+    for x in range(10, 70, 10):
+        store.observe(slot, _box(x), now=float(x))
+    # Seven points pushed into a ring of four: the last four, in order
+    np.testing.assert_array_equal(store.trajectory(slot)[:, 0], [35, 45, 55, 65])
+
+    store.observe(slot, _box(70), now=80.0)
+    np.testing.assert_array_equal(store.trajectory(slot)[:, 0], [45, 55, 65, 75])
+
+
+def test_release_expired_by_status():
+    store = TrackStore(capacity=4)
+    active = store.add(1, _box(0), now=0.0)
+    exited = store.add(2, _box(0), now=0.0)
+    fresh = store.add(3, _box(0), now=9.0)
+    store.status[[active, exited, fresh]] = [ACTIVE, EXITED, EXITED]
+
+    released = store.release_expired(10.0, [(EXITED, 5.0)])
+
+    assert released.tolist() == [exited]
+    assert store.slots_with(ACTIVE, EXITED).tolist() == [active, fresh]